@@ -1,9 +1,9 @@
-from itertools import groupby
 import logging
 import re
+import time
 
 from cinderclient import exceptions as cinder_exceptions
-from django.db import transaction
+from django.db import transaction, DatabaseError
 from django.utils import six, timezone
 from keystoneclient import exceptions as keystone_exceptions
 from neutronclient.client import exceptions as neutron_exceptions
@@ -13,6 +13,7 @@ from waldur_core.structure import log_backend_action, SupportedServices
 from waldur_core.structure.utils import (
     update_pulled_fields, handle_resource_not_found, handle_resource_update_success)
 from waldur_openstack.openstack_base.backend import OpenStackBackendError, BaseOpenStackBackend
+from waldur_openstack.openstack_base.handlers import deferred_handlers
 
 from . import models
 
@@ -113,26 +114,28 @@ class OpenStackBackend(BaseOpenStackBackend):
 
         flavor_exclude_regex = self.settings.options.get('flavor_exclude_regex', '')
         name_pattern = re.compile(flavor_exclude_regex) if flavor_exclude_regex else None
+        pulled_flavors = []
+        for backend_flavor in flavors:
+            if name_pattern is not None and name_pattern.match(backend_flavor.name) is not None:
+                logger.debug('Skipping pull of %s flavor as it matches %s regex pattern.',
+                             backend_flavor.name, flavor_exclude_regex)
+                continue
+            pulled_flavors.append(backend_flavor)
+
         with transaction.atomic():
             cur_flavors = self._get_current_properties(models.Flavor)
-            for backend_flavor in flavors:
-                if name_pattern is not None and name_pattern.match(backend_flavor.name) is not None:
-                    logger.debug('Skipping pull of %s flavor as it matches %s regex pattern.',
-                                 backend_flavor.name, flavor_exclude_regex)
-                    continue
-
-                cur_flavors.pop(backend_flavor.id, None)
-                models.Flavor.objects.update_or_create(
-                    settings=self.settings,
-                    backend_id=backend_flavor.id,
-                    defaults={
-                        'name': backend_flavor.name,
-                        'cores': backend_flavor.vcpus,
-                        'ram': backend_flavor.ram,
-                        'disk': self.gb2mb(backend_flavor.disk),
-                    })
-
-            models.Flavor.objects.filter(backend_id__in=cur_flavors.keys()).delete()
+            self._upsert_properties(models.Flavor, {
+                backend_flavor.id: {
+                    'name': backend_flavor.name,
+                    'cores': backend_flavor.vcpus,
+                    'ram': backend_flavor.ram,
+                    'disk': self.gb2mb(backend_flavor.disk),
+                }
+                for backend_flavor in pulled_flavors
+            })
+
+            stale_ids = set(cur_flavors) - set(flavor.id for flavor in pulled_flavors)
+            models.Flavor.objects.filter(backend_id__in=stale_ids).delete()
 
     def pull_images(self):
         self._pull_images(models.Image, lambda image: image['visibility'] == 'public')
@@ -173,6 +176,41 @@ class OpenStackBackend(BaseOpenStackBackend):
     def pull_tenant_quotas(self, tenant):
         self._pull_tenant_quotas(tenant.backend_id, tenant)
 
+    def _apply_per_scope(self, scopes, apply):
+        """ Apply pulled objects of each tenant or network in its own short transaction.
+
+        Row locks are held only while objects of a single scope are written,
+        so API requests are not blocked for the whole duration of admin pull.
+        Each transaction starts with locking the row of the scope, time spent waiting for this lock
+        is logged, so that contention with API requests could be measured.
+        Applying a scope is idempotent, so if it fails, other scopes are still committed,
+        error is raised after all of them and the next pull resumes failed scopes.
+        Signal handlers of pulled objects are deferred and applied once after all scopes.
+        """
+        longest_transaction = 0
+        longest_lock_wait = 0
+        failed_scopes = []
+        with deferred_handlers():
+            for scope in scopes:
+                started = time.time()
+                try:
+                    with transaction.atomic():
+                        list(type(scope).objects.select_for_update().filter(pk=scope.pk).values_list('pk'))
+                        longest_lock_wait = max(longest_lock_wait, time.time() - started)
+                        apply(scope)
+                except DatabaseError:
+                    logger.exception('Unable to apply pulled objects of %s of service settings %s.',
+                                     scope, self.settings)
+                    failed_scopes.append(scope)
+                longest_transaction = max(longest_transaction, time.time() - started)
+
+        logger.debug('Pulled objects of %s scopes of service settings %s are applied, the longest transaction '
+                     'took %.3f seconds, the longest lock wait took %.3f seconds.',
+                     len(scopes), self.settings, longest_transaction, longest_lock_wait)
+        if failed_scopes:
+            raise OpenStackBackendError('Unable to apply pulled objects of %s.' % ', '.join(
+                six.text_type(scope) for scope in failed_scopes))
+
     def pull_floating_ips(self, tenants=None):
         neutron = self.neutron_admin_client
 
@@ -191,14 +229,15 @@ class OpenStackBackend(BaseOpenStackBackend):
             six.reraise(OpenStackBackendError, e)
 
         tenant_floating_ips = dict()
-        for tenant_id, floating_ips in groupby(backend_floating_ips, lambda x: x['tenant_id']):
-            tenant_floating_ips[tenant_mappings[tenant_id]] = floating_ips
+        for backend_floating_ip in backend_floating_ips:
+            tenant_floating_ips.setdefault(backend_floating_ip['tenant_id'], []).append(backend_floating_ip)
 
-        with transaction.atomic():
-            for tenant, floating_ips in tenant_floating_ips.items():
-                self._update_tenant_floating_ips(tenant, floating_ips)
+        def apply(tenant):
+            floating_ips = tenant_floating_ips.get(tenant.backend_id, [])
+            self._update_tenant_floating_ips(tenant, floating_ips)
+            self._remove_stale_floating_ips([tenant], floating_ips)
 
-            self._remove_stale_floating_ips(tenants, backend_floating_ips)
+        self._apply_per_scope(tenant_mappings.values(), apply)
 
     @log_backend_action('pull floating IPs for tenant')
     def pull_tenant_floating_ips(self, tenant):
@@ -276,13 +315,15 @@ class OpenStackBackend(BaseOpenStackBackend):
             six.reraise(OpenStackBackendError, e)
 
         tenant_security_groups = dict()
-        for tenant_id, security_groups in groupby(backend_security_groups, lambda x: x['tenant_id']):
-            tenant_security_groups[tenant_mappings[tenant_id]] = security_groups
+        for backend_security_group in backend_security_groups:
+            tenant_security_groups.setdefault(backend_security_group['tenant_id'], []).append(backend_security_group)
 
-        with transaction.atomic():
-            for tenant, security_groups in tenant_security_groups.items():
-                self._update_tenant_security_groups(tenant, security_groups)
-            self._remove_stale_security_groups(tenants, backend_security_groups)
+        def apply(tenant):
+            security_groups = tenant_security_groups.get(tenant.backend_id, [])
+            self._update_tenant_security_groups(tenant, security_groups)
+            self._remove_stale_security_groups([tenant], security_groups)
+
+        self._apply_per_scope(tenant_mappings.values(), apply)
 
     @log_backend_action('pull security groups for tenant')
     def pull_tenant_security_groups(self, tenant):
@@ -356,15 +397,19 @@ class OpenStackBackend(BaseOpenStackBackend):
         except neutron_exceptions.NeutronClientException as e:
             six.reraise(OpenStackBackendError, e)
 
+        tenant_networks = dict()
+        for backend_network in backend_networks:
+            if backend_network['tenant_id'] not in tenant_mappings:
+                logger.debug('Skipping network %s synchronization because its tenant %s is not available.',
+                             backend_network['id'], backend_network['tenant_id'])
+                continue
+            tenant_networks.setdefault(backend_network['tenant_id'], []).append(backend_network)
+
         networks = []
-        with transaction.atomic():
-            for backend_network in backend_networks:
-                tenant = tenant_mappings.get(backend_network['tenant_id'])
-                if not tenant:
-                    logger.debug('Skipping network %s synchronization because its tenant %s is not available.',
-                                 backend_network['id'], backend_network['tenant_id'])
-                    continue
 
+        def apply(tenant):
+            tenant_network_uuids = []
+            for backend_network in tenant_networks.get(tenant.backend_id, []):
                 imported_network = self._backend_network_to_network(
                     backend_network, tenant=tenant, service_project_link=tenant.service_project_link)
 
@@ -378,13 +423,14 @@ class OpenStackBackend(BaseOpenStackBackend):
                     handle_resource_update_success(network)
 
                 networks.append(network)
+                tenant_network_uuids.append(network.uuid)
 
-            networks_uuid = [network_item.uuid for network_item in networks]
             stale_networks = models.Network.objects.filter(
                 state__in=[models.Network.States.OK, models.Network.States.ERRED],
-                tenant__in=tenants).exclude(uuid__in=networks_uuid)
+                tenant=tenant).exclude(uuid__in=tenant_network_uuids)
             stale_networks.delete()
 
+        self._apply_per_scope(tenant_mappings.values(), apply)
         return networks
 
     def _backend_network_to_network(self, backend_network, **kwargs):
@@ -423,11 +469,13 @@ class OpenStackBackend(BaseOpenStackBackend):
         except neutron_exceptions.NeutronClientException as e:
             six.reraise(OpenStackBackendError, e)
 
-        subnet_uuids = []
-        with transaction.atomic():
-            for backend_subnet in backend_subnets:
-                network = network_mappings[backend_subnet['network_id']]
+        network_subnets = dict()
+        for backend_subnet in backend_subnets:
+            network_subnets.setdefault(backend_subnet['network_id'], []).append(backend_subnet)
 
+        def apply(network):
+            subnet_uuids = []
+            for backend_subnet in network_subnets.get(network.backend_id, []):
                 imported_subnet = self._backend_subnet_to_subnet(
                     backend_subnet, network=network, service_project_link=network.service_project_link)
 
@@ -444,9 +492,11 @@ class OpenStackBackend(BaseOpenStackBackend):
 
             stale_subnets = models.SubNet.objects.filter(
                 state__in=[models.SubNet.States.OK, models.SubNet.States.ERRED],
-                network__in=networks).exclude(uuid__in=subnet_uuids)
+                network=network).exclude(uuid__in=subnet_uuids)
             stale_subnets.delete()
 
+        self._apply_per_scope(network_mappings.values(), apply)
+
     @log_backend_action()
     def import_tenant_subnets(self, tenant):
         self.pull_subnets(tenant.networks.iterator())
@@ -607,8 +657,9 @@ class OpenStackBackend(BaseOpenStackBackend):
         except neutron_exceptions.NeutronClientException as e:
             six.reraise(OpenStackBackendError, e)
 
-        for floating_ip in floatingips.get('floatingips', []):
-            self._delete_backend_floating_ip(floating_ip['id'], tenant.backend_id)
+        self._execute_concurrently(
+            lambda floating_ip: self._delete_backend_floating_ip(floating_ip['id'], tenant.backend_id),
+            floatingips.get('floatingips', []))
 
     @log_backend_action()
     def delete_tenant_ports(self, tenant):
@@ -623,7 +674,7 @@ class OpenStackBackend(BaseOpenStackBackend):
         except neutron_exceptions.NeutronClientException as e:
             six.reraise(OpenStackBackendError, e)
 
-        for port in ports.get('ports', []):
+        def delete_port(port):
             logger.info("Deleting port %s interface_router from tenant %s", port['id'], tenant.backend_id)
             try:
                 neutron.remove_interface_router(port['device_id'], {'port_id': port['id']})
@@ -641,6 +692,8 @@ class OpenStackBackend(BaseOpenStackBackend):
             except neutron_exceptions.NeutronClientException as e:
                 six.reraise(OpenStackBackendError, e)
 
+        self._execute_concurrently(delete_port, ports.get('ports', []))
+
     @log_backend_action()
     def delete_tenant_routers(self, tenant):
         if not tenant.backend_id:
@@ -654,7 +707,7 @@ class OpenStackBackend(BaseOpenStackBackend):
         except neutron_exceptions.NeutronClientException as e:
             six.reraise(OpenStackBackendError, e)
 
-        for router in routers.get('routers', []):
+        def delete_router(router):
             logger.info("Deleting router %s from tenant %s", router['id'], tenant.backend_id)
             try:
                 neutron.delete_router(router['id'])
@@ -663,6 +716,8 @@ class OpenStackBackend(BaseOpenStackBackend):
             except neutron_exceptions.NeutronClientException as e:
                 six.reraise(OpenStackBackendError, e)
 
+        self._execute_concurrently(delete_router, routers.get('routers', []))
+
     @log_backend_action()
     def delete_tenant_networks(self, tenant):
         if not tenant.backend_id:
@@ -676,9 +731,7 @@ class OpenStackBackend(BaseOpenStackBackend):
         except neutron_exceptions.NeutronClientException as e:
             six.reraise(OpenStackBackendError, e)
 
-        for network in networks.get('networks', []):
-            if network['router:external']:
-                continue
+        def delete_network(network):
             for subnet in network['subnets']:
                 logger.info("Deleting subnetwork %s from tenant %s", subnet, tenant.backend_id)
                 try:
@@ -696,6 +749,10 @@ class OpenStackBackend(BaseOpenStackBackend):
             except neutron_exceptions.NeutronClientException as e:
                 six.reraise(OpenStackBackendError, e)
 
+        internal_networks = [network for network in networks.get('networks', [])
+                             if not network['router:external']]
+        self._execute_concurrently(delete_network, internal_networks)
+
         tenant.set_quota_usage(tenant.Quotas.network_count, 0)
         tenant.set_quota_usage(tenant.Quotas.subnet_count, 0)
 
@@ -708,7 +765,7 @@ class OpenStackBackend(BaseOpenStackBackend):
         except neutron_exceptions.NeutronClientException as e:
             six.reraise(OpenStackBackendError, e)
 
-        for sgroup in sgroups:
+        def delete_security_group(sgroup):
             logger.info("Deleting security group %s from tenant %s", sgroup['id'], tenant.backend_id)
             try:
                 neutron.delete_security_group(sgroup['id'])
@@ -717,6 +774,8 @@ class OpenStackBackend(BaseOpenStackBackend):
             except neutron_exceptions.NeutronClientException as e:
                 six.reraise(OpenStackBackendError, e)
 
+        self._execute_concurrently(delete_security_group, sgroups)
+
     @log_backend_action()
     def delete_tenant_instances(self, tenant):
         nova = self.nova_client
@@ -726,7 +785,7 @@ class OpenStackBackend(BaseOpenStackBackend):
         except nova_exceptions.ClientException as e:
             six.reraise(OpenStackBackendError, e)
 
-        for server in servers:
+        def delete_server(server):
             logger.info("Deleting instance %s from tenant %s", server.id, tenant.backend_id)
             try:
                 server.delete()
@@ -735,16 +794,23 @@ class OpenStackBackend(BaseOpenStackBackend):
             except nova_exceptions.ClientException as e:
                 six.reraise(OpenStackBackendError, e)
 
+        self._execute_concurrently(delete_server, servers)
+
     @log_backend_action()
     def are_all_tenant_instances_deleted(self, tenant):
         nova = self.nova_client
 
         try:
-            servers = nova.servers.list()
+            servers = nova.servers.list(detailed=False, limit=1)
+            if servers:
+                remaining = self._get_absolute_limit(nova, 'totalInstancesUsed', len(servers))
+            else:
+                remaining = 0
         except nova_exceptions.ClientException as e:
             six.reraise(OpenStackBackendError, e)
-        else:
-            return not servers
+
+        self._report_remaining_tenant_resources(tenant, 'instances', remaining)
+        return not servers
 
     @log_backend_action()
     def delete_tenant_snapshots(self, tenant):
@@ -755,7 +821,7 @@ class OpenStackBackend(BaseOpenStackBackend):
         except cinder_exceptions.ClientException as e:
             six.reraise(OpenStackBackendError, e)
 
-        for snapshot in snapshots:
+        def delete_snapshot(snapshot):
             logger.info("Deleting snapshot %s from tenant %s", snapshot.id, tenant.backend_id)
             try:
                 snapshot.delete()
@@ -764,16 +830,23 @@ class OpenStackBackend(BaseOpenStackBackend):
             except cinder_exceptions.ClientException as e:
                 six.reraise(OpenStackBackendError, e)
 
+        self._execute_concurrently(delete_snapshot, snapshots)
+
     @log_backend_action()
     def are_all_tenant_snapshots_deleted(self, tenant):
         cinder = self.cinder_client
 
         try:
-            snapshots = cinder.volume_snapshots.list()
+            snapshots = cinder.volume_snapshots.list(detailed=False, limit=1)
+            if snapshots:
+                remaining = self._get_absolute_limit(cinder, 'totalSnapshotsUsed', len(snapshots))
+            else:
+                remaining = 0
         except cinder_exceptions.ClientException as e:
             six.reraise(OpenStackBackendError, e)
-        else:
-            return not snapshots
+
+        self._report_remaining_tenant_resources(tenant, 'snapshots', remaining)
+        return not snapshots
 
     @log_backend_action()
     def delete_tenant_volumes(self, tenant):
@@ -784,7 +857,7 @@ class OpenStackBackend(BaseOpenStackBackend):
         except cinder_exceptions.ClientException as e:
             six.reraise(OpenStackBackendError, e)
 
-        for volume in volumes:
+        def delete_volume(volume):
             logger.info("Deleting volume %s from tenant %s", volume.id, tenant.backend_id)
             try:
                 volume.force_delete()
@@ -793,16 +866,35 @@ class OpenStackBackend(BaseOpenStackBackend):
             except cinder_exceptions.ClientException as e:
                 six.reraise(OpenStackBackendError, e)
 
+        self._execute_concurrently(delete_volume, volumes)
+
     @log_backend_action()
     def are_all_tenant_volumes_deleted(self, tenant):
         cinder = self.cinder_client
 
         try:
-            volumes = cinder.volumes.list()
+            volumes = cinder.volumes.list(detailed=False, limit=1)
+            if volumes:
+                remaining = self._get_absolute_limit(cinder, 'totalVolumesUsed', len(volumes))
+            else:
+                remaining = 0
         except cinder_exceptions.ClientException as e:
             six.reraise(OpenStackBackendError, e)
-        else:
-            return not volumes
+
+        self._report_remaining_tenant_resources(tenant, 'volumes', remaining)
+        return not volumes
+
+    def _get_absolute_limit(self, client, name, default):
+        """ Get current usage from absolute limits of nova or cinder without listing the resources """
+        for limit in client.limits.get().absolute:
+            if limit.name == name:
+                return max(limit.value, default)
+        return default
+
+    def _report_remaining_tenant_resources(self, tenant, resource_type, remaining):
+        """ Log number of resources left for deletion to display progress of tenant deletion """
+        if remaining:
+            logger.info('%s %s are left for deletion in tenant %s.', remaining, resource_type, tenant.backend_id)
 
     @log_backend_action()
     def delete_tenant_user(self, tenant):
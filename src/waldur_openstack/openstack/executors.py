@@ -2,11 +2,12 @@ import logging
 
 from celery import chain
 
-from waldur_core.core import executors as core_executors
 from waldur_core.core import tasks as core_tasks
 from waldur_core.core import utils as core_utils
 from waldur_core.structure import executors as structure_executors
 from waldur_core.structure import models as structure_models
+from waldur_openstack.openstack_base import executors as openstack_base_executors
+from waldur_openstack.openstack_base import tasks as openstack_base_tasks
 
 from . import models, tasks
 
@@ -14,7 +15,7 @@ from . import models, tasks
 logger = logging.getLogger(__name__)
 
 
-class SecurityGroupCreateExecutor(core_executors.CreateExecutor):
+class SecurityGroupCreateExecutor(openstack_base_executors.CreateExecutor):
 
     @classmethod
     def get_task_signature(cls, security_group, serialized_security_group, **kwargs):
@@ -22,7 +23,7 @@ class SecurityGroupCreateExecutor(core_executors.CreateExecutor):
             serialized_security_group, 'create_security_group', state_transition='begin_creating')
 
 
-class SecurityGroupUpdateExecutor(core_executors.UpdateExecutor):
+class SecurityGroupUpdateExecutor(openstack_base_executors.UpdateExecutor):
 
     @classmethod
     def get_task_signature(cls, security_group, serialized_security_group, **kwargs):
@@ -30,7 +31,7 @@ class SecurityGroupUpdateExecutor(core_executors.UpdateExecutor):
             serialized_security_group, 'update_security_group', state_transition='begin_updating')
 
 
-class SecurityGroupDeleteExecutor(core_executors.DeleteExecutor):
+class SecurityGroupDeleteExecutor(openstack_base_executors.DeleteExecutor):
 
     @classmethod
     def get_task_signature(cls, security_group, serialized_security_group, **kwargs):
@@ -41,7 +42,7 @@ class SecurityGroupDeleteExecutor(core_executors.DeleteExecutor):
             return core_tasks.StateTransitionTask().si(serialized_security_group, state_transition='begin_deleting')
 
 
-class PushSecurityGroupRulesExecutor(core_executors.ActionExecutor):
+class PushSecurityGroupRulesExecutor(openstack_base_executors.ActionExecutor):
 
     @classmethod
     def get_task_signature(cls, security_group, serialized_security_group, **kwargs):
@@ -49,7 +50,7 @@ class PushSecurityGroupRulesExecutor(core_executors.ActionExecutor):
             serialized_security_group, 'push_security_group_rules', state_transition='begin_updating')
 
 
-class TenantCreateExecutor(core_executors.CreateExecutor):
+class TenantCreateExecutor(openstack_base_executors.CreateExecutor):
 
     @classmethod
     def get_task_signature(cls, tenant, serialized_tenant, pull_security_groups=True, **kwargs):
@@ -108,7 +109,7 @@ class TenantCreateExecutor(core_executors.CreateExecutor):
         return tasks.TenantCreateErrorTask().s(serialized_tenant)
 
 
-class TenantImportExecutor(core_executors.ActionExecutor):
+class TenantImportExecutor(openstack_base_executors.ActionExecutor):
 
     @classmethod
     def get_task_signature(cls, tenant, serialized_tenant, **kwargs):
@@ -144,7 +145,7 @@ class TenantImportExecutor(core_executors.ActionExecutor):
         return chain(*tasks)
 
 
-class TenantUpdateExecutor(core_executors.UpdateExecutor):
+class TenantUpdateExecutor(openstack_base_executors.UpdateExecutor):
 
     @classmethod
     def get_task_signature(cls, tenant, serialized_tenant, **kwargs):
@@ -156,7 +157,7 @@ class TenantUpdateExecutor(core_executors.UpdateExecutor):
             return core_tasks.StateTransitionTask().si(serialized_tenant, state_transition='begin_updating')
 
 
-class TenantDeleteExecutor(core_executors.DeleteExecutor):
+class TenantDeleteExecutor(openstack_base_executors.DeleteExecutor):
 
     @classmethod
     def get_task_signature(cls, tenant, serialized_tenant, **kwargs):
@@ -189,6 +190,8 @@ class TenantDeleteExecutor(core_executors.DeleteExecutor):
 
     @classmethod
     def get_instances_cleanup_tasks(cls, serialized_tenant):
+        # Snapshots and instances are deleted by backend at the same time,
+        # volumes are deleted only after both of them are gone.
         return [
             core_tasks.BackendMethodTask().si(
                 serialized_tenant, backend_method='delete_tenant_security_groups',
@@ -196,24 +199,27 @@ class TenantDeleteExecutor(core_executors.DeleteExecutor):
             core_tasks.BackendMethodTask().si(
                 serialized_tenant, backend_method='delete_tenant_snapshots',
             ),
-            core_tasks.PollBackendCheckTask().si(
-                serialized_tenant,
-                backend_check_method='are_all_tenant_snapshots_deleted'
-            ),
             core_tasks.BackendMethodTask().si(
                 serialized_tenant, backend_method='delete_tenant_instances',
             ),
-            core_tasks.PollBackendCheckTask().si(
+            openstack_base_tasks.with_initial_delay(openstack_base_tasks.PollBackendCheckTask().si(
                 serialized_tenant,
-                backend_check_method='are_all_tenant_instances_deleted'
+                backend_check_method='are_all_tenant_snapshots_deleted',
+                operation='delete_snapshots',
+            ), models.Tenant),
+            openstack_base_tasks.PollBackendCheckTask().si(
+                serialized_tenant,
+                backend_check_method='are_all_tenant_instances_deleted',
+                operation='delete_instances',
             ),
             core_tasks.BackendMethodTask().si(
                 serialized_tenant, backend_method='delete_tenant_volumes',
             ),
-            core_tasks.PollBackendCheckTask().si(
+            openstack_base_tasks.with_initial_delay(openstack_base_tasks.PollBackendCheckTask().si(
                 serialized_tenant,
-                backend_check_method='are_all_tenant_volumes_deleted'
-            ),
+                backend_check_method='are_all_tenant_volumes_deleted',
+                operation='delete_volumes',
+            ), models.Tenant),
         ]
 
     @classmethod
@@ -228,7 +234,7 @@ class TenantDeleteExecutor(core_executors.DeleteExecutor):
         ]
 
 
-class TenantAllocateFloatingIPExecutor(core_executors.ActionExecutor):
+class TenantAllocateFloatingIPExecutor(openstack_base_executors.ActionExecutor):
 
     @classmethod
     def get_task_signature(cls, tenant, serialized_tenant, **kwargs):
@@ -236,7 +242,7 @@ class TenantAllocateFloatingIPExecutor(core_executors.ActionExecutor):
             serialized_tenant, 'allocate_floating_ip_address', state_transition='begin_updating')
 
 
-class FloatingIPCreateExecutor(core_executors.CreateExecutor):
+class FloatingIPCreateExecutor(openstack_base_executors.CreateExecutor):
 
     @classmethod
     def get_task_signature(cls, floating_ip, serialized_floating_ip, **kwargs):
@@ -244,7 +250,7 @@ class FloatingIPCreateExecutor(core_executors.CreateExecutor):
             serialized_floating_ip, 'create_floating_ip', state_transition='begin_creating')
 
 
-class FloatingIPDeleteExecutor(core_executors.DeleteExecutor):
+class FloatingIPDeleteExecutor(openstack_base_executors.DeleteExecutor):
 
     @classmethod
     def get_task_signature(cls, floating_ip, serialized_floating_ip, **kwargs):
@@ -252,7 +258,7 @@ class FloatingIPDeleteExecutor(core_executors.DeleteExecutor):
             serialized_floating_ip, 'delete_floating_ip', state_transition='begin_deleting')
 
 
-class FloatingIPPullExecutor(core_executors.ActionExecutor):
+class FloatingIPPullExecutor(openstack_base_executors.PullExecutor):
 
     @classmethod
     def get_task_signature(cls, floating_ip, serialized_floating_ip, **kwargs):
@@ -260,7 +266,7 @@ class FloatingIPPullExecutor(core_executors.ActionExecutor):
             serialized_floating_ip, 'pull_floating_ip', state_transition='begin_updating')
 
 
-class TenantPullFloatingIPsExecutor(core_executors.ActionExecutor):
+class TenantPullFloatingIPsExecutor(openstack_base_executors.PullExecutor):
 
     @classmethod
     def get_task_signature(cls, tenant, serialized_tenant, **kwargs):
@@ -268,7 +274,7 @@ class TenantPullFloatingIPsExecutor(core_executors.ActionExecutor):
             serialized_tenant, 'pull_tenant_floating_ips', state_transition='begin_updating')
 
 
-class TenantPushQuotasExecutor(core_executors.ActionExecutor):
+class TenantPushQuotasExecutor(openstack_base_executors.ActionExecutor):
 
     @classmethod
     def get_task_signature(cls, tenant, serialized_tenant, quotas=None, **kwargs):
@@ -276,7 +282,7 @@ class TenantPushQuotasExecutor(core_executors.ActionExecutor):
             serialized_tenant, 'push_tenant_quotas', quotas, state_transition='begin_updating')
 
 
-class TenantPullQuotasExecutor(core_executors.ActionExecutor):
+class TenantPullQuotasExecutor(openstack_base_executors.PullExecutor):
 
     @classmethod
     def get_task_signature(cls, tenant, serialized_tenant, **kwargs):
@@ -284,20 +290,23 @@ class TenantPullQuotasExecutor(core_executors.ActionExecutor):
             serialized_tenant, 'pull_tenant_quotas', state_transition='begin_updating')
 
 
-class TenantPullExecutor(core_executors.ActionExecutor):
+class TenantPullExecutor(openstack_base_executors.PullExecutor):
 
     @classmethod
     def get_task_signature(cls, tenant, serialized_tenant, **kwargs):
-        return chain(
-            core_tasks.BackendMethodTask().si(
-                serialized_tenant, 'pull_tenant', state_transition='begin_updating'),
-            core_tasks.BackendMethodTask().si(serialized_tenant, 'pull_tenant_quotas'),
-            core_tasks.BackendMethodTask().si(serialized_tenant, 'pull_tenant_floating_ips'),
-            core_tasks.BackendMethodTask().si(serialized_tenant, 'pull_tenant_security_groups'),
+        return openstack_base_tasks.CompositeBackendMethodTask().si(
+            serialized_tenant,
+            [
+                'pull_tenant',
+                'pull_tenant_quotas',
+                'pull_tenant_floating_ips',
+                'pull_tenant_security_groups',
+            ],
+            state_transition='begin_updating',
         )
 
 
-class TenantPullSecurityGroupsExecutor(core_executors.ActionExecutor):
+class TenantPullSecurityGroupsExecutor(openstack_base_executors.PullExecutor):
 
     @classmethod
     def get_task_signature(cls, tenant, serialized_tenant, **kwargs):
@@ -306,7 +315,7 @@ class TenantPullSecurityGroupsExecutor(core_executors.ActionExecutor):
             state_transition='begin_updating')
 
 
-class TenantDetectExternalNetworkExecutor(core_executors.ActionExecutor):
+class TenantDetectExternalNetworkExecutor(openstack_base_executors.ActionExecutor):
 
     @classmethod
     def get_task_signature(cls, tenant, serialized_tenant, **kwargs):
@@ -315,7 +324,7 @@ class TenantDetectExternalNetworkExecutor(core_executors.ActionExecutor):
             state_transition='begin_updating')
 
 
-class TenantChangeUserPasswordExecutor(core_executors.ActionExecutor):
+class TenantChangeUserPasswordExecutor(openstack_base_executors.ActionExecutor):
 
     @classmethod
     def get_task_signature(cls, tenant, serialized_tenant, **kwargs):
@@ -324,7 +333,7 @@ class TenantChangeUserPasswordExecutor(core_executors.ActionExecutor):
             state_transition='begin_updating')
 
 
-class NetworkCreateExecutor(core_executors.CreateExecutor):
+class NetworkCreateExecutor(openstack_base_executors.CreateExecutor):
 
     @classmethod
     def get_task_signature(cls, network, serialized_network, **kwargs):
@@ -332,7 +341,7 @@ class NetworkCreateExecutor(core_executors.CreateExecutor):
             serialized_network, 'create_network', state_transition='begin_creating')
 
 
-class NetworkUpdateExecutor(core_executors.UpdateExecutor):
+class NetworkUpdateExecutor(openstack_base_executors.UpdateExecutor):
 
     @classmethod
     def get_task_signature(cls, network, serialized_network, **kwargs):
@@ -340,7 +349,7 @@ class NetworkUpdateExecutor(core_executors.UpdateExecutor):
             serialized_network, 'update_network', state_transition='begin_updating')
 
 
-class NetworkDeleteExecutor(core_executors.DeleteExecutor):
+class NetworkDeleteExecutor(openstack_base_executors.DeleteExecutor):
 
     @classmethod
     def get_task_signature(cls, network, serialized_network, **kwargs):
@@ -351,7 +360,7 @@ class NetworkDeleteExecutor(core_executors.DeleteExecutor):
             return core_tasks.StateTransitionTask().si(serialized_network, state_transition='begin_deleting')
 
 
-class NetworkPullExecutor(core_executors.ActionExecutor):
+class NetworkPullExecutor(openstack_base_executors.PullExecutor):
     action = 'pull'
 
     @classmethod
@@ -360,14 +369,14 @@ class NetworkPullExecutor(core_executors.ActionExecutor):
             serialized_network, 'pull_network', state_transition='begin_updating')
 
 
-class SubNetCreateExecutor(core_executors.CreateExecutor):
+class SubNetCreateExecutor(openstack_base_executors.CreateExecutor):
 
     @classmethod
     def get_task_signature(cls, subnet, serialized_subnet, **kwargs):
         return core_tasks.BackendMethodTask().si(serialized_subnet, 'create_subnet', state_transition='begin_creating')
 
 
-class SubNetUpdateExecutor(core_executors.UpdateExecutor):
+class SubNetUpdateExecutor(openstack_base_executors.UpdateExecutor):
 
     @classmethod
     def get_task_signature(cls, subnet, serialized_subnet, **kwargs):
@@ -375,7 +384,7 @@ class SubNetUpdateExecutor(core_executors.UpdateExecutor):
             serialized_subnet, 'update_subnet', state_transition='begin_updating')
 
 
-class SubNetDeleteExecutor(core_executors.DeleteExecutor):
+class SubNetDeleteExecutor(openstack_base_executors.DeleteExecutor):
 
     @classmethod
     def get_task_signature(cls, subnet, serialized_subnet, **kwargs):
@@ -386,7 +395,7 @@ class SubNetDeleteExecutor(core_executors.DeleteExecutor):
             return core_tasks.StateTransitionTask().si(serialized_subnet, state_transition='begin_deleting')
 
 
-class SubNetPullExecutor(core_executors.ActionExecutor):
+class SubNetPullExecutor(openstack_base_executors.PullExecutor):
     action = 'pull'
 
     @classmethod
@@ -395,7 +404,7 @@ class SubNetPullExecutor(core_executors.ActionExecutor):
             serialized_subnet, 'pull_subnet', state_transition='begin_updating')
 
 
-class OpenStackCleanupExecutor(structure_executors.BaseCleanupExecutor):
+class OpenStackCleanupExecutor(openstack_base_executors.CleanupExecutor):
     executors = (
         (models.SecurityGroup, SecurityGroupDeleteExecutor),
         (models.FloatingIP, FloatingIPDeleteExecutor),
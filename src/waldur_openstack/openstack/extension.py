@@ -91,9 +91,23 @@ class OpenStackExtension(WaldurExtension):
             # If this flag is true - manager can execute actions that will
             # change cost of the project: delete tenants, change their configuration
             'MANAGER_CAN_MANAGE_TENANTS': False,
-            'TENANT_CREDENTIALS_VISIBLE': True
+            'TENANT_CREDENTIALS_VISIBLE': True,
+            # Default limit of parallel requests to a single cloud during bulk operations.
+            # Could be overridden by "max_concurrent_requests" option of service settings.
+            'MAX_CONCURRENT_REQUESTS': 10,
+            # Requests to pull the same object within this time in seconds are coalesced into single pull.
+            'PULL_COALESCING_WINDOW': 10,
+            # Celery queue and priority of OpenStack tasks by category: "interactive" for user actions,
+            # "provisioning", "sync" for pulls and "cleanup". Not configured categories use default queues.
+            'TASK_QUEUES': {},
+            'TASK_PRIORITIES': {},
         }
 
+    @staticmethod
+    def update_settings(settings):
+        from waldur_openstack.openstack_base.routing import register_router
+        register_router(settings)
+
     @staticmethod
     def django_app():
         return 'waldur_openstack.openstack'
@@ -34,6 +34,7 @@ class TenantCreateSuccessTask(core_tasks.StateTransitionTask):
 
 class TenantPullQuotas(core_tasks.BackgroundTask):
     name = 'openstack.TenantPullQuotas'
+    task_category = 'sync'
 
     def is_equal(self, other_task):
         return self.name == other_task.get('name')
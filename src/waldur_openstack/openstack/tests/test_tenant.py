@@ -866,3 +866,12 @@ class TenantExecutorTest(test.APITransactionTestCase):
                                                                   'openstack.tenant:1',
                                                                   skip_connection_extnet=False)
         self.assertEqual(len([t.args for t in chain.tasks if 'connect_tenant_to_external_network' in t.args]), 1)
+
+    def test_tenant_resources_are_deleted_by_plain_chain(self):
+        self.tenant.backend_id = 'tenant_id'
+        chain = executors.TenantDeleteExecutor.get_task_signature(self.tenant, 'openstack.tenant:1')
+        self.assertTrue(all('backend_method' in task.kwargs or 'backend_check_method' in task.kwargs
+                            for task in chain.tasks[1:]))
+        backend_methods = [task.kwargs.get('backend_method') for task in chain.tasks]
+        self.assertLess(backend_methods.index('delete_tenant_instances'),
+                        backend_methods.index('delete_tenant_volumes'))
@@ -1,12 +1,15 @@
 from ddt import data, ddt
 import mock
 
+from cinderclient import exceptions as cinder_exceptions
+from django.db import IntegrityError
 from rest_framework import test
 from keystoneclient import exceptions as keystone_exceptions
 
 from waldur_openstack.openstack import models
 from waldur_openstack.openstack.backend import OpenStackBackend
 from waldur_openstack.openstack.tests import fixtures, factories
+from waldur_openstack.openstack_base.backend import OpenStackBackendError
 
 
 class MockedSession(mock.MagicMock):
@@ -118,6 +121,25 @@ class PullFloatingIPTest(BaseBackendTestCase):
         floating_ip.refresh_from_db()
         self.assertEqual(floating_ip.runtime_state, 'ACTIVE')
 
+    def test_floating_ips_of_other_tenants_are_committed_if_one_of_them_fails(self):
+        floating_ip = self.fixture.floating_ip
+        failed_tenant = factories.TenantFactory(service_project_link=self.fixture.openstack_spl)
+        failed_floating_ip = factories.FloatingIPFactory(
+            tenant=failed_tenant, service_project_link=self.fixture.openstack_spl)
+        self.setup_client(True, dict(floatingips=[]))
+        remove_stale_floating_ips = self.backend._remove_stale_floating_ips
+
+        def remove_or_fail(tenants, floating_ips):
+            remove_stale_floating_ips(tenants, floating_ips)
+            if tenants[0] == failed_tenant:
+                raise IntegrityError()
+
+        with mock.patch.object(self.backend, '_remove_stale_floating_ips', side_effect=remove_or_fail):
+            self.assertRaises(OpenStackBackendError, self.backend.pull_floating_ips)
+
+        self.assertRaises(models.FloatingIP.DoesNotExist, floating_ip.refresh_from_db)
+        self.assertTrue(models.FloatingIP.objects.filter(pk=failed_floating_ip.pk).exists())
+
 
 @ddt
 class PullSecurityGroupsTest(BaseBackendTestCase):
@@ -530,3 +552,60 @@ class PullImagesTest(BaseBackendTestCase):
         self.mocked_glance().images.list.return_value[0]['status'] = 'deleted'
         self.backend.pull_images()
         self.assertEqual(models.Image.objects.count(), 0)
+
+
+class TenantResourcesDeletionCheckTest(BaseBackendTestCase):
+
+    def setUp(self):
+        super(TenantResourcesDeletionCheckTest, self).setUp()
+        volumes_limit = mock.Mock(value=15)
+        volumes_limit.name = 'totalVolumesUsed'
+        self.mocked_cinder().limits.get.return_value.absolute = [volumes_limit]
+
+    def test_volumes_are_listed_with_limit(self):
+        self.mocked_cinder().volumes.list.return_value = []
+
+        self.assertTrue(self.backend.are_all_tenant_volumes_deleted(self.tenant))
+        self.mocked_cinder().volumes.list.assert_called_once_with(detailed=False, limit=1)
+        self.mocked_cinder().limits.get.assert_not_called()
+
+    @mock.patch('waldur_openstack.openstack.backend.logger')
+    def test_remaining_volumes_count_is_logged(self, logger):
+        self.mocked_cinder().volumes.list.return_value = [mock.Mock()]
+
+        self.assertFalse(self.backend.are_all_tenant_volumes_deleted(self.tenant))
+        logger.info.assert_called_once_with(
+            '%s %s are left for deletion in tenant %s.', 15, 'volumes', self.tenant.backend_id)
+
+    def test_remaining_volumes_count_does_not_change_quota_usage(self):
+        self.tenant.set_quota_usage(self.tenant.Quotas.volumes, 3)
+        self.mocked_cinder().volumes.list.return_value = [mock.Mock()]
+
+        self.backend.are_all_tenant_volumes_deleted(self.tenant)
+        self.assertEqual(self.tenant.quotas.get(name=self.tenant.Quotas.volumes).usage, 3)
+
+
+class DeleteTenantResourcesTest(BaseBackendTestCase):
+
+    def setUp(self):
+        super(DeleteTenantResourcesTest, self).setUp()
+        self.fixture.openstack_service_settings.options['max_concurrent_requests'] = 4
+        self.volumes = [mock.Mock(id=str(index)) for index in range(10)]
+        self.mocked_cinder().volumes.list.return_value = self.volumes
+
+    def test_all_volumes_are_deleted(self):
+        self.backend.delete_tenant_volumes(self.tenant)
+
+        for volume in self.volumes:
+            volume.force_delete.assert_called_once_with()
+
+    @mock.patch('waldur_openstack.openstack_base.backend.connections')
+    def test_database_connections_of_worker_threads_are_closed(self, connections):
+        self.backend.delete_tenant_volumes(self.tenant)
+
+        self.assertEqual(connections.close_all.call_count, len(self.volumes))
+
+    def test_error_is_reraised_if_any_volume_is_not_deleted(self):
+        self.volumes[5].force_delete.side_effect = cinder_exceptions.ClientException(500)
+
+        self.assertRaises(OpenStackBackendError, self.backend.delete_tenant_volumes, self.tenant)
@@ -1,14 +1,19 @@
 import datetime
+import functools
 import hashlib
 import logging
+from multiprocessing.pool import ThreadPool
 
 from ceilometerclient import client as ceilometer_client
 from ceilometerclient import exc as ceilometer_exceptions
 from cinderclient import exceptions as cinder_exceptions
 from cinderclient.v2 import client as cinder_client
+from django.conf import settings as django_settings
 from django.core.cache import cache
-from django.db import transaction
+from django.db import connections, router, transaction, IntegrityError
+from django.db.models import Case, CharField, F, Value, When
 from django.utils import timezone
+from django.utils.functional import cached_property
 from glanceclient import exc as glance_exceptions
 from glanceclient.v2 import client as glance_client
 from keystoneauth1 import session as keystone_session
@@ -25,6 +30,9 @@ import six
 from waldur_core.structure import ServiceBackend
 from waldur_core.structure.exceptions import SerializableBackendError
 from waldur_openstack.openstack.models import Tenant
+from waldur_openstack.openstack_base import signals
+from waldur_openstack.openstack_base.handlers import propagate_deferred_handlers
+from waldur_openstack.openstack_base.models import BackendFingerprintMixin
 
 logger = logging.getLogger(__name__)
 
@@ -41,6 +49,49 @@ class OpenStackAuthorizationFailed(OpenStackBackendError):
     pass
 
 
+def sync_stage(stage, timeout=10 * 60, max_runs=3):
+    """ Allow only one run of the sync stage per service settings at a time.
+
+    Request that arrives while the stage is running is attached to it and returns immediately:
+    it sets pending flag and the running stage is repeated after completion, so that changes
+    made in the meantime are still pulled. Number of runs in a row is limited, the request left
+    pending after that is covered by the next sync. Timeout protects against the lock left by a killed worker.
+    Decorated method is called for its side effects only, its result is not returned.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapped(self, *args, **kwargs):
+            lock_key = 'openstack_sync_%s_%s' % (self.settings.uuid.hex, stage)
+            pending_key = lock_key + '_pending'
+
+            if not cache.add(lock_key, True, timeout):
+                cache.set(pending_key, True, timeout)
+                # The lock could have been released before pending flag was set, then nobody repeats the stage.
+                if not cache.add(lock_key, True, timeout):
+                    logger.debug('Sync stage %s of service settings %s is already running, '
+                                 'request is attached to it.', stage, self.settings)
+                    return
+
+            for run in range(1, max_runs + 1):
+                cache.delete(pending_key)
+                try:
+                    func(self, *args, **kwargs)
+                finally:
+                    cache.delete(lock_key)
+                # Pending flag is checked after the lock is released, so that attached request
+                # either acquires the lock on its own or is seen here.
+                if not cache.get(pending_key):
+                    return
+                if run == max_runs:
+                    logger.info('Sync stage %s of service settings %s has been run %s times in a row, '
+                                'pending request is left for the next sync.', stage, self.settings, max_runs)
+                    return
+                if not cache.add(lock_key, True, timeout):
+                    return
+        return wrapped
+    return decorator
+
+
 class OpenStackSession(dict):
     """ Serializable session """
 
@@ -91,7 +142,10 @@ class OpenStackSession(dict):
 
 
 class OpenStackClient(object):
-    """ Generic OpenStack client. """
+    """ Generic OpenStack client.
+
+    Service clients are created once per object and share the same session.
+    """
 
     def __init__(self, session=None, verify_ssl=False, **credentials):
         self.verify_ssl = verify_ssl
@@ -109,11 +163,11 @@ class OpenStackClient(object):
                 logger.error('Failed to create OpenStack session.')
                 six.reraise(OpenStackBackendError, e)
 
-    @property
+    @cached_property
     def keystone(self):
         return keystone_client.Client(session=self.session.keystone_session, interface='public')
 
-    @property
+    @cached_property
     def nova(self):
         try:
             return nova_client.Client(version='2', session=self.session.keystone_session, endpoint_type='publicURL')
@@ -121,7 +175,7 @@ class OpenStackClient(object):
             logger.exception('Failed to create nova client: %s', e)
             six.reraise(OpenStackBackendError, e)
 
-    @property
+    @cached_property
     def neutron(self):
         try:
             return neutron_client.Client(session=self.session.keystone_session)
@@ -129,7 +183,7 @@ class OpenStackClient(object):
             logger.exception('Failed to create neutron client: %s', e)
             six.reraise(OpenStackBackendError, e)
 
-    @property
+    @cached_property
     def cinder(self):
         try:
             return cinder_client.Client(session=self.session.keystone_session)
@@ -137,7 +191,7 @@ class OpenStackClient(object):
             logger.exception('Failed to create cinder client: %s', e)
             six.reraise(OpenStackBackendError, e)
 
-    @property
+    @cached_property
     def glance(self):
         try:
             return glance_client.Client(session=self.session.keystone_session)
@@ -145,7 +199,7 @@ class OpenStackClient(object):
             logger.exception('Failed to create glance client: %s', e)
             six.reraise(OpenStackBackendError, e)
 
-    @property
+    @cached_property
     def ceilometer(self):
         try:
             return ceilometer_client.Client('2', session=self.session.keystone_session)
@@ -195,6 +249,8 @@ class BaseOpenStackBackend(ServiceBackend):
                 client = OpenStackClient(session=session)
             except (OpenStackSessionExpired, OpenStackAuthorizationFailed):
                 pass
+            else:
+                setattr(self, attr_name, client)  # Do not recover the same session again
 
         if client is None:  # create new token if session is not cached or expired
             client = OpenStackClient(**credentials)
@@ -218,6 +274,41 @@ class BaseOpenStackBackend(ServiceBackend):
         raise AttributeError(
             "'%s' object has no attribute '%s'" % (self.__class__.__name__, name))
 
+    def get_max_concurrent_requests(self):
+        default = getattr(django_settings, 'WALDUR_OPENSTACK', {}).get('MAX_CONCURRENT_REQUESTS', 1)
+        return self.settings.options.get('max_concurrent_requests', default)
+
+    def _execute_concurrently(self, func, items):
+        """ Call function for each item in a pool of threads.
+
+        Pool size is limited by "max_concurrent_requests" option of service settings
+        so that a single cloud is not flooded with requests.
+        Exception raised by any call is re-raised after all calls are finished.
+        Function should only send requests to the backend, database should be updated
+        with returned results in the calling thread.
+        """
+        items = list(items)
+        pool_size = min(self.get_max_concurrent_requests(), len(items))
+        if pool_size <= 1:
+            return [func(item) for item in items]
+
+        @propagate_deferred_handlers
+        def call(item):
+            try:
+                return func(item)
+            finally:
+                # Database connections are thread local, do not leave them open in workers.
+                connections.close_all()
+
+        # Make sure that session is created before it is shared between threads.
+        self.get_client()
+        pool = ThreadPool(pool_size)
+        try:
+            return pool.map(call, items)
+        finally:
+            pool.close()
+            pool.join()
+
     def ping(self, raise_exception=False):
         try:
             self.keystone_client
@@ -359,6 +450,198 @@ class BaseOpenStackBackend(ServiceBackend):
     def _get_current_properties(self, model):
         return {p.backend_id: p for p in model.objects.filter(settings=self.settings)}
 
+    def _upsert_properties(self, model, properties, chunk_size=500):
+        """ Create or update service properties of current settings with bulk queries.
+
+        Properties is a dictionary that maps backend ID to dictionary of pulled fields.
+        On PostgreSQL single INSERT ... ON CONFLICT statement is executed per chunk of properties,
+        so concurrent pulls of the same settings do not fail with IntegrityError.
+        On other databases missing properties are created with bulk_create and changed ones are updated.
+        """
+        if issubclass(model, BackendFingerprintMixin):
+            properties = self._exclude_unchanged_properties(model, properties)
+
+        # Only pulled fields are updated, so properties with different set of fields are not mixed.
+        groups = {}
+        for backend_id, defaults in properties.items():
+            groups.setdefault(tuple(sorted(defaults)), []).append(backend_id)
+
+        connection = connections[router.db_for_write(model)]
+        for field_names, backend_ids in groups.items():
+            for index in range(0, len(backend_ids), chunk_size):
+                chunk = {backend_id: properties[backend_id] for backend_id in backend_ids[index:index + chunk_size]}
+                if connection.vendor == 'postgresql':
+                    self._upsert_properties_on_conflict(connection, model, field_names, chunk)
+                else:
+                    self._upsert_properties_portable(model, chunk)
+
+    def _exclude_unchanged_properties(self, model, properties):
+        """ Skip properties with the same fingerprint, fingerprint of other ones is stored on upsert """
+        fingerprints = dict(
+            model.objects.filter(settings=self.settings).values_list('backend_id', 'backend_fingerprint'))
+        changed_properties = {}
+        for backend_id, defaults in properties.items():
+            fingerprint = model.get_fingerprint(defaults)
+            if fingerprints.get(backend_id) != fingerprint:
+                changed_properties[backend_id] = dict(defaults, backend_fingerprint=fingerprint)
+        return changed_properties
+
+    def _upsert_properties_on_conflict(self, connection, model, field_names, properties):
+        quote_name = connection.ops.quote_name
+        fields = [field for field in model._meta.concrete_fields if not field.primary_key]
+        update_columns = [model._meta.get_field(name).column for name in field_names]
+        if 'modified' in [field.name for field in fields]:
+            update_columns.append(model._meta.get_field('modified').column)
+
+        params = []
+        for backend_id, defaults in properties.items():
+            obj = model(settings=self.settings, backend_id=backend_id, **defaults)
+            params.extend(field.get_db_prep_save(field.pre_save(obj, True), connection) for field in fields)
+
+        sql = 'INSERT INTO %s (%s) VALUES %s ON CONFLICT (%s, %s) DO UPDATE SET %s' % (
+            quote_name(model._meta.db_table),
+            ', '.join(quote_name(field.column) for field in fields),
+            ', '.join(['(%s)' % ', '.join(['%s'] * len(fields))] * len(properties)),
+            quote_name(model._meta.get_field('settings').column),
+            quote_name(model._meta.get_field('backend_id').column),
+            ', '.join('%s = EXCLUDED.%s' % (quote_name(column), quote_name(column)) for column in update_columns),
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+
+    def _upsert_properties_portable(self, model, properties, attempts=2):
+        """ Update changed properties and create missing ones.
+
+        If missing properties are created concurrently, existing ones are queried again,
+        so that only properties that are still missing are created.
+        """
+        has_modified = 'modified' in [field.name for field in model._meta.concrete_fields]
+        for attempt in range(attempts):
+            existing = model.objects.filter(settings=self.settings, backend_id__in=properties.keys())
+            existing = {obj.backend_id: obj for obj in existing}
+
+            new_objects = []
+            updates = {}
+            for backend_id, defaults in properties.items():
+                obj = existing.get(backend_id)
+                if obj is None:
+                    new_objects.append(model(settings=self.settings, backend_id=backend_id, **defaults))
+                    continue
+                changes = {name: value for name, value in defaults.items() if getattr(obj, name) != value}
+                if changes:
+                    key = tuple(sorted((name, repr(value)) for name, value in changes.items()))
+                    updates.setdefault(key, (changes, []))[1].append(obj.pk)
+
+            for changes, pks in updates.values():
+                if has_modified:
+                    changes['modified'] = timezone.now()
+                model.objects.filter(pk__in=pks).update(**changes)
+
+            try:
+                with transaction.atomic():
+                    model.objects.bulk_create(new_objects)
+                return
+            except IntegrityError:
+                logger.info('Some of %s objects with backend IDs %s and service settings %s have been created '
+                            'concurrently.', model.__name__, ', '.join(obj.backend_id for obj in new_objects),
+                            self.settings)
+
+        logger.warning('Could not create %s objects with backend IDs %s and service settings %s '
+                       'due to concurrent update.', model.__name__,
+                       ', '.join(obj.backend_id for obj in new_objects), self.settings)
+
+    def _get_pulled_resources(self, queryset, backend_resources, get_fields, chunk_size=500):
+        """ Match local resources with backend ones loading only resources that could be changed.
+
+        Fingerprint of pulled fields is calculated for each backend resource. Local resources
+        with the same fingerprint that are not erred are skipped without loading, so that
+        steady state pull does not load, compare or save unchanged rows.
+        Return list of (resource, backend_resource, fields) tuples and list of resources missing at backend.
+        """
+        model = queryset.model
+        backend_resources_map = {}
+        for backend_resource in backend_resources:
+            backend_resource.backend_fingerprint = model.get_object_fingerprint(
+                backend_resource, get_fields(backend_resource))
+            backend_resources_map[backend_resource.backend_id] = backend_resource
+
+        changed_ids = []
+        rows = queryset.values_list('pk', 'backend_id', 'backend_fingerprint', 'state', 'error_message')
+        for pk, backend_id, fingerprint, state, error_message in rows:
+            backend_resource = backend_resources_map.get(backend_id)
+            if (backend_resource is None or backend_resource.backend_fingerprint != fingerprint or
+                    state == model.States.ERRED or error_message):
+                changed_ids.append(pk)
+
+        pulled_resources = []
+        missing_resources = []
+        for index in range(0, len(changed_ids), chunk_size):
+            for resource in queryset.filter(pk__in=changed_ids[index:index + chunk_size]):
+                backend_resource = backend_resources_map.get(resource.backend_id)
+                if backend_resource is None:
+                    missing_resources.append(resource)
+                else:
+                    pulled_resources.append((resource, backend_resource, get_fields(backend_resource)))
+        return pulled_resources, missing_resources
+
+    def _bulk_update_pulled_resources(self, model, pulled_resources, chunk_size=500):
+        """ Apply pulled fields to resources writing only changed rows.
+
+        pulled_resources is a list of (resource, backend_resource, fields) tuples.
+        Fields are compared in memory, rows with the same changes are updated by single query.
+        Erred resources are recovered and error message is cleared as in handle_resource_update_success,
+        state is changed with FSM transition, so that its signals are sent as usual.
+        Fingerprints of backend resources are stored in the same query, they do not split rows into groups.
+        As bulk update does not send post_save signal, resources_pulled signal is sent once for all changed resources.
+        """
+        updates = {}
+        fingerprints = {}
+        changed_resources = []
+        changed_fields = {}
+        for resource, backend_resource, fields in pulled_resources:
+            changes = {}
+            for field in fields:
+                pulled_value = getattr(backend_resource, field)
+                if getattr(resource, field) != pulled_value:
+                    setattr(resource, field, pulled_value)
+                    changes[field] = pulled_value
+            if resource.error_message:
+                resource.error_message = ''
+                changes['error_message'] = ''
+            if resource.state == resource.States.ERRED:
+                resource.recover()
+                changes['state'] = resource.state
+            fingerprint = getattr(backend_resource, 'backend_fingerprint', None)
+            if fingerprint is not None and resource.backend_fingerprint != fingerprint:
+                fingerprints[resource.pk] = fingerprint
+            if changes:
+                changed_resources.append(resource)
+                changed_fields[resource.pk] = set(changes)
+            if changes or resource.pk in fingerprints:
+                key = tuple(sorted((field, repr(value)) for field, value in changes.items()))
+                updates.setdefault(key, (changes, []))[1].append(resource.pk)
+
+        now = timezone.now()
+        updated_count = 0
+        for changes, pks in updates.values():
+            if changes:
+                changes['modified'] = now
+                updated_count += len(pks)
+            for index in range(0, len(pks), chunk_size):
+                chunk = pks[index:index + chunk_size]
+                chunk_changes = dict(changes)
+                chunk_fingerprints = [When(pk=pk, then=Value(fingerprints[pk])) for pk in chunk if pk in fingerprints]
+                if chunk_fingerprints:
+                    chunk_changes['backend_fingerprint'] = Case(
+                        *chunk_fingerprints, default=F('backend_fingerprint'), output_field=CharField())
+                model.objects.filter(pk__in=chunk).update(**chunk_changes)
+
+        if changed_resources:
+            recovered_count = len([fields for fields in changed_fields.values() if 'state' in fields])
+            logger.info('%s of %s pulled %s objects of service settings %s were updated, %s of them were recovered.',
+                        updated_count, len(pulled_resources), model.__name__, self.settings, recovered_count)
+            signals.resources_pulled.send(sender=model, instances=changed_resources, changed_fields=changed_fields)
+
     def _pull_images(self, model_class, filter_function=None):
         glance = self.glance_client
         try:
@@ -372,17 +655,16 @@ class BaseOpenStackBackend(ServiceBackend):
 
         with transaction.atomic():
             cur_images = self._get_current_properties(model_class)
-            for backend_image in images:
-                cur_images.pop(backend_image['id'], None)
-                model_class.objects.update_or_create(
-                    settings=self.settings,
-                    backend_id=backend_image['id'],
-                    defaults={
-                        'name': backend_image['name'],
-                        'min_ram': backend_image['min_ram'],
-                        'min_disk': self.gb2mb(backend_image['min_disk']),
-                    })
-            model_class.objects.filter(backend_id__in=cur_images.keys(), settings=self.settings).delete()
+            self._upsert_properties(model_class, {
+                backend_image['id']: {
+                    'name': backend_image['name'],
+                    'min_ram': backend_image['min_ram'],
+                    'min_disk': self.gb2mb(backend_image['min_disk']),
+                }
+                for backend_image in images
+            })
+            stale_ids = set(cur_images) - set(backend_image['id'] for backend_image in images)
+            model_class.objects.filter(backend_id__in=stale_ids, settings=self.settings).delete()
 
     def _delete_backend_floating_ip(self, backend_id, tenant_backend_id):
         neutron = self.neutron_client
@@ -0,0 +1,62 @@
+from waldur_core.core import executors as core_executors
+from waldur_core.core import utils as core_utils
+from waldur_core.structure import executors as structure_executors
+
+from .routing import get_task_options, route_signature
+
+
+class RoutedExecutorMixin(object):
+    """ Send all tasks of the executor, including callbacks, to the queue of its category.
+
+    Category could be overridden on execution with "task_category" keyword argument,
+    for example, deletion of expired backups is executed as "cleanup".
+    """
+    task_category = 'interactive'
+
+    @classmethod
+    def get_routing_options(cls, task_category=None, is_heavy_task=False):
+        options = get_task_options(task_category or cls.task_category)
+        if is_heavy_task:
+            options['queue'] = 'heavy'
+        return options
+
+    @classmethod
+    def apply_signature(cls, instance, async=True, countdown=None, is_heavy_task=False, task_category=None, **kwargs):
+        options = cls.get_routing_options(task_category, is_heavy_task)
+        if not async or not options:
+            return super(RoutedExecutorMixin, cls).apply_signature(
+                instance, async=async, countdown=countdown, is_heavy_task=is_heavy_task, **kwargs)
+
+        serialized_instance = core_utils.serialize_instance(instance)
+        signature = cls.get_task_signature(instance, serialized_instance, **kwargs)
+        link = cls.get_success_signature(instance, serialized_instance, **kwargs)
+        link_error = cls.get_failure_signature(instance, serialized_instance, **kwargs)
+
+        route_signature(signature, options)
+        route_signature(link, options)
+        route_signature(link_error, options)
+        return signature.apply_async(link=link, link_error=link_error, countdown=countdown, **options)
+
+
+class CreateExecutor(RoutedExecutorMixin, core_executors.CreateExecutor):
+    task_category = 'provisioning'
+
+
+class UpdateExecutor(RoutedExecutorMixin, core_executors.UpdateExecutor):
+    pass
+
+
+class DeleteExecutor(RoutedExecutorMixin, core_executors.DeleteExecutor):
+    pass
+
+
+class ActionExecutor(RoutedExecutorMixin, core_executors.ActionExecutor):
+    pass
+
+
+class PullExecutor(ActionExecutor):
+    task_category = 'sync'
+
+
+class CleanupExecutor(RoutedExecutorMixin, structure_executors.BaseCleanupExecutor):
+    task_category = 'cleanup'
@@ -0,0 +1,75 @@
+import contextlib
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+_state = threading.local()
+_lock = threading.Lock()
+
+
+@contextlib.contextmanager
+def deferred_handlers():
+    """ Defer signal handlers of pulled objects until the end of the block.
+
+    Handlers that support deferring pass their arguments to defer function instead of
+    doing the work for each saved or deleted row. At the end of the block each batch
+    handler is called once with all collected items, so that it applies net changes in aggregated form.
+    Batches are applied only if the block succeeds. If it fails, they are discarded, because
+    deferred handlers only reflect pulled objects and the next sync pulls them again.
+    Nested blocks are merged into the outermost one. State is thread local,
+    functions called in other threads should be wrapped with propagate_deferred_handlers.
+
+    Quota handlers of waldur_core are not deferred: counter and total quota fields are changed
+    only on creation and deletion of resources, which pulls do not perform.
+    """
+    if getattr(_state, 'batches', None) is not None:
+        yield
+        return
+
+    _state.batches = {}
+    try:
+        yield
+    except Exception:
+        batches, _state.batches = _state.batches, None
+        if batches:
+            logger.warning('%s deferred handlers are discarded, because the block has failed.', len(batches))
+        raise
+
+    batches, _state.batches = _state.batches, None
+    for batch_handler, items in batches.items():
+        batch_handler(items)
+    if batches:
+        logger.debug('%s deferred handlers are applied to %s items.',
+                     len(batches), sum(len(items) for items in batches.values()))
+
+
+def propagate_deferred_handlers(func):
+    """ Wrap function that is called in another thread, so that its handlers
+        are deferred to the block of the calling thread.
+    """
+    batches = getattr(_state, 'batches', None)
+
+    def wrapped(*args, **kwargs):
+        previous_batches = getattr(_state, 'batches', None)
+        _state.batches = batches
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _state.batches = previous_batches
+
+    return wrapped
+
+
+def defer(batch_handler, item):
+    """ Collect item for batch handler if handlers are deferred.
+
+    Return False if handlers are not deferred, so that caller should handle item immediately.
+    """
+    batches = getattr(_state, 'batches', None)
+    if batches is None:
+        return False
+    # Batches could be shared with threads started in the block.
+    with _lock:
+        batches.setdefault(batch_handler, []).append(item)
+    return True
@@ -1,3 +1,7 @@
+import hashlib
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
 from django.core.validators import MaxValueValidator
 from django.db import models
 from django.utils.encoding import python_2_unicode_compatible
@@ -53,6 +57,35 @@ class Port(core_models.BackendModelMixin, models.Model):
         return super(Port, cls).get_backend_fields() + ('ip4_address', 'ip6_address', 'mac_address')
 
 
+class BackendFingerprintMixin(models.Model):
+    """ Store hash of fields pulled from backend, so that pull skips objects that are not changed.
+
+    Fingerprint is reset when object is saved, because it may be changed locally
+    and should be compared with backend on the next pull.
+    """
+    backend_fingerprint = models.CharField(max_length=32, blank=True, editable=False)
+
+    class Meta(object):
+        abstract = True
+
+    @classmethod
+    def get_fingerprint(cls, values):
+        """ Calculate fingerprint of dictionary of field values, JSON fields are included as is """
+        payload = json.dumps(values, sort_keys=True, cls=DjangoJSONEncoder)
+        return hashlib.md5(payload.encode('utf-8')).hexdigest()
+
+    @classmethod
+    def get_object_fingerprint(cls, obj, fields):
+        return cls.get_fingerprint({field: getattr(obj, cls._meta.get_field(field).attname) for field in fields})
+
+    def save(self, *args, **kwargs):
+        self.backend_fingerprint = ''
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'backend_fingerprint' not in update_fields:
+            kwargs['update_fields'] = list(update_fields) + ['backend_fingerprint']
+        return super(BackendFingerprintMixin, self).save(*args, **kwargs)
+
+
 class BaseImage(structure_models.ServiceProperty):
     min_disk = models.PositiveIntegerField(default=0, help_text=_('Minimum disk size in MiB'))
     min_ram = models.PositiveIntegerField(default=0, help_text=_('Minimum memory size in MiB'))
@@ -0,0 +1,59 @@
+from celery import current_app
+from django.conf import settings
+
+ROUTER = 'waldur_openstack.openstack_base.routing.OpenStackTaskRouter'
+
+
+def get_task_options(category):
+    """ Get queue and priority of OpenStack tasks of given category.
+
+    Queues and priorities are configured in TASK_QUEUES and TASK_PRIORITIES
+    of WALDUR_OPENSTACK and WALDUR_OPENSTACK_TENANT settings by category:
+    "interactive", "provisioning", "sync" or "cleanup".
+    Tasks of category without configured queue are routed as usual.
+    """
+    queues = {}
+    priorities = {}
+    for settings_name in ('WALDUR_OPENSTACK', 'WALDUR_OPENSTACK_TENANT'):
+        queues.update(getattr(settings, settings_name, {}).get('TASK_QUEUES', {}))
+        priorities.update(getattr(settings, settings_name, {}).get('TASK_PRIORITIES', {}))
+
+    options = {}
+    if queues.get(category):
+        options['queue'] = queues[category]
+    if priorities.get(category) is not None:
+        options['priority'] = priorities[category]
+    return options
+
+
+def route_signature(signature, options):
+    """ Set options of all tasks of the signature, including tasks nested in chains and groups """
+    if signature is None or not options:
+        return signature
+
+    # Only chains and groups have nested tasks.
+    tasks = getattr(signature, 'tasks', None)
+    if tasks:
+        for task in tasks:
+            route_signature(task, options)
+    else:
+        signature.set(**options)
+    return signature
+
+
+def register_router(settings):
+    """ Put OpenStack router before default one, so it has priority over it """
+    routes = tuple(settings.get('CELERY_TASK_ROUTES', ()))
+    if ROUTER not in routes:
+        settings['CELERY_TASK_ROUTES'] = (ROUTER,) + routes
+
+
+class OpenStackTaskRouter(object):
+    """ Route tasks with "task_category" attribute, for example, periodic tasks, to the queue of category """
+
+    def route_for_task(self, task_name, *args, **kwargs):
+        task = current_app.tasks.get(task_name)
+        category = getattr(task, 'task_category', None)
+        if category:
+            return get_task_options(category) or None
+        return None
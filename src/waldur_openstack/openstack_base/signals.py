@@ -0,0 +1,5 @@
+from django.dispatch import Signal
+
+# Sent once per model after pulled resources are updated with bulk queries, which do not send post_save.
+# changed_fields maps primary key of each changed resource to the set of its changed fields.
+resources_pulled = Signal(providing_args=['instances', 'changed_fields'])
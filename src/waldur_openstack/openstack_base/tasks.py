@@ -0,0 +1,327 @@
+import logging
+import random
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from waldur_core.core import tasks as core_tasks
+from waldur_core.structure import SupportedServices, tasks as structure_tasks
+
+logger = logging.getLogger(__name__)
+
+
+class PollingPolicy(object):
+    """ Exponential backoff with jitter for polling of backend operations.
+
+    Delay before attempt N is initial_delay * factor ** N limited by max_delay
+    and randomly shifted by up to jitter share of its value.
+    Polling is stopped when total delay exceeds deadline (in seconds).
+    """
+    DEFAULTS = {
+        'initial_delay': 2,
+        'factor': 1.5,
+        'max_delay': 60,
+        'jitter': 0.2,
+        'deadline': None,
+        'learn': True,
+    }
+
+    def __init__(self, initial_delay, factor, max_delay, jitter, deadline=None, learn=True):
+        self.initial_delay = initial_delay
+        self.factor = factor
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.deadline = deadline
+        self.learn = learn
+
+    def get_nominal_delay(self, attempt):
+        return min(self.max_delay, self.initial_delay * self.factor ** attempt)
+
+    def get_delay(self, attempt):
+        delay = self.get_nominal_delay(attempt)
+        return max(0, delay + random.uniform(-self.jitter, self.jitter) * delay)
+
+    def get_elapsed_time(self, attempt):
+        """ Nominal time passed from the beginning of polling till given attempt """
+        return sum(self.get_nominal_delay(n) for n in range(attempt + 1))
+
+    def get_retry_time(self, attempt):
+        """ Nominal time passed from the first attempt till given attempt """
+        return sum(self.get_nominal_delay(n) for n in range(1, attempt + 1))
+
+    def get_max_retries(self, deadline):
+        deadline = self.deadline or deadline
+        attempt = 0
+        while self.get_elapsed_time(attempt) < deadline:
+            attempt += 1
+        return attempt
+
+
+def get_model_name(model):
+    service_name = SupportedServices.get_name_for_model(model).split('.')[0]
+    return '%s.%s' % (service_name, model._meta.object_name)
+
+
+def _get_completion_time_key(model, operation):
+    return 'openstack_polling_completion_time_%s_%s' % (get_model_name(model), operation)
+
+
+class PollingStats(object):
+    """ Exponential moving average of observed completion time of backend operations """
+    MIN_SAMPLES = 5
+    SMOOTHING = 0.2
+    TIMEOUT = 7 * 24 * 60 * 60
+
+    @classmethod
+    def get_average(cls, model, operation):
+        stats = cache.get(_get_completion_time_key(model, operation))
+        if stats and stats['count'] >= cls.MIN_SAMPLES:
+            return stats['average']
+
+    @classmethod
+    def record(cls, model, operation, duration):
+        key = _get_completion_time_key(model, operation)
+        stats = cache.get(key) or {'average': duration, 'count': 0}
+        stats['average'] += cls.SMOOTHING * (duration - stats['average'])
+        stats['count'] += 1
+        cache.set(key, stats, cls.TIMEOUT)
+
+
+def get_polling_policy(model, operation):
+    """ Get polling policy for given resource type and operation.
+
+    Policies are configured in POLLING_POLICIES of WALDUR_OPENSTACK and WALDUR_OPENSTACK_TENANT
+    settings by resource type (for example, "OpenStackTenant.Volume") and operation
+    (for example, "create"). Initial delay is replaced by average observed completion time
+    of the operation as soon as enough observations are collected.
+    """
+    policies = {}
+    for settings_name in ('WALDUR_OPENSTACK', 'WALDUR_OPENSTACK_TENANT'):
+        policies.update(getattr(settings, settings_name, {}).get('POLLING_POLICIES', {}))
+
+    model_policies = policies.get(get_model_name(model), {})
+    options = dict(PollingPolicy.DEFAULTS)
+    options.update(model_policies.get('default', {}))
+    options.update(model_policies.get(operation, {}))
+
+    policy = PollingPolicy(**options)
+    if policy.learn:
+        average = PollingStats.get_average(model, operation)
+        if average is not None:
+            policy.initial_delay = max(1, min(policy.max_delay, average))
+    return policy
+
+
+class ProvisionConcurrency(object):
+    """ Adaptive limit of concurrent provisioning of resources of the same type per service settings.
+
+    Limit is applied to provisioning (the "create" operation) only, other operations are not throttled.
+    Limit is increased additively while provisioning completes in usual time and
+    decreased multiplicatively (AIMD) when it fails or takes much longer than average.
+    MAX_CONCURRENT_PROVISION setting of the resource type is used as the ceiling.
+    State is updated under lock, because it is changed by polling tasks of different workers.
+    """
+    MIN_LIMIT = 1
+    DECREASE_FACTOR = 0.5
+    DECREASE_INTERVAL = 60
+    SLOWDOWN_RATIO = 2
+    TIMEOUT = 24 * 60 * 60
+    LOCK_TIMEOUT = 10
+    LOCK_ATTEMPTS = 20
+    LOCK_INTERVAL = 0.1
+
+    @classmethod
+    def get_ceiling(cls, model):
+        limits = {}
+        for settings_name in ('WALDUR_OPENSTACK', 'WALDUR_OPENSTACK_TENANT'):
+            limits.update(getattr(settings, settings_name, {}).get('MAX_CONCURRENT_PROVISION', {}))
+        return limits.get(get_model_name(model), structure_tasks.BaseThrottleProvisionTask.DEFAULT_LIMIT)
+
+    @classmethod
+    def _get_key(cls, resource):
+        service_settings = resource.service_project_link.service.settings
+        return 'openstack_provision_concurrency_%s_%s' % (service_settings.uuid.hex, get_model_name(resource))
+
+    @classmethod
+    def _get_state(cls, resource):
+        ceiling = cls.get_ceiling(resource)
+        state = cache.get(cls._get_key(resource)) or {'limit': ceiling, 'decreased_at': 0}
+        state['limit'] = max(cls.MIN_LIMIT, min(ceiling, state['limit']))
+        return state, ceiling
+
+    @classmethod
+    def _update_state(cls, resource, update):
+        """ Read, modify and store state under lock. Update is skipped if lock could not be acquired. """
+        key = cls._get_key(resource)
+        lock_key = key + '_lock'
+        for _ in range(cls.LOCK_ATTEMPTS):
+            if cache.add(lock_key, True, cls.LOCK_TIMEOUT):
+                break
+            time.sleep(cls.LOCK_INTERVAL)
+        else:
+            logger.warning('Provision concurrency of %s is not updated, because it is locked.', resource)
+            return
+
+        try:
+            state, ceiling = cls._get_state(resource)
+            if update(state, ceiling) is not False:
+                cache.set(key, state, cls.TIMEOUT)
+        finally:
+            cache.delete(lock_key)
+
+    @classmethod
+    def get_limit(cls, resource):
+        state, _ = cls._get_state(resource)
+        return int(state['limit'])
+
+    @classmethod
+    def record_success(cls, resource, duration, average=None):
+        if average is not None and duration > cls.SLOWDOWN_RATIO * average:
+            return cls.record_failure(resource)
+
+        def increase(state, ceiling):
+            state['limit'] = min(ceiling, state['limit'] + 1.0 / state['limit'])
+
+        cls._update_state(resource, increase)
+
+    @classmethod
+    def record_failure(cls, resource):
+        def decrease(state, ceiling):
+            now = time.time()
+            # Resources provisioned concurrently usually fail together, decrease limit only once for them.
+            if now - state['decreased_at'] < cls.DECREASE_INTERVAL:
+                return False
+            state['limit'] = max(cls.MIN_LIMIT, state['limit'] * cls.DECREASE_FACTOR)
+            state['decreased_at'] = now
+
+        cls._update_state(resource, decrease)
+
+
+def get_initial_delay(model, operation):
+    """ Countdown for the first polling attempt of the operation """
+    return get_polling_policy(model, operation).get_delay(0)
+
+
+class BackoffPollingMixin(object):
+    """ Retry polling according to the polling policy of the resource and operation.
+
+    Operation is passed to the task as "operation" keyword argument.
+    Countdown of the first attempt is passed as "initial_delay" keyword argument,
+    completion time is not recorded if it is unknown.
+    """
+    default_operation = 'default'
+
+    def pre_execute(self, instance):
+        self.operation = self.kwargs.pop('operation', self.default_operation)
+        self.initial_delay = self.kwargs.pop('initial_delay', None)
+        self.policy = get_polling_policy(instance, self.operation)
+        super(BackoffPollingMixin, self).pre_execute(instance)
+
+    def retry(self, *args, **kwargs):
+        kwargs.setdefault('countdown', self.policy.get_delay(self.request.retries + 1))
+        kwargs.setdefault('max_retries', self.policy.get_max_retries(
+            deadline=self.max_retries * self.default_retry_delay))
+        return super(BackoffPollingMixin, self).retry(*args, **kwargs)
+
+    def execute(self, instance, *args, **kwargs):
+        # Failed polling is recorded by failure task of the executor, see SetErredTask.
+        result = super(BackoffPollingMixin, self).execute(instance, *args, **kwargs)
+        self.record_completion(instance)
+        return result
+
+    def get_provisioned_resources(self, instance):
+        """ Resources whose provisioning is completed when polled operation is completed """
+        if self.operation == 'create' and hasattr(instance, 'service_project_link'):
+            return [instance]
+        return []
+
+    def record_completion(self, instance):
+        if self.initial_delay is None:
+            return
+        # Operation has been completed somewhere between previous and current attempts.
+        attempt = self.request.retries
+        finished = self.initial_delay + self.policy.get_retry_time(attempt)
+        started = self.initial_delay + self.policy.get_retry_time(attempt - 1) if attempt else 0
+        duration = (started + finished) / 2.0
+        for resource in self.get_provisioned_resources(instance):
+            average = PollingStats.get_average(resource, 'create')
+            ProvisionConcurrency.record_success(resource, duration, average)
+        PollingStats.record(instance, self.operation, duration)
+
+
+def with_initial_delay(signature, model):
+    """ Delay the first attempt of polling task signature according to the policy of its operation.
+
+    Delay is passed to the task as well, so that it is included into recorded completion time.
+    """
+    operation = signature.kwargs.get('operation', BackoffPollingMixin.default_operation)
+    initial_delay = get_initial_delay(model, operation)
+    signature.kwargs['initial_delay'] = initial_delay
+    return signature.set(countdown=initial_delay)
+
+
+class RecordProvisionFailureMixin(object):
+    """ Decrease concurrency limit of the resource type if resource fails while it is being created """
+
+    def execute(self, instance, *args, **kwargs):
+        if instance.state == instance.States.CREATING and hasattr(instance, 'service_project_link'):
+            ProvisionConcurrency.record_failure(instance)
+        return super(RecordProvisionFailureMixin, self).execute(instance, *args, **kwargs)
+
+
+class SetErredTask(RecordProvisionFailureMixin, core_tasks.ErrorStateTransitionTask):
+    """ Failure task of create executors. Both backend errors and failed polling are recorded by it. """
+
+
+class PollRuntimeStateTask(BackoffPollingMixin, core_tasks.PollRuntimeStateTask):
+    pass
+
+
+class PollBackendCheckTask(BackoffPollingMixin, core_tasks.PollBackendCheckTask):
+    pass
+
+
+class CompositeBackendMethodTask(core_tasks.BackendMethodTask):
+    """ Run several backend methods one by one within single task.
+
+    All methods share the same instance, backend object and OpenStack clients,
+    so that short pull chains do not pay for deserialization, authentication
+    and broker round trip on each step.
+    """
+
+    @classmethod
+    def get_description(cls, instance, backend_methods, *args, **kwargs):
+        return 'Run backend methods "%s" for instance "%s".' % (', '.join(backend_methods), instance)
+
+    def execute(self, instance, backend_methods, *args, **kwargs):
+        backend = self.get_backend(instance)
+        for backend_method in backend_methods:
+            getattr(backend, backend_method)(instance, *args, **kwargs)
+        return instance
+
+
+class CoalescedExecutorTask(core_tasks.Task):
+    """ Run executor for the object unless its run is already scheduled.
+
+    Requests for the same executor and object received within coalescing window
+    are collapsed into single executor run at the end of the window.
+    It is suitable for idempotent operations, such as pulls, that do not have
+    to be completed before the next task of the chain.
+    """
+
+    @classmethod
+    def get_description(cls, executor, instance, *args, **kwargs):
+        return 'Schedule coalesced run of executor "%s" for instance "%s".' % (executor, instance)
+
+    @classmethod
+    def get_window(cls):
+        return getattr(settings, 'WALDUR_OPENSTACK', {}).get('PULL_COALESCING_WINDOW', 10)
+
+    def run(self, serialized_executor, serialized_instance, **kwargs):
+        window = self.get_window()
+        key = 'openstack_coalesced_executor_%s_%s' % (serialized_executor, serialized_instance)
+        # Key expires when scheduled run starts, so that later requests schedule the next run.
+        if cache.add(key, True, window):
+            core_tasks.ExecutorTask().apply_async(
+                args=(serialized_executor, serialized_instance), kwargs=kwargs, countdown=window)
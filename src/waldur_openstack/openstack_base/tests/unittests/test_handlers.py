@@ -0,0 +1,40 @@
+import threading
+from unittest import TestCase
+
+from waldur_openstack.openstack_base import handlers
+
+
+class DeferredHandlersTest(TestCase):
+
+    def setUp(self):
+        self.applied = []
+
+    def batch_handler(self, items):
+        self.applied.extend(items)
+
+    def test_batch_handler_is_applied_once_at_the_end_of_block(self):
+        with handlers.deferred_handlers():
+            handlers.defer(self.batch_handler, 1)
+            handlers.defer(self.batch_handler, 2)
+            self.assertEqual(self.applied, [])
+
+        self.assertEqual(self.applied, [1, 2])
+
+    def test_batches_are_not_applied_if_block_fails(self):
+        with self.assertRaises(ValueError):
+            with handlers.deferred_handlers():
+                handlers.defer(self.batch_handler, 1)
+                raise ValueError()
+
+        self.assertEqual(self.applied, [])
+        self.assertFalse(handlers.defer(self.batch_handler, 2))
+
+    def test_handlers_of_propagated_thread_are_deferred_to_calling_block(self):
+        with handlers.deferred_handlers():
+            thread = threading.Thread(target=handlers.propagate_deferred_handlers(
+                lambda: handlers.defer(self.batch_handler, 1)))
+            thread.start()
+            thread.join()
+            self.assertEqual(self.applied, [])
+
+        self.assertEqual(self.applied, [1])
@@ -0,0 +1,46 @@
+from celery import chain, group
+from django.test import TestCase, override_settings
+import mock
+
+from waldur_core.core import tasks as core_tasks
+
+from waldur_openstack.openstack_base import routing
+
+
+@override_settings(
+    WALDUR_OPENSTACK={'TASK_QUEUES': {'sync': 'openstack_sync'}, 'TASK_PRIORITIES': {'sync': 3}},
+    WALDUR_OPENSTACK_TENANT={'TASK_QUEUES': {'cleanup': 'openstack_cleanup'}},
+)
+class TaskRoutingTest(TestCase):
+
+    def test_options_are_defined_by_category(self):
+        self.assertEqual(routing.get_task_options('sync'), {'queue': 'openstack_sync', 'priority': 3})
+        self.assertEqual(routing.get_task_options('cleanup'), {'queue': 'openstack_cleanup'})
+
+    def test_category_without_queue_is_not_routed(self):
+        self.assertEqual(routing.get_task_options('interactive'), {})
+
+    def test_all_nested_tasks_are_routed(self):
+        first = core_tasks.EmptyTask().si()
+        second = core_tasks.EmptyTask().si()
+        third = core_tasks.EmptyTask().si()
+        signature = group(chain(first, second), third)
+
+        routing.route_signature(signature, routing.get_task_options('sync'))
+
+        for task in (first, second, third):
+            self.assertEqual(task.options['queue'], 'openstack_sync')
+
+    def test_router_routes_tasks_with_category(self):
+        app = mock.Mock(tasks={'sync_task': mock.Mock(task_category='sync'), 'other_task': object()})
+        with mock.patch('waldur_openstack.openstack_base.routing.current_app', app):
+            router = routing.OpenStackTaskRouter()
+            self.assertEqual(router.route_for_task('sync_task'), {'queue': 'openstack_sync', 'priority': 3})
+            self.assertIsNone(router.route_for_task('other_task'))
+
+    def test_router_is_registered_once_before_default_routers(self):
+        settings = {'CELERY_TASK_ROUTES': ('waldur_core.server.celery.PriorityRouter',)}
+        routing.register_router(settings)
+        routing.register_router(settings)
+        self.assertEqual(settings['CELERY_TASK_ROUTES'],
+                         (routing.ROUTER, 'waldur_core.server.celery.PriorityRouter'))
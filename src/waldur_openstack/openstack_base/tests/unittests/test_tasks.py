@@ -0,0 +1,222 @@
+from unittest import TestCase
+
+from django.core.cache import cache
+from django.test import TestCase as DjangoTestCase, override_settings
+import mock
+
+from waldur_core.core import utils as core_utils
+
+from waldur_openstack.openstack_base import tasks
+from waldur_openstack.openstack_tenant import models as tenant_models, tasks as tenant_tasks
+from waldur_openstack.openstack_tenant.tests import factories as tenant_factories
+
+
+class PollingPolicyTest(TestCase):
+
+    def setUp(self):
+        self.policy = tasks.PollingPolicy(initial_delay=2, factor=2, max_delay=10, jitter=0.5, deadline=60)
+
+    def test_delay_grows_exponentially_until_cap(self):
+        delays = [self.policy.get_nominal_delay(attempt) for attempt in range(5)]
+        self.assertEqual(delays, [2, 4, 8, 10, 10])
+
+    def test_jitter_is_limited_by_share_of_delay(self):
+        for _ in range(100):
+            delay = self.policy.get_delay(1)
+            self.assertTrue(2 <= delay <= 6)
+
+    def test_max_retries_is_limited_by_deadline(self):
+        # 2 + 4 + 8 + 10 + 10 + 10 + 10 + 10 = 64
+        self.assertEqual(self.policy.get_max_retries(deadline=300), 7)
+
+    def test_default_deadline_is_used_if_policy_does_not_define_it(self):
+        self.policy.deadline = None
+        self.assertEqual(self.policy.get_max_retries(deadline=24), 3)
+
+
+class GetPollingPolicyTest(DjangoTestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    @override_settings(WALDUR_OPENSTACK_TENANT={'POLLING_POLICIES': {
+        'OpenStackTenant.Volume': {
+            'default': {'max_delay': 30},
+            'create': {'initial_delay': 20},
+        }
+    }})
+    def test_operation_policy_extends_resource_default_policy(self):
+        policy = tasks.get_polling_policy(tenant_models.Volume, 'create')
+        self.assertEqual(policy.initial_delay, 20)
+        self.assertEqual(policy.max_delay, 30)
+
+    def test_initial_delay_is_learned_from_completion_time(self):
+        for _ in range(tasks.PollingStats.MIN_SAMPLES):
+            tasks.PollingStats.record(tenant_models.Volume, 'extend', 12)
+
+        policy = tasks.get_polling_policy(tenant_models.Volume, 'extend')
+        self.assertEqual(policy.initial_delay, 12)
+
+    def test_initial_delay_is_not_learned_until_enough_samples_are_collected(self):
+        tasks.PollingStats.record(tenant_models.Volume, 'extend', 12)
+
+        policy = tasks.get_polling_policy(tenant_models.Volume, 'extend')
+        self.assertEqual(policy.initial_delay, tasks.PollingPolicy.DEFAULTS['initial_delay'])
+
+
+class RecordCompletionTest(DjangoTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.volume = tenant_factories.VolumeFactory()
+        self.task = tasks.PollRuntimeStateTask()
+        self.task.policy = tasks.PollingPolicy(initial_delay=2, factor=2, max_delay=10, jitter=0)
+        self.task.operation = 'extend'
+
+    def record_completion(self, initial_delay, retries):
+        self.task.initial_delay = initial_delay
+        self.task.push_request(retries=retries)
+        try:
+            with mock.patch('waldur_openstack.openstack_base.tasks.PollingStats.record') as record:
+                self.task.record_completion(self.volume)
+        finally:
+            self.task.pop_request()
+        return record
+
+    def test_initial_delay_is_included_into_completion_time(self):
+        # First retry is made 4 seconds after the first attempt delayed by 30 seconds.
+        record = self.record_completion(initial_delay=30, retries=1)
+        record.assert_called_once_with(self.volume, 'extend', 32)
+
+    def test_completion_time_is_not_recorded_if_initial_delay_is_unknown(self):
+        record = self.record_completion(initial_delay=None, retries=1)
+        self.assertFalse(record.called)
+
+    def test_initial_delay_is_passed_to_polling_task(self):
+        signature = tasks.with_initial_delay(
+            tasks.PollRuntimeStateTask().si('volume', operation='extend'), self.volume)
+        self.assertEqual(signature.kwargs['initial_delay'], signature.options['countdown'])
+
+
+@override_settings(WALDUR_OPENSTACK_TENANT={'MAX_CONCURRENT_PROVISION': {'OpenStackTenant.Volume': 8}})
+class ProvisionConcurrencyTest(DjangoTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.volume = tenant_factories.VolumeFactory()
+
+    def test_static_limit_is_used_initially(self):
+        self.assertEqual(tasks.ProvisionConcurrency.get_limit(self.volume), 8)
+
+    def test_limit_is_decreased_multiplicatively_on_failure(self):
+        tasks.ProvisionConcurrency.record_failure(self.volume)
+        self.assertEqual(tasks.ProvisionConcurrency.get_limit(self.volume), 4)
+
+    def test_limit_is_decreased_once_for_failures_of_concurrent_resources(self):
+        tasks.ProvisionConcurrency.record_failure(self.volume)
+        tasks.ProvisionConcurrency.record_failure(self.volume)
+        self.assertEqual(tasks.ProvisionConcurrency.get_limit(self.volume), 4)
+
+    def test_slow_provisioning_is_treated_as_failure(self):
+        tasks.ProvisionConcurrency.record_success(self.volume, duration=100, average=10)
+        self.assertEqual(tasks.ProvisionConcurrency.get_limit(self.volume), 4)
+
+    def test_limit_is_increased_additively_up_to_static_limit(self):
+        tasks.ProvisionConcurrency.record_failure(self.volume)
+        for _ in range(5):
+            tasks.ProvisionConcurrency.record_success(self.volume, duration=10, average=10)
+        self.assertEqual(tasks.ProvisionConcurrency.get_limit(self.volume), 5)
+
+        for _ in range(100):
+            tasks.ProvisionConcurrency.record_success(self.volume, duration=10, average=10)
+        self.assertEqual(tasks.ProvisionConcurrency.get_limit(self.volume), 8)
+
+    def test_limit_is_tracked_per_service_settings(self):
+        other_volume = tenant_factories.VolumeFactory()
+        tasks.ProvisionConcurrency.record_failure(self.volume)
+        self.assertEqual(tasks.ProvisionConcurrency.get_limit(other_volume), 8)
+
+    @mock.patch('waldur_openstack.openstack_base.tasks.time.sleep')
+    def test_limit_is_not_changed_while_it_is_locked_by_another_worker(self, sleep):
+        cache.add(tasks.ProvisionConcurrency._get_key(self.volume) + '_lock', True)
+        tasks.ProvisionConcurrency.record_failure(self.volume)
+        self.assertEqual(tasks.ProvisionConcurrency.get_limit(self.volume), 8)
+
+    def test_lock_is_released_after_update(self):
+        tasks.ProvisionConcurrency.record_failure(self.volume)
+        self.assertIsNone(cache.get(tasks.ProvisionConcurrency._get_key(self.volume) + '_lock'))
+
+
+@override_settings(WALDUR_OPENSTACK_TENANT={'MAX_CONCURRENT_PROVISION': {'OpenStackTenant.Volume': 8}})
+@mock.patch('waldur_core.core.tasks.ErrorStateTransitionTask.execute')
+class RecordProvisionOutcomeTest(DjangoTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.volume = tenant_factories.VolumeFactory(state=tenant_models.Volume.States.CREATING)
+
+    def test_failure_of_resource_being_created_is_recorded(self, execute):
+        tasks.SetErredTask().execute(self.volume)
+        self.assertEqual(tasks.ProvisionConcurrency.get_limit(self.volume), 4)
+
+    def test_failure_of_resource_that_is_not_being_created_is_not_recorded(self, execute):
+        self.volume.state = tenant_models.Volume.States.UPDATING
+        tasks.SetErredTask().execute(self.volume)
+        self.assertEqual(tasks.ProvisionConcurrency.get_limit(self.volume), 8)
+
+    def test_volumes_created_for_instance_are_recorded_when_they_are_available(self, execute):
+        instance = tenant_factories.InstanceFactory(service_project_link=self.volume.service_project_link)
+        self.volume.instance = instance
+        self.volume.save()
+        task = tenant_tasks.PollInstanceVolumesTask()
+        task.operation = 'create_volumes'
+        task.initial_delay = 30
+        task.policy = tasks.PollingPolicy(initial_delay=30, factor=2, max_delay=10, jitter=0)
+        task.push_request(retries=0)
+
+        with mock.patch('waldur_openstack.openstack_base.tasks.ProvisionConcurrency.record_success') as record:
+            try:
+                task.record_completion(instance)
+            finally:
+                task.pop_request()
+
+        record.assert_called_once_with(self.volume, 15, None)
+
+
+class CompositeBackendMethodTaskTest(DjangoTestCase):
+
+    def setUp(self):
+        self.instance = tenant_factories.InstanceFactory()
+
+    @mock.patch('waldur_openstack.openstack_tenant.models.Instance.get_backend')
+    def test_all_methods_are_called_with_the_same_backend(self, get_backend):
+        backend = get_backend.return_value
+
+        tasks.CompositeBackendMethodTask().si(
+            core_utils.serialize_instance(self.instance), ['pull_instance', 'pull_instance_internal_ips'],
+        ).apply()
+
+        self.assertEqual(get_backend.call_count, 1)
+        backend.pull_instance.assert_called_once_with(self.instance)
+        backend.pull_instance_internal_ips.assert_called_once_with(self.instance)
+
+
+class CoalescedExecutorTaskTest(DjangoTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.args = ('waldur_openstack.openstack.executors.TenantPullFloatingIPsExecutor', 'openstack.tenant:1')
+
+    @mock.patch('waldur_core.core.tasks.ExecutorTask.apply_async')
+    def test_requests_within_window_are_coalesced(self, apply_async):
+        tasks.CoalescedExecutorTask().run(*self.args)
+        tasks.CoalescedExecutorTask().run(*self.args)
+
+        self.assertEqual(apply_async.call_count, 1)
+
+    @mock.patch('waldur_core.core.tasks.ExecutorTask.apply_async')
+    def test_requests_for_different_objects_are_not_coalesced(self, apply_async):
+        tasks.CoalescedExecutorTask().run(*self.args)
+        tasks.CoalescedExecutorTask().run(self.args[0], 'openstack.tenant:2')
+
+        self.assertEqual(apply_async.call_count, 2)
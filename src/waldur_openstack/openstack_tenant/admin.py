@@ -25,6 +25,11 @@ class FloatingIPAdmin(structure_admin.BackendModelAdmin):
     list_display = ('address', 'settings', 'runtime_state', 'backend_network_id', 'is_booked')
 
 
+class PooledVolumeAdmin(admin.ModelAdmin):
+    list_filter = ('image__settings',)
+    list_display = ('backend_id', 'image', 'size', 'runtime_state', 'created')
+
+
 class SecurityGroupRule(admin.TabularInline):
     model = models.SecurityGroupRule
     fields = ('protocol', 'from_port', 'to_port', 'cidr', 'backend_id')
@@ -172,6 +177,7 @@ admin.site.register(models.Image, ImageAdmin)
 admin.site.register(models.FloatingIP, FloatingIPAdmin)
 admin.site.register(models.SecurityGroup, SecurityGroupAdmin)
 admin.site.register(models.Volume, VolumeAdmin)
+admin.site.register(models.PooledVolume, PooledVolumeAdmin)
 admin.site.register(models.Snapshot, SnapshotAdmin)
 admin.site.register(models.Instance, InstanceAdmin)
 admin.site.register(models.Backup, BackupAdmin)
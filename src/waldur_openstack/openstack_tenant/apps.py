@@ -18,6 +18,7 @@ class OpenStackTenantConfig(AppConfig):
         from waldur_core.structure.models import ServiceSettings, Project, Customer
         from waldur_core.structure import SupportedServices
         from waldur_openstack.openstack.models import Tenant
+        from waldur_openstack.openstack_base import signals as openstack_base_signals
 
         from .backend import OpenStackTenantBackend
         from . import handlers, models
@@ -200,3 +201,9 @@ class OpenStackTenantConfig(AppConfig):
             sender=models.Flavor,
             dispatch_uid='openstack_tenant.handlers.sync_price_list_item_for_flavor',
         )
+
+        openstack_base_signals.resources_pulled.connect(
+            handlers.update_pulled_instances_start_time,
+            sender=models.Instance,
+            dispatch_uid='openstack_tenant.handlers.update_pulled_instances_start_time',
+        )
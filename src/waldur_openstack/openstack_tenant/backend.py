@@ -1,10 +1,13 @@
+import collections
+import datetime
 import json
 import logging
 import re
 
 from ceilometerclient import exc as ceilometer_exceptions
 from cinderclient import exceptions as cinder_exceptions
-from django.db import transaction, IntegrityError
+from django.db import transaction
+from django.db.models import Q
 from django.utils import six, timezone, dateparse
 from django.utils.functional import cached_property
 from keystoneclient import exceptions as keystone_exceptions
@@ -12,11 +15,11 @@ from neutronclient.client import exceptions as neutron_exceptions
 from novaclient import exceptions as nova_exceptions
 
 from waldur_core.structure import log_backend_action
-from waldur_core.structure.utils import (
-    update_pulled_fields, handle_resource_not_found, handle_resource_update_success)
-from waldur_openstack.openstack_base.backend import BaseOpenStackBackend, OpenStackBackendError
+from waldur_core.structure.utils import update_pulled_fields, handle_resource_not_found
+from waldur_openstack.openstack_base.backend import BaseOpenStackBackend, OpenStackBackendError, sync_stage
+from waldur_openstack.openstack_base.handlers import deferred_handlers
 
-from . import models
+from . import models, utils
 
 logger = logging.getLogger(__name__)
 
@@ -41,10 +44,75 @@ def backend_internal_ip_to_internal_ip(backend_internal_ip, **kwargs):
     return internal_ip
 
 
+# Compact records of remote state used to compare with local objects during sync.
+# Model instances are created only for rows that should be inserted.
+InternalIPRecord = collections.namedtuple('InternalIPRecord', (
+    'backend_id', 'mac_address', 'ip4_address', 'ip6_address',
+    'instance_backend_id', 'subnet_backend_id', 'device_owner'))
+
+FloatingIPRecord = collections.namedtuple('FloatingIPRecord', (
+    'backend_id', 'name', 'address', 'runtime_state', 'backend_network_id', 'internal_ip_backend_id'))
+
+
+class ResourceRecord(object):
+    """ Compact record of pulled fields of remote resource, it is compared with local resource during pull.
+
+    Fields that are not reported by backend get default value of the model field,
+    as they do in model instance created from backend resource.
+    """
+    __slots__ = ()
+    model = None
+
+    def __init__(self, **values):
+        self.backend_fingerprint = None
+        for name in self.model.get_backend_fields():
+            setattr(self, name, values[name] if name in values else self.model._meta.get_field(name).get_default())
+
+    def get_values(self):
+        return {name: getattr(self, name) for name in self.model.get_backend_fields()}
+
+
+class VolumeRecord(ResourceRecord):
+    __slots__ = models.Volume.get_backend_fields() + ('backend_fingerprint',)
+    model = models.Volume
+
+
+class InstanceRecord(ResourceRecord):
+    __slots__ = models.Instance.get_backend_fields() + ('backend_fingerprint',)
+    model = models.Instance
+
+
+def backend_internal_ip_to_record(backend_internal_ip):
+    fixed_ip = backend_internal_ip['fixed_ips'][0]
+    return InternalIPRecord(
+        backend_id=backend_internal_ip['id'],
+        mac_address=backend_internal_ip['mac_address'],
+        ip4_address=fixed_ip['ip_address'],
+        ip6_address=None,
+        instance_backend_id=backend_internal_ip['device_id'],
+        subnet_backend_id=fixed_ip['subnet_id'],
+        device_owner=backend_internal_ip['device_owner'],
+    )
+
+
+def backend_floating_ip_to_record(backend_floating_ip):
+    return FloatingIPRecord(
+        backend_id=backend_floating_ip['id'],
+        name=backend_floating_ip['floating_ip_address'],
+        address=backend_floating_ip['floating_ip_address'],
+        runtime_state=backend_floating_ip['status'],
+        backend_network_id=backend_floating_ip['floating_network_id'],
+        internal_ip_backend_id=backend_floating_ip['port_id'],
+    )
+
+
 class InternalIPSynchronizer(object):
     """
     It is assumed that all subnets for the current tenant have been successfully synchronized.
+    Local objects are loaded as plain values and written in bulk,
+    so that number of queries does not depend on number of ports.
     """
+    fields = models.InternalIP.get_backend_fields() + ('backend_id',)
 
     def __init__(self, neutron_client, tenant_id, settings):
         self.neutron_client = neutron_client
@@ -55,32 +123,34 @@ class InternalIPSynchronizer(object):
     def remote_ips(self):
         """
         Fetch all Neutron ports for the current tenant.
-        Convert Neutron port to local internal IP model.
+        Convert Neutron port to internal IP record.
         """
         try:
             ips = self.neutron_client.list_ports(tenant_id=self.tenant_id)['ports']
         except neutron_exceptions.NeutronClientException as e:
             six.reraise(OpenStackBackendError, e)
 
-        return [backend_internal_ip_to_internal_ip(ip) for ip in ips]
+        return [backend_internal_ip_to_record(ip) for ip in ips]
 
     @cached_property
     def local_ips(self):
         """
-        Prepare mapping from backend ID to local internal IP model.
+        Prepare mapping from backend ID to values of local internal IP.
         """
         internal_ips = models.InternalIP.objects\
-            .filter(subnet__settings=self.settings).exclude(backend_id='')
-        return {ip.backend_id: ip for ip in internal_ips}
+            .filter(subnet__settings=self.settings).exclude(backend_id='')\
+            .values('id', *self.fields)
+        return {ip['backend_id']: ip for ip in internal_ips}
 
     @cached_property
     def pending_ips(self):
         """
-        Prepare mapping from device and subnet ID to local internal IP model.
+        Prepare mapping from device and subnet ID to values of local internal IP.
         """
-        pending_internal_ips = models.InternalIP.objects.filter(
-            subnet__settings=self.settings, backend_id='').exclude(instance__isnull=True)
-        return {(ip.instance.backend_id, ip.subnet.backend_id): ip for ip in pending_internal_ips}
+        pending_internal_ips = models.InternalIP.objects\
+            .filter(subnet__settings=self.settings, backend_id='').exclude(instance__isnull=True)\
+            .values('id', 'instance__backend_id', 'subnet__backend_id', *self.fields)
+        return {(ip['instance__backend_id'], ip['subnet__backend_id']): ip for ip in pending_internal_ips}
 
     @cached_property
     def stale_ips(self):
@@ -89,7 +159,7 @@ class InternalIPSynchronizer(object):
         """
         remote_ips = {ip.backend_id for ip in self.remote_ips}
         return [
-            ip.pk
+            ip['id']
             for (backend_id, ip) in self.local_ips.items()
             if backend_id not in remote_ips
         ]
@@ -97,55 +167,61 @@ class InternalIPSynchronizer(object):
     @cached_property
     def instances(self):
         """
-        Prepare mapping from backend ID to local instance model.
+        Prepare mapping from backend ID to local instance ID.
         """
         instances = models.Instance.objects.filter(
             service_project_link__service__settings=self.settings).exclude(backend_id='')
-        return {instance.backend_id: instance for instance in instances}
+        return dict(instances.values_list('backend_id', 'id'))
 
     @cached_property
     def subnets(self):
         """
-        Prepare mapping from backend ID to local subnet model.
+        Prepare mapping from backend ID to local subnet ID.
         """
         subnets = models.SubNet.objects.filter(settings=self.settings).exclude(backend_id='')
-        return {subnet.backend_id: subnet for subnet in subnets}
+        return dict(subnets.values_list('backend_id', 'id'))
 
     @transaction.atomic
     def execute(self):
+        # Stale internal IPs are removed first, so that new ones do not conflict with them.
+        if self.stale_ips:
+            models.InternalIP.objects.filter(pk__in=self.stale_ips).delete()
+
+        new_ips = []
+        changes = {}
         for remote_ip in self.remote_ips:
 
             # Check if related subnet exists.
-            subnet = self.subnets.get(remote_ip._subnet_backend_id)
-            if subnet is None:
+            subnet_id = self.subnets.get(remote_ip.subnet_backend_id)
+            if subnet_id is None:
                 logger.warning('Skipping Neutron port synchronization process because '
                                'related subnet is not imported yet. Port ID: %s, subnet ID: %s',
-                               remote_ip.backend_id, remote_ip._subnet_backend_id)
+                               remote_ip.backend_id, remote_ip.subnet_backend_id)
                 continue
 
             local_ip = self.local_ips.get(remote_ip.backend_id)
-            instance = None
+            instance_id = None
 
-            if remote_ip._device_owner == 'compute:nova':
-                instance = self.instances.get(remote_ip._instance_backend_id)
+            if remote_ip.device_owner == 'compute:nova':
+                instance_id = self.instances.get(remote_ip.instance_backend_id)
                 # Check if internal IP is pending.
-                if instance and not local_ip:
-                    local_ip = self.pending_ips.get((instance.backend_id, subnet.backend_id))
+                if instance_id and not local_ip:
+                    local_ip = self.pending_ips.get((remote_ip.instance_backend_id, remote_ip.subnet_backend_id))
 
+            pulled_values = {field: getattr(remote_ip, field) for field in self.fields}
             # Create local internal IP if it does not exist yet.
             if local_ip is None:
-                local_ip = remote_ip
-                local_ip.subnet = subnet
-                local_ip.instance = instance
-                local_ip.save()
+                new_ips.append(models.InternalIP(subnet_id=subnet_id, instance_id=instance_id, **pulled_values))
             else:
                 # Update backend ID for pending internal IP.
-                update_pulled_fields(local_ip, remote_ip,
-                                     models.InternalIP.get_backend_fields() + ('backend_id',))
+                changed_fields = {field: value for field, value in pulled_values.items() if local_ip[field] != value}
+                if changed_fields:
+                    changes[local_ip['id']] = changed_fields
 
-        # Remove stale internal IPs.
-        if self.stale_ips:
-            models.InternalIP.objects.filter(pk__in=self.stale_ips).delete()
+        if new_ips:
+            models.InternalIP.objects.bulk_create(new_ips)
+        if changes:
+            utils.bulk_update(models.InternalIP, changes)
 
 
 class OpenStackTenantBackend(BaseOpenStackBackend):
@@ -158,81 +234,71 @@ class OpenStackTenantBackend(BaseOpenStackBackend):
         return self.settings.options['external_network_id']
 
     def sync(self):
-        # pull service properties
-        self.pull_flavors()
-        self.pull_images()
-        self.pull_security_groups()
-        self.pull_quotas()
-        self.pull_networks()
-        self.pull_subnets()
-        self.pull_internal_ips()
-        self.pull_floating_ips()
-
-        # pull resources
-        self.pull_volumes()
-        self.pull_snapshots()
-        self.pull_instances()
+        # Signal handlers of pulled objects are applied once at the end of sync.
+        with deferred_handlers():
+            # pull service properties
+            self.pull_flavors()
+            self.pull_images()
+            self.pull_security_groups()
+            self.pull_quotas()
+            self.pull_networks()
+            self.pull_subnets()
+            self.pull_internal_ips()
+            self.pull_floating_ips()
+
+            # pull resources
+            self.pull_volumes()
+            self.pull_snapshots()
+            self.pull_instances()
 
     def pull_volumes(self):
-        backend_volumes = self.get_volumes()
+        backend_volumes = self.get_volume_records()
         volumes = models.Volume.objects.filter(
             service_project_link__service__settings=self.settings,
             state__in=[models.Volume.States.OK, models.Volume.States.ERRED]
         )
-        backend_volumes_map = {backend_volume.backend_id: backend_volume for backend_volume in backend_volumes}
-        for volume in volumes:
-            try:
-                backend_volume = backend_volumes_map[volume.backend_id]
-            except KeyError:
-                handle_resource_not_found(volume)
-            else:
-                update_pulled_fields(volume, backend_volume, models.Volume.get_backend_fields())
-                handle_resource_update_success(volume)
+        fields = models.Volume.get_backend_fields()
+        pulled_volumes, missing_volumes = self._get_pulled_resources(volumes, backend_volumes, lambda _: fields)
+        for volume in missing_volumes:
+            handle_resource_not_found(volume)
+        self._bulk_update_pulled_resources(models.Volume, pulled_volumes)
 
     def pull_snapshots(self):
         backend_snapshots = self.get_snapshots()
         snapshots = models.Snapshot.objects.filter(
             service_project_link__service__settings=self.settings,
             state__in=[models.Snapshot.States.OK, models.Snapshot.States.ERRED])
-        backend_snapshots_map = {backend_snapshot.backend_id: backend_snapshot
-                                 for backend_snapshot in backend_snapshots}
-        for snapshot in snapshots:
-            try:
-                backend_snapshot = backend_snapshots_map[snapshot.backend_id]
-            except KeyError:
-                handle_resource_not_found(snapshot)
-            else:
-                update_pulled_fields(snapshot, backend_snapshot, models.Snapshot.get_backend_fields())
-                handle_resource_update_success(snapshot)
+        fields = models.Snapshot.get_backend_fields()
+        pulled_snapshots, missing_snapshots = self._get_pulled_resources(
+            snapshots, backend_snapshots, lambda _: fields)
+        for snapshot in missing_snapshots:
+            handle_resource_not_found(snapshot)
+        self._bulk_update_pulled_resources(models.Snapshot, pulled_snapshots)
 
     def pull_instances(self):
-        backend_instances = self.get_instances()
+        backend_instances = self.get_instance_records()
         instances = models.Instance.objects.filter(
             service_project_link__service__settings=self.settings,
             state__in=[models.Instance.States.OK, models.Instance.States.ERRED],
         )
-        backend_instances_map = {backend_instance.backend_id: backend_instance
-                                 for backend_instance in backend_instances}
-        for instance in instances:
-            try:
-                backend_instance = backend_instances_map[instance.backend_id]
-            except KeyError:
-                handle_resource_not_found(instance)
-            else:
-                self.update_instance_fields(instance, backend_instance)
-                # XXX: can be optimized after https://goo.gl/BZKo8Y will be resolved.
-                self.pull_instance_security_groups(instance)
-                handle_resource_update_success(instance)
-
-    def update_instance_fields(self, instance, backend_instance):
+        pulled_instances, missing_instances = self._get_pulled_resources(
+            instances, backend_instances, self.get_instance_pulled_fields)
+        for instance in missing_instances:
+            handle_resource_not_found(instance)
+        self._bulk_update_pulled_resources(models.Instance, pulled_instances)
+
+        # Security groups are not included into fingerprint, so they are pulled for unchanged instances too.
+        backend_ids = [backend_instance.backend_id for backend_instance in backend_instances]
+        existing_instances = instances.filter(backend_id__in=backend_ids).only('id', 'backend_id')
+        self.pull_instances_security_groups(list(existing_instances))
+
+    def get_instance_pulled_fields(self, backend_instance):
         # Preserve flavor fields in Waldur database if flavor is deleted in OpenStack
         fields = set(models.Instance.get_backend_fields())
         flavor_fields = {'flavor_name', 'flavor_disk', 'ram', 'cores', 'disk'}
         if not backend_instance.flavor_name:
             fields = fields - flavor_fields
-        fields = list(fields)
-
-        update_pulled_fields(instance, backend_instance, fields)
+        return list(fields)
 
     def pull_flavors(self):
         nova = self.nova_client
@@ -243,30 +309,38 @@ class OpenStackTenantBackend(BaseOpenStackBackend):
 
         flavor_exclude_regex = self.settings.options.get('flavor_exclude_regex', '')
         name_pattern = re.compile(flavor_exclude_regex) if flavor_exclude_regex else None
+        pulled_flavors = []
+        for backend_flavor in flavors:
+            if name_pattern is not None and name_pattern.match(backend_flavor.name) is not None:
+                logger.debug('Skipping pull of %s flavor as it matches %s regex pattern.',
+                             backend_flavor.name, flavor_exclude_regex)
+                continue
+            pulled_flavors.append(backend_flavor)
+
         with transaction.atomic():
             cur_flavors = self._get_current_properties(models.Flavor)
-            for backend_flavor in flavors:
-                if name_pattern is not None and name_pattern.match(backend_flavor.name) is not None:
-                    logger.debug('Skipping pull of %s flavor as it matches %s regex pattern.',
-                                 backend_flavor.name, flavor_exclude_regex)
-                    continue
+            self._upsert_properties(models.Flavor, {
+                backend_flavor.id: {
+                    'name': backend_flavor.name,
+                    'cores': backend_flavor.vcpus,
+                    'ram': backend_flavor.ram,
+                    'disk': self.gb2mb(backend_flavor.disk),
+                }
+                for backend_flavor in pulled_flavors
+            })
 
-                cur_flavors.pop(backend_flavor.id, None)
-                models.Flavor.objects.update_or_create(
-                    settings=self.settings,
-                    backend_id=backend_flavor.id,
-                    defaults={
-                        'name': backend_flavor.name,
-                        'cores': backend_flavor.vcpus,
-                        'ram': backend_flavor.ram,
-                        'disk': self.gb2mb(backend_flavor.disk),
-                    })
+            # Price list items are synchronized on flavor creation, but bulk queries do not send signals.
+            new_ids = set(flavor.id for flavor in pulled_flavors) - set(cur_flavors)
+            for flavor in models.Flavor.objects.filter(settings=self.settings, backend_id__in=new_ids):
+                utils.sync_price_list_item(flavor)
 
-            models.Flavor.objects.filter(backend_id__in=cur_flavors.keys(), settings=self.settings).delete()
+            stale_ids = set(cur_flavors) - set(flavor.id for flavor in pulled_flavors)
+            models.Flavor.objects.filter(backend_id__in=stale_ids, settings=self.settings).delete()
 
     def pull_images(self):
         self._pull_images(models.Image)
 
+    @sync_stage('floating_ips')
     def pull_floating_ips(self):
         # method assumes that instance internal IPs is up to date.
         neutron = self.neutron_client
@@ -276,63 +350,68 @@ class OpenStackTenantBackend(BaseOpenStackBackend):
         except neutron_exceptions.NeutronClientException as e:
             six.reraise(OpenStackBackendError, e)
 
-        # Step 1. Prepare data
-        imported_ips = {ip.backend_id: ip
-                        for ip in (self._backend_floating_ip_to_floating_ip(ip)
-                                   for ip in backend_floating_ips)}
+        internal_ips = dict(models.InternalIP.objects.filter(
+            subnet__settings=self.settings).exclude(backend_id='').values_list('backend_id', 'id'))
+        floating_ips = models.FloatingIP.objects.filter(settings=self.settings).exclude(backend_id='')
 
-        floating_ips = {ip.backend_id: ip for ip in models.FloatingIP.objects.filter(
-            settings=self.settings).exclude(backend_id='')}
-        booked_ips = [backend_id for backend_id, ip in floating_ips.items() if ip.is_booked]
-
-        # all imported IPs except those which are booked.
-        ips_to_update = set(imported_ips) - set(booked_ips)
+        with transaction.atomic():
+            stale_ids = self._reconcile_floating_ips(backend_floating_ips, internal_ips, floating_ips)
+            models.FloatingIP.objects.filter(settings=self.settings, backend_id__in=stale_ids).delete()
 
-        internal_ips = {ip.backend_id: ip for ip in models.InternalIP.objects.filter(
-            subnet__settings=self.settings).exclude(backend_id='')}
+    def _reconcile_floating_ips(self, backend_floating_ips, internal_ips, floating_ips):
+        """ Insert new and update changed floating IPs with bulk queries.
 
-        # Step 2. Update or create imported IPs
-        for backend_id in ips_to_update:
-            imported_ip = imported_ips[backend_id]
-            floating_ip = floating_ips.get(backend_id)
+        Internal IPs map backend ID of internal IP to its ID. Floating IPs is a queryset
+        of local floating IPs to compare with, booked ones are not updated.
+        Return backend IDs of local floating IPs that are missing at backend.
+        """
+        fields = ('id', 'backend_id', 'name', 'address', 'runtime_state', 'backend_network_id',
+                  'internal_ip_id', 'is_booked')
+        local_ips = {ip['backend_id']: ip for ip in floating_ips.values(*fields)}
 
-            internal_ip = internal_ips.get(imported_ip._internal_ip_backend_id)
-            if imported_ip._internal_ip_backend_id and internal_ip is None:
-                logger.warning('Failed to set internal_ip for Floating IP %s', imported_ip.backend_id)
+        new_ips = []
+        changes = {}
+        for backend_floating_ip in backend_floating_ips:
+            remote_ip = backend_floating_ip_to_record(backend_floating_ip)
+            internal_ip_id = internal_ips.get(remote_ip.internal_ip_backend_id)
+            if remote_ip.internal_ip_backend_id and internal_ip_id is None:
+                logger.warning('Failed to set internal_ip for Floating IP %s', remote_ip.backend_id)
                 continue
 
-            imported_ip.internal_ip = internal_ip
-            if not floating_ip:
-                imported_ip.save()
-            else:
-                fields_to_update = models.FloatingIP.get_backend_fields() + ('internal_ip',)
-                if floating_ip.address != floating_ip.name:
-                    # Don't update user defined name.
-                    fields_to_update = [field for field in fields_to_update if field != 'name']
-
-                update_pulled_fields(floating_ip, imported_ip, fields_to_update)
-
-        # Step 3. Delete stale IPs
-        ips_to_delete = set(floating_ips) - set(imported_ips)
-        models.FloatingIP.objects.filter(settings=self.settings,
-                                         backend_id__in=ips_to_delete).delete()
+            local_ip = local_ips.get(remote_ip.backend_id)
+            if local_ip is None:
+                new_ips.append(models.FloatingIP(
+                    settings=self.settings,
+                    backend_id=remote_ip.backend_id,
+                    name=remote_ip.name,
+                    address=remote_ip.address,
+                    runtime_state=remote_ip.runtime_state,
+                    backend_network_id=remote_ip.backend_network_id,
+                    internal_ip_id=internal_ip_id,
+                ))
+                continue
+            if local_ip['is_booked']:
+                continue
 
-    def _backend_floating_ip_to_floating_ip(self, backend_floating_ip, **kwargs):
-        floating_ip = models.FloatingIP(
-            settings=self.settings,
-            name=backend_floating_ip['floating_ip_address'],
-            address=backend_floating_ip['floating_ip_address'],
-            backend_network_id=backend_floating_ip['floating_network_id'],
-            runtime_state=backend_floating_ip['status'],
-            backend_id=backend_floating_ip['id'],
-        )
-        for field, value in kwargs.items():
-            setattr(floating_ip, field, value)
+            pulled_values = {
+                'address': remote_ip.address,
+                'runtime_state': remote_ip.runtime_state,
+                'backend_network_id': remote_ip.backend_network_id,
+                'internal_ip_id': internal_ip_id,
+            }
+            # Don't update user defined name.
+            if local_ip['address'] == local_ip['name']:
+                pulled_values['name'] = remote_ip.name
+            changed_values = {field: value for field, value in pulled_values.items() if local_ip[field] != value}
+            if changed_values:
+                changes[local_ip['id']] = changed_values
 
-        if 'internal_ip' not in kwargs:
-            floating_ip._internal_ip_backend_id = backend_floating_ip['port_id']
+        if new_ips:
+            models.FloatingIP.objects.bulk_create(new_ips)
+        if changes:
+            utils.bulk_update(models.FloatingIP, changes)
 
-        return floating_ip
+        return set(local_ips) - {backend_floating_ip['id'] for backend_floating_ip in backend_floating_ips}
 
     def _delete_stale_properties(self, model, backend_items):
         with transaction.atomic():
@@ -343,6 +422,7 @@ class OpenStackTenantBackend(BaseOpenStackBackend):
             if stale_ids:
                 model.objects.filter(settings=self.settings, backend_id__in=stale_ids).delete()
 
+    @sync_stage('security_groups')
     def pull_security_groups(self):
         neutron = self.neutron_client
         try:
@@ -350,30 +430,31 @@ class OpenStackTenantBackend(BaseOpenStackBackend):
         except neutron_exceptions.NeutronClientException as e:
             six.reraise(OpenStackBackendError, e)
 
-        for backend_security_group in security_groups:
-            backend_id = backend_security_group['id']
-            defaults = {
+        self._upsert_properties(models.SecurityGroup, {
+            backend_security_group['id']: {
                 'name': backend_security_group['name'],
-                'description': backend_security_group['description']
+                'description': backend_security_group['description'],
             }
-            try:
+            for backend_security_group in security_groups
+        })
+
+        backend_ids = [backend_security_group['id'] for backend_security_group in security_groups]
+        cur_security_groups = {
+            security_group.backend_id: security_group for security_group in
+            models.SecurityGroup.objects.filter(settings=self.settings, backend_id__in=backend_ids)
+        }
+        for backend_security_group in security_groups:
+            security_group = cur_security_groups.get(backend_security_group['id'])
+            if security_group is not None:
                 with transaction.atomic():
-                    security_group, _ = models.SecurityGroup.objects.update_or_create(
-                        settings=self.settings,
-                        backend_id=backend_id,
-                        defaults=defaults
-                    )
                     self._extract_security_group_rules(security_group, backend_security_group)
-            except IntegrityError:
-                logger.warning('Could not create security group with backend ID %s '
-                               'and service settings %s due to concurrent update.',
-                               backend_id, self.settings)
 
         self._delete_stale_properties(models.SecurityGroup, security_groups)
 
     def pull_quotas(self):
         self._pull_tenant_quotas(self.tenant_id, self.settings)
 
+    @sync_stage('networks')
     def pull_networks(self):
         neutron = self.neutron_client
         try:
@@ -381,6 +462,7 @@ class OpenStackTenantBackend(BaseOpenStackBackend):
         except neutron_exceptions.NeutronClientException as e:
             six.reraise(OpenStackBackendError, e)
 
+        pulled_networks = {}
         for backend_network in networks:
             defaults = {
                 'name': backend_network['name'],
@@ -390,20 +472,12 @@ class OpenStackTenantBackend(BaseOpenStackBackend):
                 defaults['type'] = backend_network['provider:network_type']
             if backend_network.get('provider:segmentation_id'):
                 defaults['segmentation_id'] = backend_network['provider:segmentation_id']
-            backend_id = backend_network['id']
-            try:
-                models.Network.objects.update_or_create(
-                    settings=self.settings,
-                    backend_id=backend_id,
-                    defaults=defaults
-                )
-            except IntegrityError:
-                logger.warning('Could not create network with backend ID %s '
-                               'and service settings %s due to concurrent update.',
-                               backend_id, self.settings)
+            pulled_networks[backend_network['id']] = defaults
 
+        self._upsert_properties(models.Network, pulled_networks)
         self._delete_stale_properties(models.Network, networks)
 
+    @sync_stage('subnets')
     def pull_subnets(self):
         neutron = self.neutron_client
         try:
@@ -421,12 +495,12 @@ class OpenStackTenantBackend(BaseOpenStackBackend):
             logger.warning('Cannot pull subnets for networks with id %s '
                            'because their networks are not pulled yet.', missing_networks)
 
+        pulled_subnets = {}
         for backend_subnet in subnets:
-            backend_id = backend_subnet['id']
             network_id = current_networks.get(backend_subnet['network_id'])
             if not network_id:
                 continue
-            defaults = {
+            pulled_subnets[backend_subnet['id']] = {
                 'name': backend_subnet['name'],
                 'description': backend_subnet['description'],
                 'allocation_pools': backend_subnet['allocation_pools'],
@@ -436,21 +510,16 @@ class OpenStackTenantBackend(BaseOpenStackBackend):
                 'enable_dhcp': backend_subnet.get('enable_dhcp', False),
                 'network_id': network_id,
             }
-            try:
-                models.SubNet.objects.update_or_create(
-                    settings=self.settings,
-                    backend_id=backend_id,
-                    defaults=defaults
-                )
-            except IntegrityError:
-                logger.warning('Could not create subnet with backend ID %s '
-                               'and service settings %s due to concurrent update.',
-                               backend_id, self.settings)
 
+        self._upsert_properties(models.SubNet, pulled_subnets)
         self._delete_stale_properties(models.SubNet, subnets)
 
     @log_backend_action()
     def create_volume(self, volume):
+        pooled_volume = self._claim_pooled_volume(volume)
+        if pooled_volume:
+            return self._create_volume_from_pool(volume, pooled_volume)
+
         kwargs = {
             'size': self.mb2gb(volume.size),
             'name': volume.name,
@@ -475,6 +544,165 @@ class OpenStackTenantBackend(BaseOpenStackBackend):
         volume.save()
         return volume
 
+    def _claim_pooled_volume(self, volume):
+        """ Take available volume created in advance from the same image, if any """
+        if not volume.image or volume.source_snapshot or volume.type:
+            return None
+
+        with transaction.atomic():
+            pooled_volume = (models.PooledVolume.objects
+                             .select_for_update(skip_locked=True)
+                             .filter(image=volume.image, runtime_state='available', size__lte=volume.size)
+                             .order_by('created')
+                             .first())
+            if not pooled_volume:
+                return None
+
+            # Quota of the claimed volume is already charged by its own row, so pool releases its quota.
+            pooled_volume.decrease_backend_quotas_usage()
+            pooled_volume.delete()
+            # Backend volume should be linked to its new owner in the same transaction,
+            # otherwise it could be treated as orphan by replenish_volume_pool.
+            volume.backend_id = pooled_volume.backend_id
+            volume.save(update_fields=['backend_id'])
+
+        # Backend is checked after the claim is committed, so that row lock is not held while cinder responds.
+        try:
+            is_usable = self._is_pooled_volume_usable(pooled_volume)
+        except OpenStackBackendError:
+            self._unlink_pooled_volume(volume)
+            raise
+        if not is_usable:
+            logger.warning('Pooled volume %s cannot be used for image %s, it is removed from pool.',
+                           pooled_volume.backend_id, volume.image.backend_id)
+            self._unlink_pooled_volume(volume)
+            return None
+        return pooled_volume
+
+    def _unlink_pooled_volume(self, volume):
+        # Backend volume is not linked anymore, so replenish_volume_pool deletes it as orphan.
+        volume.backend_id = ''
+        volume.save(update_fields=['backend_id'])
+
+    def _is_pooled_volume_usable(self, pooled_volume):
+        """ Check that pooled volume is still available and bootable from its image in backend """
+        cinder = self.cinder_client
+        try:
+            backend_volume = cinder.volumes.get(pooled_volume.backend_id)
+        except cinder_exceptions.NotFound:
+            return False
+        except cinder_exceptions.ClientException as e:
+            six.reraise(OpenStackBackendError, e)
+
+        image_metadata = getattr(backend_volume, 'volume_image_metadata', {})
+        return (backend_volume.status == 'available' and
+                backend_volume.bootable == 'true' and
+                image_metadata.get('image_id') == pooled_volume.image.backend_id)
+
+    def _create_volume_from_pool(self, volume, pooled_volume):
+        logger.info('Volume %s is created from pooled volume %s.', volume.pk, pooled_volume.backend_id)
+        cinder = self.cinder_client
+        try:
+            cinder.volumes.update(volume.backend_id, name=volume.name, description=volume.description)
+            cinder.volumes.delete_metadata(volume.backend_id, [models.PooledVolume.METADATA_KEY])
+            if volume.size > pooled_volume.size:
+                cinder.volumes.extend(volume.backend_id, self.mb2gb(volume.size))
+            backend_volume = cinder.volumes.get(volume.backend_id)
+        except cinder_exceptions.ClientException as e:
+            six.reraise(OpenStackBackendError, e)
+
+        if hasattr(backend_volume, 'volume_image_metadata'):
+            volume.image_metadata = backend_volume.volume_image_metadata
+        volume.bootable = backend_volume.bootable == 'true'
+        volume.runtime_state = backend_volume.status
+        volume.save()
+        return volume
+
+    @log_backend_action()
+    def replenish_volume_pool(self):
+        """ Keep "volume_pool_size" available volumes for each image from "volume_pool_images" option """
+        pool_size = self.settings.options.get('volume_pool_size', 0)
+        image_names = self.settings.options.get('volume_pool_images', [])
+        images = models.Image.objects.filter(settings=self.settings, name__in=image_names) if pool_size else []
+
+        cinder = self.cinder_client
+        try:
+            backend_volumes = cinder.volumes.list(search_opts={
+                'metadata': {models.PooledVolume.METADATA_KEY: 'true'},
+            })
+        except cinder_exceptions.ClientException as e:
+            six.reraise(OpenStackBackendError, e)
+        backend_volumes = {backend_volume.id: backend_volume for backend_volume in backend_volumes}
+
+        # Pooled volumes should be fetched before claimed ones, because claim removes pooled volume
+        pooled_volumes = models.PooledVolume.objects.filter(image__settings=self.settings)
+        pooled_backend_ids = set(pooled_volumes.values_list('backend_id', flat=True))
+        claimed_backend_ids = set(models.Volume.objects.filter(
+            service_project_link__service__settings=self.settings,
+            backend_id__in=backend_volumes.keys(),
+        ).values_list('backend_id', flat=True))
+        known_backend_ids = pooled_backend_ids | claimed_backend_ids
+
+        # Delete volumes which are not tracked because their creation has been interrupted
+        for backend_id in set(backend_volumes.keys()) - known_backend_ids:
+            self._delete_pooled_volume(backend_id)
+
+        # Update state of pooled volumes and delete erred, missing and redundant ones
+        available_count = {image: 0 for image in images}
+        for pooled_volume in pooled_volumes.select_related('image'):
+            backend_volume = backend_volumes.get(pooled_volume.backend_id)
+            if backend_volume is None:
+                pooled_volume.decrease_backend_quotas_usage()
+                pooled_volume.delete()
+                continue
+
+            if pooled_volume.image not in available_count or backend_volume.status.startswith('error') or \
+                    available_count[pooled_volume.image] >= pool_size:
+                self._delete_pooled_volume(pooled_volume.backend_id)
+                pooled_volume.decrease_backend_quotas_usage()
+                pooled_volume.delete()
+                continue
+
+            available_count[pooled_volume.image] += 1
+            if pooled_volume.runtime_state != backend_volume.status:
+                pooled_volume.runtime_state = backend_volume.status
+                pooled_volume.save(update_fields=['runtime_state'])
+
+        for image, count in available_count.items():
+            for _ in range(pool_size - count):
+                self._create_pooled_volume(image)
+
+    def _create_pooled_volume(self, image):
+        pooled_volume = models.PooledVolume(image=image, size=max(image.min_disk, 1024))
+        # Pool should not consume quota needed for regular volumes
+        pooled_volume.increase_backend_quotas_usage()
+
+        cinder = self.cinder_client
+        try:
+            backend_volume = cinder.volumes.create(
+                size=self.mb2gb(pooled_volume.size),
+                name='pooled-%s' % image.name,
+                imageRef=image.backend_id,
+                metadata={models.PooledVolume.METADATA_KEY: 'true'},
+            )
+        except cinder_exceptions.ClientException as e:
+            pooled_volume.decrease_backend_quotas_usage()
+            six.reraise(OpenStackBackendError, e)
+
+        pooled_volume.backend_id = backend_volume.id
+        pooled_volume.runtime_state = backend_volume.status
+        pooled_volume.save()
+        return pooled_volume
+
+    def _delete_pooled_volume(self, backend_id):
+        logger.info('Deleting pooled volume %s from tenant %s', backend_id, self.tenant_id)
+        try:
+            self.cinder_client.volumes.delete(backend_id)
+        except cinder_exceptions.NotFound:
+            logger.debug('Pooled volume %s is already gone from tenant %s', backend_id, self.tenant_id)
+        except cinder_exceptions.ClientException as e:
+            six.reraise(OpenStackBackendError, e)
+
     @log_backend_action()
     def update_volume(self, volume):
         cinder = self.cinder_client
@@ -541,8 +769,15 @@ class OpenStackTenantBackend(BaseOpenStackBackend):
 
         return volume
 
-    def _backend_volume_to_volume(self, backend_volume):
-        volume = models.Volume(
+    def _get_volume_relations_index(self):
+        """ Map backend IDs of images and instances to objects to convert volumes without query per volume """
+        images = {image.backend_id: image for image in models.Image.objects.filter(settings=self.settings)}
+        instances = {instance.backend_id: instance for instance in models.Instance.objects.filter(
+            service_project_link__service__settings=self.settings).exclude(backend_id='')}
+        return images, instances
+
+    def _backend_volume_to_record(self, backend_volume):
+        values = dict(
             name=backend_volume.name,
             description=backend_volume.description or '',
             size=self.gb2mb(backend_volume.size),
@@ -551,25 +786,32 @@ class OpenStackTenantBackend(BaseOpenStackBackend):
             type=backend_volume.volume_type or '',
             bootable=backend_volume.bootable == 'true',
             runtime_state=backend_volume.status,
-            state=models.Volume.States.OK,
         )
+        # In our setup volume could be attached only to one instance.
+        if getattr(backend_volume, 'attachments', False) and 'device' in backend_volume.attachments[0]:
+            values['device'] = backend_volume.attachments[0]['device']
+        return VolumeRecord(**values)
+
+    def _backend_volume_to_volume(self, backend_volume, images=None, instances=None):
+        record = self._backend_volume_to_record(backend_volume)
+        volume = models.Volume(state=models.Volume.States.OK, **record.get_values())
         if getattr(backend_volume, 'volume_image_metadata', False):
             volume.image_metadata = backend_volume.volume_image_metadata
-            try:
-                volume.image = models.Image.objects.get(
-                    settings=self.settings, backend_id=volume.image_metadata['image_id'])
-            except models.Image.DoesNotExist:
-                pass
-        # In our setup volume could be attached only to one instance.
+            image_id = volume.image_metadata.get('image_id')
+            if images is not None:
+                volume.image = images.get(image_id)
+            else:
+                volume.image = models.Image.objects.filter(settings=self.settings, backend_id=image_id).first()
         if getattr(backend_volume, 'attachments', False):
-            if 'device' in backend_volume.attachments[0]:
-                volume.device = backend_volume.attachments[0]['device']
-
             if 'server_id' in backend_volume.attachments[0]:
-                volume.instance = models.Instance.objects.filter(
-                    service_project_link__service__settings=self.settings,
-                    backend_id=backend_volume.attachments[0]['server_id'],
-                ).first()
+                server_id = backend_volume.attachments[0]['server_id']
+                if instances is not None:
+                    volume.instance = instances.get(server_id)
+                else:
+                    volume.instance = models.Instance.objects.filter(
+                        service_project_link__service__settings=self.settings,
+                        backend_id=server_id,
+                    ).first()
         return volume
 
     def get_volumes(self):
@@ -578,10 +820,22 @@ class OpenStackTenantBackend(BaseOpenStackBackend):
             backend_volumes = cinder.volumes.list()
         except cinder_exceptions.ClientException as e:
             six.reraise(OpenStackBackendError, e)
-        return [self._backend_volume_to_volume(backend_volume) for backend_volume in backend_volumes]
+        images, instances = self._get_volume_relations_index()
+        return [self._backend_volume_to_volume(backend_volume, images, instances)
+                for backend_volume in backend_volumes]
+
+    def get_volume_records(self):
+        cinder = self.cinder_client
+        try:
+            backend_volumes = cinder.volumes.list()
+        except cinder_exceptions.ClientException as e:
+            six.reraise(OpenStackBackendError, e)
+        return [self._backend_volume_to_record(backend_volume) for backend_volume in backend_volumes]
 
     def get_volumes_for_import(self):
-        return self._get_backend_resource(models.Volume, self.get_volumes())
+        volumes = [volume for volume in self.get_volumes()
+                   if models.PooledVolume.METADATA_KEY not in (volume.metadata or {})]
+        return self._get_backend_resource(models.Volume, volumes)
 
     @log_backend_action()
     def remove_bootable_flag(self, volume):
@@ -617,6 +871,26 @@ class OpenStackTenantBackend(BaseOpenStackBackend):
             volume.runtime_state = backend_volume.status
             volume.save(update_fields=['runtime_state'])
 
+    @log_backend_action('check are all instance volumes available')
+    def are_all_instance_volumes_available(self, instance):
+        """ Update runtime state of instance volumes until all of them are available """
+        volumes = list(instance.volumes.all())
+        cinder = self.cinder_client
+        for volume in volumes:
+            if volume.runtime_state == 'available':
+                continue
+            try:
+                backend_volume = cinder.volumes.get(volume.backend_id)
+            except cinder_exceptions.ClientException as e:
+                six.reraise(OpenStackBackendError, e)
+            if backend_volume.status != volume.runtime_state:
+                volume.runtime_state = backend_volume.status
+                volume.save(update_fields=['runtime_state'])
+            if backend_volume.status == 'error':
+                raise OpenStackBackendError('Volume %s is in erred state.' % volume)
+
+        return all(volume.runtime_state == 'available' for volume in volumes)
+
     @log_backend_action('check is volume deleted')
     def is_volume_deleted(self, volume):
         cinder = self.cinder_client
@@ -808,34 +1082,23 @@ class OpenStackTenantBackend(BaseOpenStackBackend):
         # method assumes that instance internal IPs is up to date.
         neutron = self.neutron_client
 
-        internal_ip_mappings = {ip.backend_id: ip for ip in instance.internal_ips_set.all().exclude(backend_id='')}
+        internal_ips = dict(instance.internal_ips_set.exclude(backend_id='').values_list('backend_id', 'id'))
         try:
             backend_floating_ips = neutron.list_floatingips(
-                tenant_id=self.tenant_id, port_id=internal_ip_mappings.keys())['floatingips']
+                tenant_id=self.tenant_id, port_id=internal_ips.keys())['floatingips']
         except neutron_exceptions.NeutronClientException as e:
             six.reraise(OpenStackBackendError, e)
 
-        floating_ip_mappings = {ip.backend_id: ip for ip in
-                                instance.floating_ips.filter(is_booked=False).exclude(backend_id='')}
+        backend_ids = [ip['id'] for ip in backend_floating_ips]
+        floating_ips = models.FloatingIP.objects.filter(
+            Q(backend_id__in=backend_ids) | Q(internal_ip__instance=instance),
+            settings=self.settings,
+        ).exclude(backend_id='')
 
         with transaction.atomic():
-            for backend_floating_ip in backend_floating_ips:
-                imported_floating_ip = self._backend_floating_ip_to_floating_ip(backend_floating_ip)
-
-                floating_ip = floating_ip_mappings.pop(imported_floating_ip.backend_id, None)
-                if floating_ip is None:
-                    internal_ip = internal_ip_mappings[imported_floating_ip._internal_ip_backend_id]
-                    imported_floating_ip.internal_ip = internal_ip
-                    imported_floating_ip.save()
-                    continue
-
-                # Don't update user defined name.
-                if floating_ip.address != floating_ip.name:
-                    imported_floating_ip.name = floating_ip.name
-                update_pulled_fields(floating_ip, imported_floating_ip, models.FloatingIP.get_backend_fields())
-
+            stale_ids = self._reconcile_floating_ips(backend_floating_ips, internal_ips, floating_ips)
             # Detach floating IPs from internal IPs
-            instance.floating_ips.filter(backend_id__in=floating_ip_mappings.keys()).update(internal_ip=None)
+            instance.floating_ips.filter(backend_id__in=stale_ids, is_booked=False).update(internal_ip=None)
 
     @log_backend_action()
     def push_instance_floating_ips(self, instance):
@@ -849,23 +1112,49 @@ class OpenStackTenantBackend(BaseOpenStackBackend):
 
         # disconnect stale
         instance_floating_ips_ids = [fip.backend_id for fip in instance_floating_ips]
-        for backend_floating_ip in backend_floating_ips:
-            if backend_floating_ip['id'] not in instance_floating_ips_ids:
-                try:
-                    neutron.update_floatingip(backend_floating_ip['id'], body={'floatingip': {'port_id': None}})
-                except neutron_exceptions.NeutronClientException as e:
-                    six.reraise(OpenStackBackendError, e)
+        updates = [(backend_floating_ip['id'], None) for backend_floating_ip in backend_floating_ips
+                   if backend_floating_ip['id'] not in instance_floating_ips_ids]
 
         # connect new ones
         backend_floating_ip_ids = {fip['id']: fip for fip in backend_floating_ips}
         for floating_ip in instance_floating_ips:
             backend_floating_ip = backend_floating_ip_ids.get(floating_ip.backend_id)
             if not backend_floating_ip or backend_floating_ip['port_id'] != floating_ip.internal_ip.backend_id:
-                try:
-                    neutron.update_floatingip(
-                        floating_ip.backend_id, body={'floatingip': {'port_id': floating_ip.internal_ip.backend_id}})
-                except neutron_exceptions.NeutronClientException as e:
-                    six.reraise(OpenStackBackendError, e)
+                updates.append((floating_ip.backend_id, floating_ip.internal_ip.backend_id))
+
+        def update_floating_ip(update):
+            backend_id, port_id = update
+            try:
+                neutron.update_floatingip(backend_id, body={'floatingip': {'port_id': port_id}})
+            except neutron_exceptions.NeutronClientException as e:
+                six.reraise(OpenStackBackendError, e)
+
+        self._execute_concurrently(update_floating_ip, updates)
+
+    def are_all_instance_floating_ips_active(self, instance):
+        """ Update runtime state of instance floating IPs using single request to neutron """
+        floating_ips = list(instance.floating_ips.exclude(backend_id=''))
+        if not floating_ips:
+            return True
+
+        neutron = self.neutron_client
+        try:
+            backend_floating_ips = neutron.list_floatingips(
+                tenant_id=self.tenant_id, id=[floating_ip.backend_id for floating_ip in floating_ips])['floatingips']
+        except neutron_exceptions.NeutronClientException as e:
+            six.reraise(OpenStackBackendError, e)
+
+        statuses = {backend_floating_ip['id']: backend_floating_ip['status']
+                    for backend_floating_ip in backend_floating_ips}
+        for floating_ip in floating_ips:
+            status = statuses.get(floating_ip.backend_id, floating_ip.runtime_state)
+            if status != floating_ip.runtime_state:
+                floating_ip.runtime_state = status
+                floating_ip.save(update_fields=['runtime_state'])
+            if status == 'ERROR':
+                raise OpenStackBackendError('Floating IP %s is in erred state.' % floating_ip.address)
+
+        return all(floating_ip.runtime_state == 'ACTIVE' for floating_ip in floating_ips)
 
     def create_floating_ip(self, floating_ip):
         neutron = self.neutron_client
@@ -891,6 +1180,49 @@ class OpenStackTenantBackend(BaseOpenStackBackend):
         floating_ip.decrease_backend_quotas_usage()
         floating_ip.delete()
 
+    @log_backend_action()
+    def replenish_floating_ip_pool(self):
+        """ Keep "floating_ip_pool_size" free floating IPs allocated on external network """
+        pool_size = self.settings.options.get('floating_ip_pool_size', 0)
+        if not pool_size or 'external_network_id' not in self.settings.options:
+            return
+
+        free_count = (models.FloatingIP.objects
+                      .filter(settings=self.settings,
+                              backend_network_id=self.external_network_id,
+                              is_booked=False,
+                              internal_ip__isnull=True)
+                      .exclude(backend_id='')
+                      .count())
+
+        for _ in range(pool_size - free_count):
+            self._allocate_pooled_floating_ip()
+
+    def _allocate_pooled_floating_ip(self):
+        floating_ip = models.FloatingIP(settings=self.settings, backend_network_id=self.external_network_id)
+        # Pool is limited by tenant floating IP quota as any other floating IP.
+        floating_ip.increase_backend_quotas_usage()
+
+        neutron = self.neutron_client
+        try:
+            backend_floating_ip = neutron.create_floatingip({
+                'floatingip': {
+                    'floating_network_id': floating_ip.backend_network_id,
+                    'tenant_id': self.tenant_id,
+                }
+            })['floatingip']
+        except neutron_exceptions.NeutronClientException as e:
+            floating_ip.decrease_backend_quotas_usage()
+            six.reraise(OpenStackBackendError, e)
+
+        # Row is saved only after allocation, so that instance provisioning never books
+        # floating IP which is not allocated yet.
+        floating_ip.name = floating_ip.address = backend_floating_ip['floating_ip_address']
+        floating_ip.backend_id = backend_floating_ip['id']
+        floating_ip.runtime_state = backend_floating_ip['status']
+        floating_ip.save()
+        return floating_ip
+
     @log_backend_action()
     def pull_floating_ip_runtime_state(self, floating_ip):
         neutron = self.neutron_client
@@ -972,30 +1304,36 @@ class OpenStackTenantBackend(BaseOpenStackBackend):
             if timezone.is_naive(d):
                 launch_time = timezone.make_aware(d, timezone.utc)
 
-        instance = models.Instance(
+        record = self._backend_instance_to_record(backend_instance, backend_flavor)
+        return models.Instance(
             name=backend_instance.name or backend_instance.id,
             key_name=backend_instance.key_name or '',
             start_time=launch_time,
             state=models.Instance.States.OK,
-            runtime_state=backend_instance.status,
             created=dateparse.parse_datetime(backend_instance.created),
-            backend_id=backend_instance.id,
+            **record.get_values()
         )
 
+    def _backend_instance_to_record(self, backend_instance, backend_flavor=None):
+        values = dict(
+            runtime_state=backend_instance.status,
+            backend_id=backend_instance.id,
+        )
         if backend_flavor:
-            instance.flavor_name = backend_flavor.name
-            instance.flavor_disk = backend_flavor.disk
-            instance.cores = backend_flavor.vcpus
-            instance.ram = backend_flavor.ram
-
-        return instance
+            values.update(
+                flavor_name=backend_flavor.name,
+                flavor_disk=backend_flavor.disk,
+                cores=backend_flavor.vcpus,
+                ram=backend_flavor.ram,
+            )
+        return InstanceRecord(**values)
 
     def _get_backend_resource(self, model, resources):
         registered_backend_ids = model.objects.filter(
             service_project_link__service__settings=self.settings).values_list('backend_id', flat=True)
         return [instance for instance in resources if instance.backend_id not in registered_backend_ids]
 
-    def get_instances(self):
+    def _list_instances(self, convert):
         nova = self.nova_client
         try:
             backend_instances = nova.servers.list()
@@ -1004,11 +1342,14 @@ class OpenStackTenantBackend(BaseOpenStackBackend):
             six.reraise(OpenStackBackendError, e)
 
         backend_flavors_map = {flavor.id: flavor for flavor in backend_flavors}
-        instances = []
-        for backend_instance in backend_instances:
-            instance_flavor = backend_flavors_map.get(backend_instance.flavor['id'])
-            instances.append(self._backend_instance_to_instance(backend_instance, instance_flavor))
-        return instances
+        return [convert(backend_instance, backend_flavors_map.get(backend_instance.flavor['id']))
+                for backend_instance in backend_instances]
+
+    def get_instances(self):
+        return self._list_instances(self._backend_instance_to_instance)
+
+    def get_instance_records(self):
+        return self._list_instances(self._backend_instance_to_record)
 
     def get_instances_for_import(self):
         return self._get_backend_resource(models.Instance, self.get_instances())
@@ -1085,6 +1426,7 @@ class OpenStackTenantBackend(BaseOpenStackBackend):
                 # remove stale internal IPs
                 instance.internal_ips_set.filter(subnet__backend_id__in=internal_ip_mappings.keys()).delete()
 
+    @sync_stage('internal_ips')
     def pull_internal_ips(self):
         synchronizer = InternalIPSynchronizer(self.neutron_client, self.tenant_id, self.settings)
         synchronizer.execute()
@@ -1154,6 +1496,56 @@ class OpenStackTenantBackend(BaseOpenStackBackend):
             else:
                 instance.security_groups.add(security_group)
 
+    def pull_instances_security_groups(self, instances):
+        """ Pull security groups of all given instances using single listing of tenant ports """
+        if not instances:
+            return
+
+        neutron = self.neutron_client
+        try:
+            ports = neutron.list_ports(tenant_id=self.tenant_id)['ports']
+        except neutron_exceptions.NeutronClientException as e:
+            six.reraise(OpenStackBackendError, e)
+
+        backend_groups = {}
+        for port in ports:
+            backend_groups.setdefault(port['device_id'], set()).update(port.get('security_groups', []))
+
+        group_ids = dict(
+            models.SecurityGroup.objects
+            .filter(settings=self.settings)
+            .exclude(backend_id='')
+            .values_list('backend_id', 'id')
+        )
+
+        expected_pairs = set()
+        for instance in instances:
+            for backend_id in backend_groups.get(instance.backend_id, set()):
+                if backend_id not in group_ids:
+                    logger.error('Security group with id %s does not exist at Waldur. Service settings: %s',
+                                 backend_id, self.settings)
+                    continue
+                expected_pairs.add((instance.id, group_ids[backend_id]))
+
+        through_model = models.Instance.security_groups.through
+        current_links = {
+            (instance_id, group_id): link_id for link_id, instance_id, group_id in
+            through_model.objects
+            .filter(instance__in=instances)
+            .exclude(securitygroup__backend_id='')
+            .values_list('id', 'instance_id', 'securitygroup_id')
+        }
+        current_pairs = set(current_links)
+
+        stale_link_ids = [current_links[pair] for pair in current_pairs - expected_pairs]
+        if stale_link_ids:
+            through_model.objects.filter(id__in=stale_link_ids).delete()
+
+        through_model.objects.bulk_create([
+            through_model(instance_id=instance_id, securitygroup_id=group_id)
+            for instance_id, group_id in expected_pairs - current_pairs
+        ])
+
     @log_backend_action()
     def push_instance_security_groups(self, instance):
         nova = self.nova_client
@@ -1237,6 +1629,94 @@ class OpenStackTenantBackend(BaseOpenStackBackend):
         except nova_exceptions.ClientException as e:
             six.reraise(OpenStackBackendError, e)
 
+    INSTANCE_POWER_ACTIONS = {
+        'start': 'start',
+        'stop': 'stop',
+        'restart': 'reboot',
+    }
+
+    def change_instances_power_state(self, instance_uuids, action):
+        """ Start, stop or restart several instances concurrently.
+
+        Instances that nova refuses to process are marked as erred, the others are left in updating state.
+        """
+        instances = list(models.Instance.objects.filter(
+            service_project_link__service__settings=self.settings, uuid__in=instance_uuids))
+        for instance in instances:
+            instance.begin_updating()
+            instance.save(update_fields=['state'])
+
+        nova = self.nova_client
+        nova_method = getattr(nova.servers, self.INSTANCE_POWER_ACTIONS[action])
+
+        def change_power_state(instance):
+            try:
+                nova_method(instance.backend_id)
+            except nova_exceptions.ClientException as e:
+                return e
+
+        # Database is updated in the calling thread only.
+        errors = self._execute_concurrently(change_power_state, instances)
+        for instance, error in zip(instances, errors):
+            if error:
+                instance.set_erred()
+                instance.error_message = six.text_type(error)
+                instance.save(update_fields=['state', 'error_message'])
+            elif action == 'stop':
+                instance.start_time = None
+                instance.save(update_fields=['start_time'])
+
+    # Time of Waldur and OpenStack servers may differ a bit.
+    CHANGES_SINCE_MARGIN = datetime.timedelta(minutes=5)
+
+    def pull_instances_runtime_state(self, instance_uuids, success_state):
+        """ Update runtime state of several instances with single request to nova.
+
+        Instances that reached success state are marked as OK, failed ones are marked as erred.
+        Only servers changed since the operation has been started are listed, including deleted ones,
+        servers that are not listed have not changed yet and are left in progress.
+        Returns UUIDs of instances that are still in progress.
+        """
+        instances = list(models.Instance.objects.filter(
+            service_project_link__service__settings=self.settings,
+            uuid__in=instance_uuids,
+            state=models.Instance.States.UPDATING,
+        ))
+        if not instances:
+            return []
+
+        changes_since = min(instance.modified for instance in instances) - self.CHANGES_SINCE_MARGIN
+        nova = self.nova_client
+        try:
+            backend_instances = {backend_instance.id: backend_instance for backend_instance in
+                                 nova.servers.list(search_opts={'changes-since': changes_since.isoformat()})}
+        except nova_exceptions.ClientException as e:
+            six.reraise(OpenStackBackendError, e)
+
+        pending_uuids = []
+        for instance in instances:
+            backend_instance = backend_instances.get(instance.backend_id)
+            if backend_instance is None:
+                pending_uuids.append(instance.uuid.hex)
+                continue
+            elif backend_instance.status == 'DELETED':
+                instance.set_erred()
+                instance.error_message = 'Instance does not exist in backend.'
+            else:
+                instance.runtime_state = backend_instance.status
+                if backend_instance.status == success_state:
+                    instance.set_ok()
+                    instance.action = ''
+                    instance.action_details = {}
+                elif backend_instance.status == 'ERROR':
+                    instance.set_erred()
+                    if hasattr(backend_instance, 'fault'):
+                        instance.error_message = backend_instance.fault['message']
+                else:
+                    pending_uuids.append(instance.uuid.hex)
+            instance.save()
+        return pending_uuids
+
     @log_backend_action()
     def resize_instance(self, instance, flavor_id):
         nova = self.nova_client
@@ -5,13 +5,14 @@ from celery import chain
 from waldur_core.core import executors as core_executors
 from waldur_core.core import tasks as core_tasks
 from waldur_core.core import utils as core_utils
-from waldur_core.structure import executors as structure_executors
 from waldur_openstack.openstack import executors as openstack_executors
+from waldur_openstack.openstack_base import executors as openstack_base_executors
+from waldur_openstack.openstack_base import tasks as openstack_base_tasks
 
 from . import tasks, models
 
 
-class VolumeCreateExecutor(core_executors.CreateExecutor):
+class VolumeCreateExecutor(openstack_base_executors.CreateExecutor):
 
     @classmethod
     def get_task_signature(cls, volume, serialized_volume, **kwargs):
@@ -21,16 +22,21 @@ class VolumeCreateExecutor(core_executors.CreateExecutor):
                 'create_volume',
                 state_transition='begin_creating'
             ),
-            core_tasks.PollRuntimeStateTask().si(
+            openstack_base_tasks.with_initial_delay(openstack_base_tasks.PollRuntimeStateTask().si(
                 serialized_volume,
                 backend_pull_method='pull_volume_runtime_state',
                 success_state='available',
                 erred_state='error',
-            ).set(countdown=30)
+                operation='create',
+            ), volume)
         )
 
+    @classmethod
+    def get_failure_signature(cls, volume, serialized_volume, **kwargs):
+        return openstack_base_tasks.SetErredTask().s(serialized_volume)
+
 
-class VolumeUpdateExecutor(core_executors.UpdateExecutor):
+class VolumeUpdateExecutor(openstack_base_executors.UpdateExecutor):
 
     @classmethod
     def get_task_signature(cls, volume, serialized_volume, **kwargs):
@@ -42,7 +48,7 @@ class VolumeUpdateExecutor(core_executors.UpdateExecutor):
             return core_tasks.StateTransitionTask().si(serialized_volume, state_transition='begin_updating')
 
 
-class VolumeDeleteExecutor(core_executors.DeleteExecutor):
+class VolumeDeleteExecutor(openstack_base_executors.DeleteExecutor):
 
     @classmethod
     def get_task_signature(cls, volume, serialized_volume, **kwargs):
@@ -50,13 +56,15 @@ class VolumeDeleteExecutor(core_executors.DeleteExecutor):
             return chain(
                 core_tasks.BackendMethodTask().si(
                     serialized_volume, 'delete_volume', state_transition='begin_deleting'),
-                core_tasks.PollBackendCheckTask().si(serialized_volume, 'is_volume_deleted'),
+                openstack_base_tasks.with_initial_delay(openstack_base_tasks.PollBackendCheckTask().si(
+                    serialized_volume, 'is_volume_deleted', operation='delete',
+                ), volume),
             )
         else:
             return core_tasks.StateTransitionTask().si(serialized_volume, state_transition='begin_deleting')
 
 
-class VolumePullExecutor(core_executors.ActionExecutor):
+class VolumePullExecutor(openstack_base_executors.PullExecutor):
     action = 'Pull'
 
     @classmethod
@@ -66,7 +74,7 @@ class VolumePullExecutor(core_executors.ActionExecutor):
             state_transition='begin_updating')
 
 
-class VolumeExtendExecutor(core_executors.ActionExecutor):
+class VolumeExtendExecutor(openstack_base_executors.ActionExecutor):
     action = 'Extend'
 
     @classmethod
@@ -94,12 +102,13 @@ class VolumeExtendExecutor(core_executors.ActionExecutor):
                     backend_method='extend_volume',
                     state_transition='begin_updating',
                 ),
-                core_tasks.PollRuntimeStateTask().si(
+                openstack_base_tasks.with_initial_delay(openstack_base_tasks.PollRuntimeStateTask().si(
                     serialized_volume,
                     backend_pull_method='pull_volume_runtime_state',
                     success_state='available',
-                    erred_state='error'
-                )
+                    erred_state='error',
+                    operation='extend',
+                ), volume)
             )
 
         return chain(
@@ -112,34 +121,37 @@ class VolumeExtendExecutor(core_executors.ActionExecutor):
                 backend_method='detach_volume',
                 state_transition='begin_updating'
             ),
-            core_tasks.PollRuntimeStateTask().si(
+            openstack_base_tasks.with_initial_delay(openstack_base_tasks.PollRuntimeStateTask().si(
                 serialized_volume,
                 backend_pull_method='pull_volume_runtime_state',
                 success_state='available',
-                erred_state='error'
-            ),
+                erred_state='error',
+                operation='detach',
+            ), volume),
             core_tasks.BackendMethodTask().si(
                 serialized_volume,
                 backend_method='extend_volume',
             ),
-            core_tasks.PollRuntimeStateTask().si(
+            openstack_base_tasks.with_initial_delay(openstack_base_tasks.PollRuntimeStateTask().si(
                 serialized_volume,
                 backend_pull_method='pull_volume_runtime_state',
                 success_state='available',
-                erred_state='error'
-            ),
+                erred_state='error',
+                operation='extend',
+            ), volume),
             core_tasks.BackendMethodTask().si(
                 serialized_volume,
                 instance_uuid=volume.instance.uuid.hex,
                 device=volume.device,
                 backend_method='attach_volume',
             ),
-            core_tasks.PollRuntimeStateTask().si(
+            openstack_base_tasks.with_initial_delay(openstack_base_tasks.PollRuntimeStateTask().si(
                 serialized_volume,
                 backend_pull_method='pull_volume_runtime_state',
                 success_state='in-use',
-                erred_state='error'
-            ),
+                erred_state='error',
+                operation='attach',
+            ), volume),
         )
 
     @classmethod
@@ -159,7 +171,7 @@ class VolumeExtendExecutor(core_executors.ActionExecutor):
         return tasks.VolumeExtendErredTask().s(serialized_volume)
 
 
-class VolumeAttachExecutor(core_executors.ActionExecutor):
+class VolumeAttachExecutor(openstack_base_executors.ActionExecutor):
     action = 'Attach'
 
     @classmethod
@@ -176,18 +188,19 @@ class VolumeAttachExecutor(core_executors.ActionExecutor):
                 backend_method='attach_volume',
                 state_transition='begin_updating'
             ),
-            core_tasks.PollRuntimeStateTask().si(
+            openstack_base_tasks.with_initial_delay(openstack_base_tasks.PollRuntimeStateTask().si(
                 serialized_volume,
                 backend_pull_method='pull_volume_runtime_state',
                 success_state='in-use',
                 erred_state='error',
-            ),
+                operation='attach',
+            ), volume),
             # additional pull to populate field "device".
             core_tasks.BackendMethodTask().si(serialized_volume, backend_method='pull_volume'),
         )
 
 
-class VolumeDetachExecutor(core_executors.ActionExecutor):
+class VolumeDetachExecutor(openstack_base_executors.ActionExecutor):
     action = 'Detach'
 
     @classmethod
@@ -199,16 +212,17 @@ class VolumeDetachExecutor(core_executors.ActionExecutor):
         return chain(
             core_tasks.BackendMethodTask().si(
                 serialized_volume, backend_method='detach_volume', state_transition='begin_updating'),
-            core_tasks.PollRuntimeStateTask().si(
+            openstack_base_tasks.with_initial_delay(openstack_base_tasks.PollRuntimeStateTask().si(
                 serialized_volume,
                 backend_pull_method='pull_volume_runtime_state',
                 success_state='available',
                 erred_state='error',
-            )
+                operation='detach',
+            ), volume)
         )
 
 
-class SnapshotCreateExecutor(core_executors.CreateExecutor):
+class SnapshotCreateExecutor(openstack_base_executors.CreateExecutor):
 
     @classmethod
     def get_task_signature(cls, snapshot, serialized_snapshot, **kwargs):
@@ -218,16 +232,21 @@ class SnapshotCreateExecutor(core_executors.CreateExecutor):
                 'create_snapshot',
                 state_transition='begin_creating'
             ),
-            core_tasks.PollRuntimeStateTask().si(
+            openstack_base_tasks.with_initial_delay(openstack_base_tasks.PollRuntimeStateTask().si(
                 serialized_snapshot,
                 backend_pull_method='pull_snapshot_runtime_state',
                 success_state='available',
                 erred_state='error',
-            ).set(countdown=10)
+                operation='create',
+            ), snapshot)
         )
 
+    @classmethod
+    def get_failure_signature(cls, snapshot, serialized_snapshot, **kwargs):
+        return openstack_base_tasks.SetErredTask().s(serialized_snapshot)
+
 
-class SnapshotUpdateExecutor(core_executors.UpdateExecutor):
+class SnapshotUpdateExecutor(openstack_base_executors.UpdateExecutor):
 
     @classmethod
     def get_task_signature(cls, snapshot, serialized_snapshot, **kwargs):
@@ -240,7 +259,7 @@ class SnapshotUpdateExecutor(core_executors.UpdateExecutor):
             return core_tasks.StateTransitionTask().si(serialized_snapshot, state_transition='begin_updating')
 
 
-class SnapshotDeleteExecutor(core_executors.DeleteExecutor):
+class SnapshotDeleteExecutor(openstack_base_executors.DeleteExecutor):
 
     @classmethod
     def get_task_signature(cls, snapshot, serialized_snapshot, **kwargs):
@@ -248,13 +267,15 @@ class SnapshotDeleteExecutor(core_executors.DeleteExecutor):
             return chain(
                 core_tasks.BackendMethodTask().si(
                     serialized_snapshot, 'delete_snapshot', state_transition='begin_deleting'),
-                core_tasks.PollBackendCheckTask().si(serialized_snapshot, 'is_snapshot_deleted'),
+                openstack_base_tasks.with_initial_delay(openstack_base_tasks.PollBackendCheckTask().si(
+                    serialized_snapshot, 'is_snapshot_deleted', operation='delete',
+                ), snapshot),
             )
         else:
             return core_tasks.StateTransitionTask().si(serialized_snapshot, state_transition='begin_deleting')
 
 
-class SnapshotPullExecutor(core_executors.ActionExecutor):
+class SnapshotPullExecutor(openstack_base_executors.PullExecutor):
     action = 'Pull'
 
     @classmethod
@@ -264,31 +285,36 @@ class SnapshotPullExecutor(core_executors.ActionExecutor):
             state_transition='begin_updating')
 
 
-class InstanceCreateExecutor(core_executors.CreateExecutor):
+class InstanceCreateExecutor(openstack_base_executors.CreateExecutor):
     """ First - create instance volumes in parallel, after - create instance based on created volumes """
 
     @classmethod
     def get_task_signature(cls, instance, serialized_instance, ssh_key=None, flavor=None):
-        """ Create all instance volumes in parallel and wait for them to provision """
-        serialized_volumes = [core_utils.serialize_instance(volume) for volume in instance.volumes.all()]
+        """ Create volumes and floating IPs in parallel, create instance as soon as volumes are available """
+        volumes = instance.volumes.all()
+        serialized_volumes = [core_utils.serialize_instance(volume) for volume in volumes]
 
         _tasks = [tasks.ThrottleProvisionStateTask().si(serialized_instance, state_transition='begin_creating')]
         # Create volumes
         for serialized_volume in serialized_volumes:
             _tasks.append(tasks.ThrottleProvisionTask().si(
                 serialized_volume, 'create_volume', state_transition='begin_creating'))
-        for index, serialized_volume in enumerate(serialized_volumes):
-            # Wait for volume creation
-            _tasks.append(core_tasks.PollRuntimeStateTask().si(
-                serialized_volume,
-                backend_pull_method='pull_volume_runtime_state',
-                success_state='available',
-                erred_state='error',
-            ).set(countdown=30 if index == 0 else 0))
+        # Create non-existing floating IPs while volumes are being created
+        for floating_ip in instance.floating_ips.filter(backend_id=''):
+            serialized_floating_ip = core_utils.serialize_instance(floating_ip)
+            _tasks.append(core_tasks.BackendMethodTask().si(serialized_floating_ip, 'create_floating_ip'))
+        # Wait for creation of all volumes, checking them with single task
+        _tasks.append(openstack_base_tasks.with_initial_delay(tasks.PollInstanceVolumesTask().si(
+            serialized_instance,
+            'are_all_instance_volumes_available',
+            operation='create_volumes',
+        ), instance))
+        for serialized_volume in serialized_volumes:
             # Pull volume to sure that it is bootable
             _tasks.append(core_tasks.BackendMethodTask().si(serialized_volume, 'pull_volume'))
             # Mark volume as OK
             _tasks.append(core_tasks.StateTransitionTask().si(serialized_volume, state_transition='set_ok'))
+
         # Create instance based on volumes
         kwargs = {
             'backend_flavor_id': flavor.backend_id,
@@ -300,12 +326,22 @@ class InstanceCreateExecutor(core_executors.CreateExecutor):
             serialized_instance, 'create_instance', **kwargs).set(countdown=10))
 
         # Wait for instance creation
-        _tasks.append(core_tasks.PollRuntimeStateTask().si(
+        _tasks.append(openstack_base_tasks.with_initial_delay(openstack_base_tasks.PollRuntimeStateTask().si(
             serialized_instance,
             backend_pull_method='pull_instance_runtime_state',
             success_state=models.Instance.RuntimeStates.ACTIVE,
             erred_state=models.Instance.RuntimeStates.ERROR,
-        ))
+            operation='create',
+        ), instance))
+
+        # Pull instance internal IPs
+        # pull_instance_internal_ips method cannot be used, because it requires backend_id to update
+        # existing internal IPs. However, internal IPs of the created instance does not have backend_ids.
+        _tasks.append(core_tasks.BackendMethodTask().si(serialized_instance, 'pull_created_instance_internal_ips'))
+
+        # Push instance floating IPs and wait for their connection
+        _tasks.append(core_tasks.BackendMethodTask().si(serialized_instance, 'push_instance_floating_ips'))
+        _tasks.append(cls.get_floating_ips_check_signature(instance, serialized_instance))
 
         # Update volumes runtime state and device name
         for serialized_volume in serialized_volumes:
@@ -315,36 +351,25 @@ class InstanceCreateExecutor(core_executors.CreateExecutor):
                 update_fields=['runtime_state', 'device']
             ))
 
-        # Pull instance internal IPs
-        # pull_instance_internal_ips method cannot be used, because it requires backend_id to update
-        # existing internal IPs. However, internal IPs of the created instance does not have backend_ids.
-        _tasks.append(core_tasks.BackendMethodTask().si(serialized_instance, 'pull_created_instance_internal_ips'))
-
         # Pull instance security groups
         _tasks.append(core_tasks.BackendMethodTask().si(serialized_instance, 'pull_instance_security_groups'))
 
-        # Create non-existing floating IPs
-        for floating_ip in instance.floating_ips.filter(backend_id=''):
-            serialized_floating_ip = core_utils.serialize_instance(floating_ip)
-            _tasks.append(core_tasks.BackendMethodTask().si(serialized_floating_ip, 'create_floating_ip'))
-        # Push instance floating IPs
-        _tasks.append(core_tasks.BackendMethodTask().si(serialized_instance, 'push_instance_floating_ips'))
-        # Wait for operation completion
-        for index, floating_ip in enumerate(instance.floating_ips):
-            _tasks.append(core_tasks.PollRuntimeStateTask().si(
-                core_utils.serialize_instance(floating_ip),
-                backend_pull_method='pull_floating_ip_runtime_state',
-                success_state='ACTIVE',
-                erred_state='ERRED',
-            ).set(countdown=5 if not index else 0))
-
         shared_tenant = instance.service_project_link.service.settings.scope
         if shared_tenant:
             serialized_executor = core_utils.serialize_class(openstack_executors.TenantPullFloatingIPsExecutor)
             serialized_tenant = core_utils.serialize_instance(shared_tenant)
-            _tasks.append(core_tasks.ExecutorTask().si(serialized_executor, serialized_tenant))
+            _tasks.append(openstack_base_tasks.CoalescedExecutorTask().si(serialized_executor, serialized_tenant))
         return chain(*_tasks)
 
+    @classmethod
+    def get_floating_ips_check_signature(cls, instance, serialized_instance):
+        """ Wait until all instance floating IPs are connected, checking them with single request """
+        return openstack_base_tasks.with_initial_delay(openstack_base_tasks.PollBackendCheckTask().si(
+            serialized_instance,
+            'are_all_instance_floating_ips_active',
+            operation='connect_floating_ips',
+        ), instance)
+
     @classmethod
     def get_success_signature(cls, instance, serialized_instance, **kwargs):
         return tasks.SetInstanceOKTask().si(serialized_instance)
@@ -353,8 +378,19 @@ class InstanceCreateExecutor(core_executors.CreateExecutor):
     def get_failure_signature(cls, instance, serialized_instance, **kwargs):
         return tasks.SetInstanceErredTask().s(serialized_instance)
 
+    @classmethod
+    def execute_bulk(cls, instances, countdown=2, is_heavy_task=False, **kwargs):
+        """ Provision several instances, each one with its own chain.
+
+        Batch does not share backend requests or polling: every chain is the same as for
+        a single instance and has its own success and failure callbacks,
+        so failure of one instance does not affect the others.
+        """
+        return [cls.execute(instance, countdown=countdown, is_heavy_task=is_heavy_task, **kwargs)
+                for instance in instances]
+
 
-class InstanceUpdateExecutor(core_executors.UpdateExecutor):
+class InstanceUpdateExecutor(openstack_base_executors.UpdateExecutor):
 
     @classmethod
     def get_task_signature(cls, instance, serialized_instance, **kwargs):
@@ -366,7 +402,7 @@ class InstanceUpdateExecutor(core_executors.UpdateExecutor):
             return core_tasks.StateTransitionTask().si(serialized_instance, state_transition='begin_updating')
 
 
-class InstanceUpdateSecurityGroupsExecutor(core_executors.ActionExecutor):
+class InstanceUpdateSecurityGroupsExecutor(openstack_base_executors.ActionExecutor):
     action = 'Update security groups'
 
     @classmethod
@@ -378,7 +414,7 @@ class InstanceUpdateSecurityGroupsExecutor(core_executors.ActionExecutor):
         )
 
 
-class InstanceDeleteExecutor(core_executors.DeleteExecutor):
+class InstanceDeleteExecutor(openstack_base_executors.DeleteExecutor):
 
     @classmethod
     def get_task_signature(cls, instance, serialized_instance, force=False, **kwargs):
@@ -412,10 +448,11 @@ class InstanceDeleteExecutor(core_executors.DeleteExecutor):
                 backend_method='delete_instance',
                 state_transition='begin_deleting',
             ),
-            core_tasks.PollBackendCheckTask().si(
+            openstack_base_tasks.with_initial_delay(openstack_base_tasks.PollBackendCheckTask().si(
                 serialized_instance,
                 backend_check_method='is_instance_deleted',
-            ),
+                operation='delete',
+            ), instance),
         ]
         if release_floating_ips:
             for index, floating_ip in enumerate(instance.floating_ips):
@@ -435,7 +472,7 @@ class InstanceDeleteExecutor(core_executors.DeleteExecutor):
         if shared_tenant:
             serialized_executor = core_utils.serialize_class(openstack_executors.TenantPullFloatingIPsExecutor)
             serialized_tenant = core_utils.serialize_instance(shared_tenant)
-            _tasks.append(core_tasks.ExecutorTask().si(serialized_executor, serialized_tenant))
+            _tasks.append(openstack_base_tasks.CoalescedExecutorTask().si(serialized_executor, serialized_tenant))
 
         return _tasks
 
@@ -449,19 +486,23 @@ class InstanceDeleteExecutor(core_executors.DeleteExecutor):
             )
             for volume in data_volumes
         ]
-        check_volumes = [
-            core_tasks.PollRuntimeStateTask().si(
+        check_volumes = []
+        for index, volume in enumerate(data_volumes):
+            check_volume = openstack_base_tasks.PollRuntimeStateTask().si(
                 core_utils.serialize_instance(volume),
                 backend_pull_method='pull_volume_runtime_state',
                 success_state='available',
-                erred_state='error'
+                erred_state='error',
+                operation='detach',
             )
-            for volume in data_volumes
-        ]
+            # Volumes are detached concurrently, so only the first check waits for the operation.
+            if index == 0:
+                check_volume = openstack_base_tasks.with_initial_delay(check_volume, volume)
+            check_volumes.append(check_volume)
         return detach_volumes + check_volumes
 
 
-class InstanceFlavorChangeExecutor(core_executors.ActionExecutor):
+class InstanceFlavorChangeExecutor(openstack_base_executors.ActionExecutor):
     action = 'Change flavor'
 
     @classmethod
@@ -484,41 +525,45 @@ class InstanceFlavorChangeExecutor(core_executors.ActionExecutor):
                 state_transition='begin_updating',
                 flavor_id=flavor.backend_id
             ),
-            core_tasks.PollRuntimeStateTask().si(
+            openstack_base_tasks.with_initial_delay(openstack_base_tasks.PollRuntimeStateTask().si(
                 serialized_instance,
                 backend_pull_method='pull_instance_runtime_state',
                 success_state='VERIFY_RESIZE',
-                erred_state='ERRED'
-            ),
+                erred_state='ERRED',
+                operation='resize',
+            ), instance),
             core_tasks.BackendMethodTask().si(
                 serialized_instance,
                 backend_method='confirm_instance_resize'
             ),
-            core_tasks.PollRuntimeStateTask().si(
+            openstack_base_tasks.with_initial_delay(openstack_base_tasks.PollRuntimeStateTask().si(
                 serialized_instance,
                 backend_pull_method='pull_instance_runtime_state',
                 success_state='SHUTOFF',
-                erred_state='ERRED'
-            ),
+                erred_state='ERRED',
+                operation='confirm_resize',
+            ), instance),
         )
 
 
-class InstancePullExecutor(core_executors.ActionExecutor):
+class InstancePullExecutor(openstack_base_executors.PullExecutor):
     action = 'Pull'
 
     @classmethod
     def get_task_signature(cls, instance, serialized_instance, **kwargs):
-        return chain(
-            core_tasks.BackendMethodTask().si(
-                serialized_instance, 'pull_instance', state_transition='begin_updating',
-            ),
-            core_tasks.BackendMethodTask().si(serialized_instance, 'pull_instance_security_groups'),
-            core_tasks.BackendMethodTask().si(serialized_instance, 'pull_instance_internal_ips'),
-            core_tasks.BackendMethodTask().si(serialized_instance, 'pull_instance_floating_ips'),
+        return openstack_base_tasks.CompositeBackendMethodTask().si(
+            serialized_instance,
+            [
+                'pull_instance',
+                'pull_instance_security_groups',
+                'pull_instance_internal_ips',
+                'pull_instance_floating_ips',
+            ],
+            state_transition='begin_updating',
         )
 
 
-class InstanceFloatingIPsUpdateExecutor(core_executors.ActionExecutor):
+class InstanceFloatingIPsUpdateExecutor(openstack_base_executors.ActionExecutor):
     action = 'Update floating IPs'
 
     @classmethod
@@ -552,13 +597,7 @@ class InstanceFloatingIPsUpdateExecutor(core_executors.ActionExecutor):
         # Push instance floating IPs
         _tasks.append(core_tasks.BackendMethodTask().si(serialized_instance, 'push_instance_floating_ips'))
         # Wait for operation completion
-        for index, floating_ip in enumerate(instance.floating_ips):
-            _tasks.append(core_tasks.PollRuntimeStateTask().si(
-                core_utils.serialize_instance(floating_ip),
-                backend_pull_method='pull_floating_ip_runtime_state',
-                success_state='ACTIVE',
-                erred_state='ERRED',
-            ).set(countdown=5 if not index else 0))
+        _tasks.append(InstanceCreateExecutor.get_floating_ips_check_signature(instance, serialized_instance))
         # Pull floating IPs again to update state of disconnected IPs
         _tasks.append(core_tasks.IndependentBackendMethodTask().si(serialized_instance, 'pull_floating_ips'))
         return chain(*_tasks)
@@ -572,7 +611,7 @@ class InstanceFloatingIPsUpdateExecutor(core_executors.ActionExecutor):
         return tasks.SetInstanceErredTask().s(serialized_instance)
 
 
-class InstanceStopExecutor(core_executors.ActionExecutor):
+class InstanceStopExecutor(openstack_base_executors.ActionExecutor):
     action = 'Stop'
 
     @classmethod
@@ -581,16 +620,17 @@ class InstanceStopExecutor(core_executors.ActionExecutor):
             core_tasks.BackendMethodTask().si(
                 serialized_instance, 'stop_instance', state_transition='begin_updating',
             ),
-            core_tasks.PollRuntimeStateTask().si(
+            openstack_base_tasks.with_initial_delay(openstack_base_tasks.PollRuntimeStateTask().si(
                 serialized_instance,
                 backend_pull_method='pull_instance_runtime_state',
                 success_state='SHUTOFF',
-                erred_state='ERRED'
-            ),
+                erred_state='ERRED',
+                operation='stop',
+            ), instance),
         )
 
 
-class InstanceStartExecutor(core_executors.ActionExecutor):
+class InstanceStartExecutor(openstack_base_executors.ActionExecutor):
     action = 'Start'
 
     @classmethod
@@ -599,16 +639,17 @@ class InstanceStartExecutor(core_executors.ActionExecutor):
             core_tasks.BackendMethodTask().si(
                 serialized_instance, 'start_instance', state_transition='begin_updating',
             ),
-            core_tasks.PollRuntimeStateTask().si(
+            openstack_base_tasks.with_initial_delay(openstack_base_tasks.PollRuntimeStateTask().si(
                 serialized_instance,
                 backend_pull_method='pull_instance_runtime_state',
                 success_state='ACTIVE',
-                erred_state='ERRED'
-            ),
+                erred_state='ERRED',
+                operation='start',
+            ), instance),
         )
 
 
-class InstanceRestartExecutor(core_executors.ActionExecutor):
+class InstanceRestartExecutor(openstack_base_executors.ActionExecutor):
     action = 'Restart'
 
     @classmethod
@@ -617,16 +658,65 @@ class InstanceRestartExecutor(core_executors.ActionExecutor):
             core_tasks.BackendMethodTask().si(
                 serialized_instance, 'restart_instance', state_transition='begin_updating',
             ),
-            core_tasks.PollRuntimeStateTask().si(
+            openstack_base_tasks.with_initial_delay(openstack_base_tasks.PollRuntimeStateTask().si(
                 serialized_instance,
                 backend_pull_method='pull_instance_runtime_state',
                 success_state='ACTIVE',
-                erred_state='ERRED'
-            ),
+                erred_state='ERRED',
+                operation='restart',
+            ), instance),
         )
 
 
-class InstanceInternalIPsSetUpdateExecutor(core_executors.ActionExecutor):
+class InstancesPowerStateExecutor(openstack_base_executors.RoutedExecutorMixin, core_executors.BaseExecutor):
+    """ Change power state of several instances of the same service settings
+        with single task and track their completion with single poll.
+    """
+
+    @classmethod
+    def get_task_signature(cls, settings, serialized_settings, instance_uuids=None, action=None, **kwargs):
+        return chain(
+            core_tasks.IndependentBackendMethodTask().si(
+                serialized_settings, 'change_instances_power_state', instance_uuids, action),
+            tasks.PollInstancesRuntimeStateTask().si(
+                serialized_settings, instance_uuids, InstanceBulkActionExecutor.success_states[action],
+                operation=action,
+            ).set(countdown=openstack_base_tasks.get_initial_delay(models.Instance, action)),
+        )
+
+    @classmethod
+    def get_failure_signature(cls, settings, serialized_settings, instance_uuids=None, **kwargs):
+        return tasks.SetInstancesErredTask().si(serialized_settings, instance_uuids)
+
+
+class InstanceBulkActionExecutor(object):
+    """ Start, stop or restart many instances.
+
+    Instances are grouped by service settings, each group is processed by InstancesPowerStateExecutor.
+    """
+    success_states = {
+        'start': models.Instance.RuntimeStates.ACTIVE,
+        'stop': models.Instance.RuntimeStates.SHUTOFF,
+        'restart': models.Instance.RuntimeStates.ACTIVE,
+    }
+
+    @classmethod
+    def execute(cls, instances, action, countdown=2):
+        instances_by_settings = {}
+        for instance in instances:
+            instance.schedule_updating()
+            instance.action = action.capitalize()
+            instance.action_details = {}
+            instance.save()
+            settings = instance.service_project_link.service.settings
+            instances_by_settings.setdefault(settings, []).append(instance.uuid.hex)
+
+        return [InstancesPowerStateExecutor.execute(
+            settings, countdown=countdown, instance_uuids=instance_uuids, action=action)
+            for settings, instance_uuids in instances_by_settings.items()]
+
+
+class InstanceInternalIPsSetUpdateExecutor(openstack_base_executors.ActionExecutor):
     action = 'Update internal IPs'
 
     @classmethod
@@ -636,23 +726,28 @@ class InstanceInternalIPsSetUpdateExecutor(core_executors.ActionExecutor):
         )
 
 
-class BackupCreateExecutor(core_executors.CreateExecutor):
+class BackupCreateExecutor(openstack_base_executors.CreateExecutor):
 
     @classmethod
     def get_task_signature(cls, backup, serialized_backup, **kwargs):
-        serialized_snapshots = [core_utils.serialize_instance(snapshot) for snapshot in backup.snapshots.all()]
+        snapshots = backup.snapshots.all()
+        serialized_snapshots = [core_utils.serialize_instance(snapshot) for snapshot in snapshots]
 
         _tasks = [core_tasks.StateTransitionTask().si(serialized_backup, state_transition='begin_creating')]
         for serialized_snapshot in serialized_snapshots:
             _tasks.append(tasks.ThrottleProvisionTask().si(
                 serialized_snapshot, 'create_snapshot', force=True, state_transition='begin_creating'))
-        for index, serialized_snapshot in enumerate(serialized_snapshots):
-            _tasks.append(core_tasks.PollRuntimeStateTask().si(
+        for index, (snapshot, serialized_snapshot) in enumerate(zip(snapshots, serialized_snapshots)):
+            check_snapshot = openstack_base_tasks.PollRuntimeStateTask().si(
                 serialized_snapshot,
                 backend_pull_method='pull_snapshot_runtime_state',
                 success_state='available',
                 erred_state='error',
-            ).set(countdown=10 if index == 0 else 0))
+                operation='create',
+            )
+            if index == 0:
+                check_snapshot = openstack_base_tasks.with_initial_delay(check_snapshot, snapshot)
+            _tasks.append(check_snapshot)
             _tasks.append(core_tasks.StateTransitionTask().si(serialized_snapshot, state_transition='set_ok'))
 
         return chain(*_tasks)
@@ -662,25 +757,30 @@ class BackupCreateExecutor(core_executors.CreateExecutor):
         return tasks.SetBackupErredTask().s(serialized_backup)
 
 
-class BackupDeleteExecutor(core_executors.DeleteExecutor):
+class BackupDeleteExecutor(openstack_base_executors.DeleteExecutor):
 
     @classmethod
     def pre_apply(cls, backup, **kwargs):
         for snapshot in backup.snapshots.all():
             snapshot.schedule_deleting()
             snapshot.save(update_fields=['state'])
-        core_executors.DeleteExecutor.pre_apply(backup)
+        openstack_base_executors.DeleteExecutor.pre_apply(backup)
 
     @classmethod
     def get_task_signature(cls, backup, serialized_backup, force=False, **kwargs):
-        serialized_snapshots = [core_utils.serialize_instance(snapshot) for snapshot in backup.snapshots.all()]
+        snapshots = backup.snapshots.all()
+        serialized_snapshots = [core_utils.serialize_instance(snapshot) for snapshot in snapshots]
 
         _tasks = [core_tasks.StateTransitionTask().si(serialized_backup, state_transition='begin_deleting')]
         for serialized_snapshot in serialized_snapshots:
             _tasks.append(core_tasks.BackendMethodTask().si(
                 serialized_snapshot, 'delete_snapshot', state_transition='begin_deleting'))
-        for serialized_snapshot in serialized_snapshots:
-            _tasks.append(core_tasks.PollBackendCheckTask().si(serialized_snapshot, 'is_snapshot_deleted'))
+        for index, (snapshot, serialized_snapshot) in enumerate(zip(snapshots, serialized_snapshots)):
+            check_snapshot = openstack_base_tasks.PollBackendCheckTask().si(
+                serialized_snapshot, 'is_snapshot_deleted', operation='delete')
+            if index == 0:
+                check_snapshot = openstack_base_tasks.with_initial_delay(check_snapshot, snapshot)
+            _tasks.append(check_snapshot)
             _tasks.append(core_tasks.DeletionTask().si(serialized_snapshot))
 
         return chain(*_tasks)
@@ -693,7 +793,7 @@ class BackupDeleteExecutor(core_executors.DeleteExecutor):
             return tasks.ForceDeleteBackupTask().si(serialized_backup)
 
 
-class SnapshotRestorationExecutor(core_executors.CreateExecutor):
+class SnapshotRestorationExecutor(openstack_base_executors.CreateExecutor):
     """ Restores volume from snapshot instance """
 
     @classmethod
@@ -703,9 +803,10 @@ class SnapshotRestorationExecutor(core_executors.CreateExecutor):
         _tasks = [
             tasks.ThrottleProvisionTask().si(
                 serialized_volume, 'create_volume', state_transition='begin_creating'),
-            core_tasks.PollRuntimeStateTask().si(
+            openstack_base_tasks.with_initial_delay(openstack_base_tasks.PollRuntimeStateTask().si(
                 serialized_volume, 'pull_volume_runtime_state', success_state='available', erred_state='error',
-            ).set(countdown=30),
+                operation='restore',
+            ), snapshot_restoration.volume),
             core_tasks.BackendMethodTask().si(serialized_volume, 'remove_bootable_flag'),
             core_tasks.BackendMethodTask().si(serialized_volume, 'pull_volume'),
         ]
@@ -723,7 +824,7 @@ class SnapshotRestorationExecutor(core_executors.CreateExecutor):
         return core_tasks.StateTransitionTask().si(serialized_volume, state_transition='set_erred')
 
 
-class OpenStackTenantCleanupExecutor(structure_executors.BaseCleanupExecutor):
+class OpenStackTenantCleanupExecutor(openstack_base_executors.CleanupExecutor):
     related_executor = openstack_executors.OpenStackCleanupExecutor
 
     pre_models = (
@@ -6,13 +6,38 @@ class OpenStackTenantExtension(WaldurExtension):
     class Settings:
         # wiki: https://opennode.atlassian.net/wiki/display/WD/OpenStack+plugin+configuration
         WALDUR_OPENSTACK_TENANT = {
+            # Ceiling of adaptive limit of concurrent provisioning per service settings.
             'MAX_CONCURRENT_PROVISION': {
                 'OpenStackTenant.Instance': 4,
                 'OpenStackTenant.Volume': 4,
                 'OpenStackTenant.Snapshot': 4,
             },
+            # Polling of backend operations: resource type -> operation -> policy options.
+            # Options are initial_delay, factor, max_delay, jitter, deadline (all in seconds,
+            # except factor and jitter) and learn. If learn is true, initial delay is replaced
+            # by average observed completion time of the operation.
+            'POLLING_POLICIES': {
+                'OpenStackTenant.Volume': {
+                    'create': {'initial_delay': 30},
+                    'restore': {'initial_delay': 30},
+                },
+                'OpenStackTenant.Instance': {
+                    'create_volumes': {'initial_delay': 30},
+                },
+                'OpenStackTenant.Snapshot': {
+                    'create': {'initial_delay': 10},
+                },
+                'OpenStackTenant.FloatingIP': {
+                    'default': {'initial_delay': 5},
+                },
+            },
         }
 
+    @staticmethod
+    def update_settings(settings):
+        from waldur_openstack.openstack_base.routing import register_router
+        register_router(settings)
+
     @staticmethod
     def django_app():
         return 'waldur_openstack.openstack_tenant'
@@ -51,6 +76,16 @@ class OpenStackTenantExtension(WaldurExtension):
                 'schedule': timedelta(minutes=10),
                 'args': (),
             },
+            'openstacktenant-replenish-volume-pools': {
+                'task': 'openstack_tenant.ReplenishVolumePools',
+                'schedule': timedelta(minutes=5),
+                'args': (),
+            },
+            'openstacktenant-replenish-floating-ip-pools': {
+                'task': 'openstack_tenant.ReplenishFloatingIPPools',
+                'schedule': timedelta(minutes=5),
+                'args': (),
+            },
         }
 
     @staticmethod
@@ -1,14 +1,17 @@
 from __future__ import unicode_literals
 
+import collections
 import logging
 
 from django.core import exceptions as django_exceptions
 from django.db import transaction, IntegrityError
+from django.utils import timezone
 
 from waldur_core.core.models import StateMixin
 from waldur_core.structure import models as structure_models
 
 from ..openstack import models as openstack_models, apps as openstack_apps
+from ..openstack_base import handlers as openstack_base_handlers
 from . import apps, log, models, utils
 
 
@@ -67,13 +70,29 @@ def log_action(sender, instance, created=False, **kwargs):
     if created or not resource.tracker.has_changed('action'):
         return
     if resource.state == StateMixin.States.UPDATE_SCHEDULED:
-        _log_scheduled_action(resource, resource.action, resource.action_details)
+        _log_action_event(_log_scheduled_action, resource, resource.action, resource.action_details)
     if resource.state == StateMixin.States.OK:
-        _log_succeeded_action(
-            resource, resource.tracker.previous('action'), resource.tracker.previous('action_details'))
+        _log_action_event(_log_succeeded_action,
+                          resource, resource.tracker.previous('action'), resource.tracker.previous('action_details'))
     elif resource.state == StateMixin.States.ERRED:
-        _log_failed_action(
-            resource, resource.tracker.previous('action'), resource.tracker.previous('action_details'))
+        _log_action_event(_log_failed_action,
+                          resource, resource.tracker.previous('action'), resource.tracker.previous('action_details'))
+
+
+def _log_action_event(log_function, resource, action, action_details):
+    event = (log_function, resource, action, action_details)
+    if not openstack_base_handlers.defer(_log_action_events, event):
+        log_function(resource, action, action_details)
+
+
+def _log_action_events(events):
+    """ Log deferred events, the same event of the same resource is logged once """
+    logged_events = set()
+    for log_function, resource, action, action_details in events:
+        key = (log_function, resource.__class__, resource.pk, action)
+        if key not in logged_events:
+            logged_events.add(key)
+            log_function(resource, action, action_details)
 
 
 def log_snapshot_schedule_creation(sender, instance, created=False, **kwargs):
@@ -248,18 +267,16 @@ class BaseSynchronizationHandler(object):
         Creates service property on resource transition from 'CREATING' state to 'OK'.
         """
         if source == StateMixin.States.CREATING and target == StateMixin.States.OK:
-            settings = self.get_service_settings(instance)
-            if settings and not self.get_service_property(instance, settings):
-                self.create_service_property(instance, settings)
+            if not openstack_base_handlers.defer(self.apply_deferred, ('create', instance.pk, instance)):
+                self.create_resource_property(instance)
 
     def update_handler(self, sender, instance, name, source, target, **kwargs):
         """
         Updates service property on resource transition from 'UPDATING' state to 'OK'.
         """
         if source == StateMixin.States.UPDATING and target == StateMixin.States.OK:
-            settings = self.get_service_settings(instance)
-            if settings:
-                self.update_service_property(instance, settings)
+            if not openstack_base_handlers.defer(self.apply_deferred, ('update', instance.pk, instance)):
+                self.update_resource_property(instance)
 
     def delete_handler(self, sender, instance, **kwargs):
         """
@@ -268,10 +285,45 @@ class BaseSynchronizationHandler(object):
         settings = self.get_service_settings(instance)
         if not settings:
             return
-        service_property = self.get_service_property(instance, settings)
-        if not service_property:
-            return
-        service_property.delete()
+        # Settings are resolved immediately, because tenant of resource may be deleted as well.
+        if not openstack_base_handlers.defer(self.apply_deferred, ('delete', instance.pk, (settings, instance))):
+            self.delete_service_properties(settings, [instance.backend_id])
+
+    def create_resource_property(self, resource):
+        settings = self.get_service_settings(resource)
+        if settings and not self.get_service_property(resource, settings):
+            self.create_service_property(resource, settings)
+
+    def update_resource_property(self, resource):
+        settings = self.get_service_settings(resource)
+        if settings:
+            self.update_service_property(resource, settings)
+
+    def delete_service_properties(self, settings, backend_ids):
+        self.property_model.objects.filter(settings=settings, backend_id__in=backend_ids).delete()
+
+    def apply_deferred(self, operations):
+        """
+        Apply operations deferred during pull. Only the last operation of each resource is applied
+        and service properties of deleted resources are deleted with single query per service settings.
+        """
+        last_operations = collections.OrderedDict()
+        for operation, pk, item in operations:
+            last_operations.pop(pk, None)
+            last_operations[pk] = (operation, item)
+
+        deleted_backend_ids = {}
+        for operation, item in last_operations.values():
+            if operation == 'create':
+                self.create_resource_property(item)
+            elif operation == 'update':
+                self.update_resource_property(item)
+            else:
+                settings, resource = item
+                deleted_backend_ids.setdefault(settings, set()).add(resource.backend_id)
+
+        for settings, backend_ids in deleted_backend_ids.items():
+            self.delete_service_properties(settings, backend_ids)
 
 
 class FloatingIPHandler(BaseSynchronizationHandler):
@@ -450,3 +502,23 @@ def update_service_settings(sender, instance, created=False, **kwargs):
 def sync_price_list_item_for_flavor(sender, instance, created=False, **kwargs):
     if created:
         utils.sync_price_list_item(instance)
+
+
+def update_pulled_instances_start_time(sender, instances, changed_fields, **kwargs):
+    """ Update start time of instances which runtime state has been changed by bulk pull,
+        as it is done on save of single instance.
+    """
+    online_ids = []
+    offline_ids = []
+    for instance in instances:
+        if 'runtime_state' not in changed_fields[instance.pk]:
+            continue
+        if instance.runtime_state == instance.get_online_state():
+            online_ids.append(instance.pk)
+        elif instance.runtime_state == instance.get_offline_state():
+            offline_ids.append(instance.pk)
+
+    if online_ids:
+        sender.objects.filter(pk__in=online_ids).update(start_time=timezone.now())
+    if offline_ids:
+        sender.objects.filter(pk__in=offline_ids).update(start_time=None)
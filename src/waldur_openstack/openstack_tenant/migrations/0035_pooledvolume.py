@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import model_utils.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('openstack_tenant', '0034_immutable_default_json'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PooledVolume',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', model_utils.fields.AutoCreatedField(default=django.utils.timezone.now, editable=False, verbose_name='created')),
+                ('modified', model_utils.fields.AutoLastModifiedField(default=django.utils.timezone.now, editable=False, verbose_name='modified')),
+                ('backend_id', models.CharField(max_length=255, unique=True)),
+                ('size', models.PositiveIntegerField(help_text='Size in MiB')),
+                ('runtime_state', models.CharField(blank=True, max_length=150)),
+                ('image', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pooled_volumes', to='openstack_tenant.Image')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+    ]
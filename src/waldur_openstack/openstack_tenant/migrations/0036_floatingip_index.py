@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('openstack_tenant', '0035_pooledvolume'),
+    ]
+
+    operations = [
+        migrations.AlterIndexTogether(
+            name='floatingip',
+            index_together=set([('settings', 'backend_network_id', 'is_booked', 'internal_ip')]),
+        ),
+    ]
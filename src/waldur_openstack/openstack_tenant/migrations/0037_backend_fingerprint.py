@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('openstack_tenant', '0036_floatingip_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='instance',
+            name='backend_fingerprint',
+            field=models.CharField(blank=True, editable=False, max_length=32),
+        ),
+        migrations.AddField(
+            model_name='network',
+            name='backend_fingerprint',
+            field=models.CharField(blank=True, editable=False, max_length=32),
+        ),
+        migrations.AddField(
+            model_name='snapshot',
+            name='backend_fingerprint',
+            field=models.CharField(blank=True, editable=False, max_length=32),
+        ),
+        migrations.AddField(
+            model_name='subnet',
+            name='backend_fingerprint',
+            field=models.CharField(blank=True, editable=False, max_length=32),
+        ),
+        migrations.AddField(
+            model_name='volume',
+            name='backend_fingerprint',
+            field=models.CharField(blank=True, editable=False, max_length=32),
+        ),
+    ]
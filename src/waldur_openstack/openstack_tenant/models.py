@@ -110,6 +110,8 @@ class FloatingIP(structure_models.ServiceProperty):
         # It should be possible to create floating IP dynamically on instance creation
         # so floating IP with empty backend id can exist.
         unique_together = tuple()
+        # Supports lookup of free floating IPs on instance provisioning.
+        index_together = ('settings', 'backend_network_id', 'is_booked', 'internal_ip')
         verbose_name = _('Floating IP')
         verbose_name_plural = _('Floating IPs')
 
@@ -133,8 +135,23 @@ class FloatingIP(structure_models.ServiceProperty):
     def get_backend_fields(cls):
         return super(FloatingIP, cls).get_backend_fields() + ('address', 'runtime_state', 'backend_network_id')
 
-
-class Volume(structure_models.Volume):
+    @classmethod
+    def claim_free(cls, settings, backend_network_id):
+        """ Lock and return free floating IP, preferring already allocated one.
+
+        Rows locked by concurrent transactions are skipped, so that each of them gets
+        a distinct floating IP. Should be called inside transaction which books the IP.
+        """
+        free_floating_ips = (cls.objects
+                             .select_for_update(skip_locked=True)
+                             .filter(settings=settings,
+                                     backend_network_id=backend_network_id,
+                                     is_booked=False,
+                                     internal_ip__isnull=True))
+        return free_floating_ips.exclude(backend_id='').first() or free_floating_ips.first()
+
+
+class Volume(openstack_base_models.BackendFingerprintMixin, structure_models.Volume):
     # backend_id is nullable on purpose, otherwise
     # it wouldn't be possible to put a unique constraint on it
     backend_id = models.CharField(max_length=255, blank=True, null=True)
@@ -184,7 +201,36 @@ class Volume(structure_models.Volume):
                                                           'runtime_state', 'device')
 
 
-class Snapshot(structure_models.Snapshot):
+@python_2_unicode_compatible
+class PooledVolume(TimeStampedModel):
+    """ Bootable volume created in advance from popular image.
+
+    Pool is configured by "volume_pool_images" (list of image names) and "volume_pool_size"
+    (number of volumes per image) options of service settings. Instance provisioning claims
+    volume from the pool instead of creating a new one from the image.
+    """
+    METADATA_KEY = 'waldur_volume_pool'
+
+    image = models.ForeignKey(Image, related_name='pooled_volumes', on_delete=models.CASCADE)
+    backend_id = models.CharField(max_length=255, unique=True)
+    size = models.PositiveIntegerField(help_text=_('Size in MiB'))
+    runtime_state = models.CharField(max_length=150, blank=True)
+
+    def __str__(self):
+        return '%s (%s)' % (self.backend_id, self.image)
+
+    def increase_backend_quotas_usage(self, validate=True):
+        settings = self.image.settings
+        settings.add_quota_usage(settings.Quotas.volumes, 1, validate=validate)
+        settings.add_quota_usage(settings.Quotas.storage, self.size, validate=validate)
+
+    def decrease_backend_quotas_usage(self):
+        settings = self.image.settings
+        settings.add_quota_usage(settings.Quotas.volumes, -1)
+        settings.add_quota_usage(settings.Quotas.storage, -self.size)
+
+
+class Snapshot(openstack_base_models.BackendFingerprintMixin, structure_models.Snapshot):
     # backend_id is nullable on purpose, otherwise
     # it wouldn't be possible to put a unique constraint on it
     backend_id = models.CharField(max_length=255, blank=True, null=True)
@@ -241,7 +287,7 @@ class SnapshotRestoration(core_models.UuidMixin, TimeStampedModel):
         project_path = 'snapshot__service_project_link__project'
 
 
-class Instance(structure_models.VirtualMachine):
+class Instance(openstack_base_models.BackendFingerprintMixin, structure_models.VirtualMachine):
 
     class RuntimeStates(object):
         # All possible OpenStack Instance states on backend.
@@ -418,7 +464,8 @@ class SnapshotSchedule(BaseSchedule):
 
 
 @python_2_unicode_compatible
-class Network(core_models.DescribableMixin, structure_models.ServiceProperty):
+class Network(openstack_base_models.BackendFingerprintMixin, core_models.DescribableMixin,
+              structure_models.ServiceProperty):
     is_external = models.BooleanField(default=False)
     type = models.CharField(max_length=50, blank=True)
     segmentation_id = models.IntegerField(null=True)
@@ -435,7 +482,8 @@ class Network(core_models.DescribableMixin, structure_models.ServiceProperty):
 
 
 @python_2_unicode_compatible
-class SubNet(core_models.DescribableMixin, structure_models.ServiceProperty):
+class SubNet(openstack_base_models.BackendFingerprintMixin, core_models.DescribableMixin,
+             structure_models.ServiceProperty):
     network = models.ForeignKey(Network, related_name='subnets')
     cidr = models.CharField(max_length=32, blank=True)
     gateway_ip = models.GenericIPAddressField(protocol='IPv4', null=True)
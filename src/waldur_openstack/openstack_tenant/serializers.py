@@ -667,20 +667,17 @@ def _connect_floating_ip_to_instance(floating_ip, subnet, instance):
         If floating IP is not defined - take exist free one or create a new one.
     """
     settings = instance.service_project_link.service.settings
-    if not floating_ip:
-        kwargs = {
-            'settings': settings,
-            'is_booked': False,
-            'backend_network_id': settings.options['external_network_id'],
-        }
-        # TODO: figure out why internal_ip__isnull throws errors when added to kwargs
-        floating_ip = models.FloatingIP.objects.filter(internal_ip__isnull=True).filter(**kwargs).first()
+    with transaction.atomic():
         if not floating_ip:
-            floating_ip = models.FloatingIP(**kwargs)
-            floating_ip.increase_backend_quotas_usage()
-    floating_ip.is_booked = True
-    floating_ip.internal_ip = models.InternalIP.objects.get(instance=instance, subnet=subnet)
-    floating_ip.save()
+            backend_network_id = settings.options['external_network_id']
+            floating_ip = models.FloatingIP.claim_free(settings, backend_network_id)
+            if not floating_ip:
+                floating_ip = models.FloatingIP(
+                    settings=settings, is_booked=False, backend_network_id=backend_network_id)
+                floating_ip.increase_backend_quotas_usage()
+        floating_ip.is_booked = True
+        floating_ip.internal_ip = models.InternalIP.objects.get(instance=instance, subnet=subnet)
+        floating_ip.save()
     return floating_ip
 
 
@@ -798,7 +795,26 @@ class InstanceSerializer(structure_serializers.VirtualMachineSerializer):
         security_groups = validated_data.pop('security_groups', [])
         internal_ips = validated_data.pop('internal_ips_set', [])
         floating_ips_with_subnets = validated_data.pop('floating_ips', [])
-        spl = validated_data['service_project_link']
+        self._update_instance_details(validated_data)
+
+        instance = super(InstanceSerializer, self).create(validated_data)
+
+        # security groups
+        instance.security_groups.add(*security_groups)
+        # internal IPs
+        for internal_ip in internal_ips:
+            internal_ip.instance = instance
+            internal_ip.save()
+        # floating IPs
+        for floating_ip, subnet in floating_ips_with_subnets:
+            _connect_floating_ip_to_instance(floating_ip, subnet, instance)
+        # volumes
+        for volume in self._get_instance_volumes(instance, validated_data):
+            volume.save()
+            volume.increase_backend_quotas_usage()
+        return instance
+
+    def _update_instance_details(self, validated_data):
         ssh_key = validated_data.get('ssh_public_key')
         if ssh_key:
             # We want names to be human readable in backend.
@@ -823,42 +839,119 @@ class InstanceSerializer(structure_serializers.VirtualMachineSerializer):
         data_volume_size = validated_data.get('data_volume_size', 0)
         validated_data['disk'] = data_volume_size + system_volume_size
 
-        instance = super(InstanceSerializer, self).create(validated_data)
-
-        # security groups
-        instance.security_groups.add(*security_groups)
-        # internal IPs
-        for internal_ip in internal_ips:
-            internal_ip.instance = instance
-            internal_ip.save()
-        # floating IPs
-        for floating_ip, subnet in floating_ips_with_subnets:
-            _connect_floating_ip_to_instance(floating_ip, subnet, instance)
-        # volumes
-        volumes = []
-        system_volume = models.Volume.objects.create(
+    def _get_instance_volumes(self, instance, validated_data):
+        """ Build system and data volumes of the instance, they are not saved yet """
+        image = validated_data['image']
+        volumes = [models.Volume(
             name='{0}-system'.format(instance.name[:143]),  # volume name cannot be longer than 150 symbols
-            service_project_link=spl,
-            size=system_volume_size,
+            service_project_link=instance.service_project_link,
+            size=validated_data['system_volume_size'],
             image=image,
             image_name=image.name,
             bootable=True,
-        )
-        volumes.append(system_volume)
+            instance=instance,
+        )]
 
+        data_volume_size = validated_data.get('data_volume_size', 0)
         if data_volume_size:
-            data_volume = models.Volume.objects.create(
+            volumes.append(models.Volume(
                 name='{0}-data'.format(instance.name[:145]),  # volume name cannot be longer than 150 symbols
-                service_project_link=spl,
+                service_project_link=instance.service_project_link,
                 size=data_volume_size,
-            )
-            volumes.append(data_volume)
+                instance=instance,
+            ))
+        return volumes
 
-        for volume in volumes:
-            volume.increase_backend_quotas_usage()
 
-        instance.volumes.add(*volumes)
-        return instance
+class InstanceBulkCreateSerializer(InstanceSerializer):
+    """ Create several identical instances, names are suffixed with instance number """
+    MAX_COUNT = 100
+
+    count = serializers.IntegerField(min_value=1, max_value=MAX_COUNT, write_only=True)
+
+    class Meta(InstanceSerializer.Meta):
+        fields = InstanceSerializer.Meta.fields + ('count',)
+
+    def validate(self, attrs):
+        attrs = super(InstanceBulkCreateSerializer, self).validate(attrs)
+        count = attrs['count']
+
+        if count > 1 and any(floating_ip for floating_ip, _ in attrs.get('floating_ips', [])):
+            raise serializers.ValidationError(
+                {'floating_ips': _('The same floating IP cannot be assigned to several instances.')})
+
+        # Check quotas of the whole batch at once, so that it is not created partially.
+        settings = attrs['service_project_link'].service.settings
+        flavor = attrs['flavor']
+        data_volume_size = attrs.get('data_volume_size', 0)
+        settings.validate_quota_change({
+            settings.Quotas.instances.name: count,
+            settings.Quotas.vcpu.name: count * flavor.cores,
+            settings.Quotas.ram.name: count * flavor.ram,
+            settings.Quotas.volumes.name: count * (2 if data_volume_size else 1),
+            settings.Quotas.storage.name: count * (attrs['system_volume_size'] + data_volume_size),
+        }, raise_exception=True)
+
+        return attrs
+
+    @transaction.atomic
+    def create(self, validated_data):
+        """ Create rows of all instances, their related objects are inserted in bulk """
+        count = validated_data.pop('count')
+        security_groups = validated_data.pop('security_groups', [])
+        internal_ips = validated_data.pop('internal_ips_set', [])
+        floating_ips_with_subnets = validated_data.pop('floating_ips', [])
+        self._update_instance_details(validated_data)
+
+        model_fields = {field.name for field in models.Instance._meta.concrete_fields}
+        instance_data = {name: value for name, value in validated_data.items() if name in model_fields}
+        name = instance_data.pop('name')
+        # Instances and volumes are saved one by one, so that their save signals and state tracking
+        # work as for single instance. Batch size is limited by MAX_COUNT.
+        instances = [
+            models.Instance.objects.create(name='%s-%s' % (name, number) if count > 1 else name, **instance_data)
+            for number in range(1, count + 1)
+        ]
+        volumes = []
+        for instance in instances:
+            for volume in self._get_instance_volumes(instance, validated_data):
+                volume.save()
+                volumes.append(volume)
+
+        models.Instance.security_groups.through.objects.bulk_create([
+            models.Instance.security_groups.through(instance=instance, securitygroup=security_group)
+            for instance in instances for security_group in security_groups
+        ])
+        models.InternalIP.objects.bulk_create([
+            models.InternalIP(instance=instance, subnet=internal_ip.subnet)
+            for instance in instances for internal_ip in internal_ips
+        ])
+        for instance in instances:
+            for floating_ip, subnet in floating_ips_with_subnets:
+                _connect_floating_ip_to_instance(floating_ip, subnet, instance)
+
+        # Quotas of the whole batch are changed at once.
+        settings = validated_data['service_project_link'].service.settings
+        flavor = validated_data['flavor']
+        settings.add_quota_usage(settings.Quotas.instances, count)
+        settings.add_quota_usage(settings.Quotas.ram, count * flavor.ram)
+        settings.add_quota_usage(settings.Quotas.vcpu, count * flavor.cores)
+        settings.add_quota_usage(settings.Quotas.volumes, len(volumes))
+        settings.add_quota_usage(settings.Quotas.storage, sum(volume.size for volume in volumes))
+
+        return instances
+
+
+class InstanceBulkActionSerializer(serializers.Serializer):
+    MAX_COUNT = 100
+
+    instances = serializers.ListField(child=serializers.UUIDField(), required=False)
+
+    def validate_instances(self, instances):
+        if len(instances) > self.MAX_COUNT:
+            raise serializers.ValidationError(
+                _('Action cannot be applied to more than %s instances at once.') % self.MAX_COUNT)
+        return instances
 
 
 class InstanceFlavorChangeSerializer(structure_serializers.PermissionFieldFilteringMixin, serializers.Serializer):
@@ -3,16 +3,17 @@ from __future__ import unicode_literals
 from datetime import timedelta
 import logging
 
-from django.conf import settings
 from django.db import transaction
 from django.utils import timezone
 
 from waldur_core.core import tasks as core_tasks, utils as core_utils
 from waldur_core.quotas import exceptions as quotas_exceptions
-from waldur_core.structure import (models as structure_models, tasks as structure_tasks,
-                                   SupportedServices)
+from waldur_core.structure import models as structure_models, tasks as structure_tasks
 
-from . import models, serializers, log
+from waldur_openstack.openstack_base import routing as openstack_base_routing
+from waldur_openstack.openstack_base import tasks as openstack_base_tasks
+
+from . import apps, models, serializers, log
 
 
 logger = logging.getLogger(__name__)
@@ -32,7 +33,7 @@ class SetInstanceOKTask(core_tasks.StateTransitionTask):
         instance.floating_ips.update(is_booked=False)
 
 
-class SetInstanceErredTask(core_tasks.ErrorStateTransitionTask):
+class SetInstanceErredTask(openstack_base_tasks.RecordProvisionFailureMixin, core_tasks.ErrorStateTransitionTask):
     """ Mark instance as erred and delete resources that were not created. """
 
     def execute(self, instance):
@@ -47,6 +48,8 @@ class SetInstanceErredTask(core_tasks.ErrorStateTransitionTask):
             elif volume.state == models.Volume.States.OK:
                 pass
             else:
+                if volume.state == models.Volume.States.CREATING:
+                    openstack_base_tasks.ProvisionConcurrency.record_failure(volume)
                 volume.set_erred()
                 volume.save(update_fields=['state'])
 
@@ -55,6 +58,56 @@ class SetInstanceErredTask(core_tasks.ErrorStateTransitionTask):
         instance.floating_ips.update(is_booked=False)
 
 
+class PollInstanceVolumesTask(openstack_base_tasks.PollBackendCheckTask):
+    """ Wait until volumes of the created instance are available, their provisioning is completed with it """
+
+    def get_provisioned_resources(self, instance):
+        return list(instance.volumes.filter(state=models.Volume.States.CREATING))
+
+
+class PollInstancesRuntimeStateTask(core_tasks.Task):
+    """ Poll runtime state of several instances of the same tenant with single request """
+    max_retries = 300
+    default_retry_delay = 5
+
+    @classmethod
+    def get_description(cls, service_settings, instance_uuids, success_state, *args, **kwargs):
+        return 'Wait until %s instances of settings "%s" reach runtime state "%s".' % (
+            len(instance_uuids), service_settings, success_state)
+
+    def execute(self, service_settings, instance_uuids, success_state, operation='default'):
+        backend = service_settings.get_backend()
+        pending_uuids = backend.pull_instances_runtime_state(instance_uuids, success_state)
+        if not pending_uuids:
+            return
+
+        policy = openstack_base_tasks.get_polling_policy(models.Instance, operation)
+        max_retries = policy.get_max_retries(deadline=self.max_retries * self.default_retry_delay)
+        if self.request.retries >= max_retries:
+            set_instances_erred(pending_uuids, 'Operation is timed out.')
+            return
+        self.retry(countdown=policy.get_delay(self.request.retries + 1), max_retries=max_retries)
+
+
+class SetInstancesErredTask(core_tasks.Task):
+    """ Mark instances that are still being updated by bulk operation as erred """
+
+    @classmethod
+    def get_description(cls, service_settings, instance_uuids, *args, **kwargs):
+        return 'Mark %s instances of settings "%s" as erred.' % (len(instance_uuids), service_settings)
+
+    def execute(self, service_settings, instance_uuids):
+        set_instances_erred(instance_uuids, 'Bulk operation has failed.')
+
+
+def set_instances_erred(instance_uuids, error_message):
+    for instance in models.Instance.objects.filter(
+            uuid__in=instance_uuids, state=models.Instance.States.UPDATING):
+        instance.set_erred()
+        instance.error_message = error_message
+        instance.save(update_fields=['state', 'error_message'])
+
+
 class SetBackupErredTask(core_tasks.ErrorStateTransitionTask):
     """ Mark DR backup and all related resources that are not in state OK as Erred """
 
@@ -95,6 +148,7 @@ class VolumeExtendErredTask(core_tasks.ErrorStateTransitionTask):
 
 
 class BaseScheduleTask(core_tasks.BackgroundTask):
+    task_category = 'provisioning'
     model = NotImplemented
     resource_attribute = NotImplemented
 
@@ -190,6 +244,7 @@ class ScheduleBackups(BaseScheduleTask):
 
 class DeleteExpiredBackups(core_tasks.BackgroundTask):
     name = 'openstack_tenant.DeleteExpiredBackups'
+    task_category = 'cleanup'
 
     def is_equal(self, other_task):
         return self.name == other_task.get('name')
@@ -197,7 +252,7 @@ class DeleteExpiredBackups(core_tasks.BackgroundTask):
     def run(self):
         from . import executors
         for backup in models.Backup.objects.filter(kept_until__lt=timezone.now(), state=models.Backup.States.OK):
-            executors.BackupDeleteExecutor.execute(backup)
+            executors.BackupDeleteExecutor.execute(backup, task_category='cleanup')
 
 
 class ScheduleSnapshots(BaseScheduleTask):
@@ -235,6 +290,7 @@ class ScheduleSnapshots(BaseScheduleTask):
 
 class DeleteExpiredSnapshots(core_tasks.BackgroundTask):
     name = 'openstack_tenant.DeleteExpiredSnapshots'
+    task_category = 'cleanup'
 
     def is_equal(self, other_task):
         return self.name == other_task.get('name')
@@ -242,11 +298,12 @@ class DeleteExpiredSnapshots(core_tasks.BackgroundTask):
     def run(self):
         from . import executors
         for snapshot in models.Snapshot.objects.filter(kept_until__lt=timezone.now(), state=models.Snapshot.States.OK):
-            executors.SnapshotDeleteExecutor.execute(snapshot)
+            executors.SnapshotDeleteExecutor.execute(snapshot, task_category='cleanup')
 
 
 class SetErredStuckResources(core_tasks.BackgroundTask):
     name = 'openstack_tenant.SetErredStuckResources'
+    task_category = 'cleanup'
 
     def is_equal(self, other_task):
         return self.name == other_task.get('name')
@@ -265,12 +322,10 @@ class SetErredStuckResources(core_tasks.BackgroundTask):
 
 
 class LimitedPerTypeThrottleMixin(object):
+    """ Limit concurrent provisioning adaptively per resource type and service settings """
 
     def get_limit(self, resource):
-        nc_settings = getattr(settings, 'WALDUR_OPENSTACK', {})
-        limit_per_type = nc_settings.get('MAX_CONCURRENT_PROVISION', {})
-        model_name = SupportedServices.get_name_for_model(resource)
-        return limit_per_type.get(model_name, super(LimitedPerTypeThrottleMixin, self).get_limit(resource))
+        return openstack_base_tasks.ProvisionConcurrency.get_limit(resource)
 
 
 class ThrottleProvisionTask(LimitedPerTypeThrottleMixin, structure_tasks.ThrottleProvisionTask):
@@ -279,3 +334,36 @@ class ThrottleProvisionTask(LimitedPerTypeThrottleMixin, structure_tasks.Throttl
 
 class ThrottleProvisionStateTask(LimitedPerTypeThrottleMixin, structure_tasks.ThrottleProvisionStateTask):
     pass
+
+
+class BaseReplenishPoolsTask(core_tasks.BackgroundTask):
+    """ Run backend pool replenish method for each tenant settings with configured pool size """
+    task_category = 'provisioning'
+    pool_size_option = NotImplemented
+    backend_method = NotImplemented
+
+    def is_equal(self, other_task):
+        return self.name == other_task.get('name')
+
+    def run(self):
+        for settings in structure_models.ServiceSettings.objects.filter(
+                type=apps.OpenStackTenantConfig.service_name,
+                state=structure_models.ServiceSettings.States.OK):
+            if not settings.options.get(self.pool_size_option):
+                continue
+            serialized_settings = core_utils.serialize_instance(settings)
+            core_tasks.IndependentBackendMethodTask().apply_async(
+                args=(serialized_settings, self.backend_method),
+                **openstack_base_routing.get_task_options(self.task_category))
+
+
+class ReplenishVolumePools(BaseReplenishPoolsTask):
+    name = 'openstack_tenant.ReplenishVolumePools'
+    pool_size_option = 'volume_pool_size'
+    backend_method = 'replenish_volume_pool'
+
+
+class ReplenishFloatingIPPools(BaseReplenishPoolsTask):
+    name = 'openstack_tenant.ReplenishFloatingIPPools'
+    pool_size_option = 'floating_ip_pool_size'
+    backend_method = 'replenish_floating_ip_pool'
@@ -13,11 +13,10 @@ from waldur_openstack.openstack.tests.unittests import test_backend
 from waldur_core.structure.tests import factories as structure_factories
 
 from . import factories, fixtures
-from .. import models, views
+from .. import models, serializers, views
 
 
-@ddt
-class InstanceCreateTest(test.APITransactionTestCase):
+class BaseInstanceCreateTest(test.APITransactionTestCase):
     def setUp(self):
         self.openstack_tenant_fixture = fixtures.OpenStackTenantFixture()
         self.openstack_settings = self.openstack_tenant_fixture.openstack_tenant_service_settings
@@ -46,6 +45,9 @@ class InstanceCreateTest(test.APITransactionTestCase):
         default.update(extra)
         return default
 
+
+@ddt
+class InstanceCreateTest(BaseInstanceCreateTest):
     def test_quotas_update(self):
         response = self.client.post(self.url, self.get_valid_data())
 
@@ -239,6 +241,127 @@ class InstanceCreateTest(test.APITransactionTestCase):
         self.assertIn('internal_ips_set', response.data)
 
 
+@mock.patch('waldur_openstack.openstack_tenant.executors.InstanceCreateExecutor.execute_bulk')
+class InstanceBulkCreateTest(BaseInstanceCreateTest):
+    def setUp(self):
+        super(InstanceBulkCreateTest, self).setUp()
+        self.bulk_url = self.url + 'bulk_create/'
+
+    def test_user_can_provision_several_instances(self, execute_bulk):
+        response = self.client.post(self.bulk_url, self.get_valid_data(count=3))
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data), 3)
+        self.assertEqual(models.Instance.objects.filter(name__startswith='Valid name-').count(), 3)
+        self.assertEqual(execute_bulk.call_count, 1)
+
+    def test_each_instance_gets_its_own_internal_ip(self, execute_bulk):
+        self.client.post(self.bulk_url, self.get_valid_data(count=2))
+
+        self.assertEqual(models.InternalIP.objects.filter(subnet=self.subnet, instance__isnull=False).count(), 2)
+
+    def test_volumes_and_quotas_of_whole_batch_are_created(self, execute_bulk):
+        self.client.post(self.bulk_url, self.get_valid_data(count=3, data_volume_size=1024))
+
+        instances = models.Instance.objects.filter(name__startswith='Valid name-')
+        self.assertEqual(models.Volume.objects.filter(instance__in=instances, bootable=True).count(), 3)
+        self.assertEqual(models.Volume.objects.filter(instance__in=instances, bootable=False).count(), 3)
+        Quotas = self.openstack_settings.Quotas
+        self.assertEqual(self.openstack_settings.quotas.get(name=Quotas.instances).usage, 3)
+        self.assertEqual(self.openstack_settings.quotas.get(name=Quotas.volumes).usage, 6)
+        self.assertEqual(self.openstack_settings.quotas.get(name=Quotas.vcpu).usage, 3 * self.flavor.cores)
+        self.assertEqual(self.openstack_settings.quotas.get(name=Quotas.storage).usage,
+                         3 * (self.image.min_disk + 1024))
+
+    def test_batch_is_not_created_if_quota_is_exceeded(self, execute_bulk):
+        self.openstack_settings.quotas.filter(name=self.openstack_settings.Quotas.instances).update(limit=2)
+
+        response = self.client.post(self.bulk_url, self.get_valid_data(count=3))
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertFalse(models.Instance.objects.exists())
+
+    def test_user_cannot_assign_the_same_floating_ip_to_several_instances(self, execute_bulk):
+        floating_ip = self.openstack_tenant_fixture.floating_ip
+        data = self.get_valid_data(count=2, floating_ips=[{
+            'subnet': factories.SubNetFactory.get_url(self.subnet),
+            'url': factories.FloatingIPFactory.get_url(floating_ip),
+        }])
+
+        response = self.client.post(self.bulk_url, data)
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@mock.patch('waldur_openstack.openstack_tenant.executors.InstanceBulkActionExecutor.execute')
+class InstanceBulkActionTest(test.APITransactionTestCase):
+    def setUp(self):
+        self.fixture = fixtures.OpenStackTenantFixture()
+        self.instances = [
+            factories.InstanceFactory(
+                service_project_link=self.fixture.spl,
+                state=models.Instance.States.OK,
+                runtime_state=models.Instance.RuntimeStates.ACTIVE,
+            )
+            for _ in range(2)
+        ]
+        self.url = factories.InstanceFactory.get_list_url('bulk_stop')
+
+    def test_admin_can_stop_several_instances(self, execute):
+        self.client.force_authenticate(self.fixture.admin)
+        instance_uuids = [instance.uuid.hex for instance in self.instances]
+
+        response = self.client.post(self.url, {'instances': instance_uuids})
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        instances, action = execute.call_args[0]
+        self.assertItemsEqual(instances, self.instances)
+        self.assertEqual(action, 'stop')
+
+    def test_instances_can_be_selected_by_filter(self, execute):
+        self.client.force_authenticate(self.fixture.admin)
+
+        response = self.client.post(self.url + '?name=' + self.instances[0].name)
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(execute.call_args[0][0], [self.instances[0]])
+
+    def test_action_is_not_scheduled_if_any_instance_is_in_invalid_state(self, execute):
+        self.client.force_authenticate(self.fixture.admin)
+        self.instances[1].runtime_state = models.Instance.RuntimeStates.SHUTOFF
+        self.instances[1].save()
+
+        response = self.client.post(self.url, {'instances': [instance.uuid.hex for instance in self.instances]})
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertFalse(execute.called)
+
+    def test_user_without_project_role_cannot_stop_instances(self, execute):
+        self.client.force_authenticate(self.fixture.user)
+
+        response = self.client.post(self.url, {'instances': [instance.uuid.hex for instance in self.instances]})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(execute.called)
+
+    def test_action_is_not_applied_to_all_instances_if_they_are_not_specified(self, execute):
+        self.client.force_authenticate(self.fixture.staff)
+
+        response = self.client.post(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(execute.called)
+
+    def test_number_of_instances_is_limited(self, execute):
+        self.client.force_authenticate(self.fixture.staff)
+
+        with mock.patch.object(serializers.InstanceBulkActionSerializer, 'MAX_COUNT', 1):
+            response = self.client.post(self.url + '?runtime_state=' + models.Instance.RuntimeStates.ACTIVE)
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(execute.called)
+
+
 class InstanceDeleteTest(test_backend.BaseBackendTestCase):
     def setUp(self):
         super(InstanceDeleteTest, self).setUp()
@@ -1,12 +1,20 @@
 from __future__ import unicode_literals
 
+import contextlib
+
+from django.core.cache import cache
+from django.db import connection, IntegrityError
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from cinderclient import exceptions as cinder_exceptions
 from cinderclient.v2.volumes import Volume
 from novaclient.v2.servers import Server
 from novaclient.v2.flavors import Flavor
 import mock
 
-from waldur_openstack.openstack_tenant.backend import OpenStackTenantBackend
+from waldur_openstack.openstack_base import signals
+from waldur_openstack.openstack_base.backend import OpenStackBackendError
+from waldur_openstack.openstack_tenant.backend import InstanceRecord, OpenStackTenantBackend, VolumeRecord
 from waldur_openstack.openstack_tenant import models
 
 from .. import fixtures, factories
@@ -204,6 +212,124 @@ class PullFloatingIPTest(BaseBackendTest):
         self.assertNotEqual(floating_ip.address, floating_ip.name)
         self.assertEqual(floating_ip.name, expected_name)
 
+    def test_number_of_queries_does_not_depend_on_number_of_floating_ips(self):
+        def pull(count):
+            backend_floating_ips = []
+            for index in range(count):
+                internal_ip = factories.InternalIPFactory(instance=self.fixture.instance,
+                                                          subnet=self.fixture.subnet,
+                                                          backend_id='port-%s-%s' % (count, index))
+                backend_floating_ips.append({
+                    'floating_ip_address': '10.0.%s.%s' % (count, index),
+                    'floating_network_id': 'backend_network_id',
+                    'status': 'ACTIVE',
+                    'id': 'ip-%s-%s' % (count, index),
+                    'port_id': internal_ip.backend_id,
+                })
+                backend_floating_ips.append({
+                    'floating_ip_address': '10.1.%s.%s' % (count, index),
+                    'floating_network_id': 'backend_network_id',
+                    'status': 'DOWN',
+                    'id': 'new-ip-%s-%s' % (count, index),
+                    'port_id': None,
+                })
+            self.neutron_client_mock.list_floatingips.return_value = {'floatingips': backend_floating_ips}
+            models.FloatingIP.objects.filter(settings=self.settings).delete()
+            for ip in backend_floating_ips[::2]:
+                factories.FloatingIPFactory(settings=self.settings, backend_id=ip['id'])
+
+            with CaptureQueriesContext(connection) as context:
+                self.tenant_backend.pull_floating_ips()
+            return len(context.captured_queries)
+
+        self.assertEqual(pull(1), pull(5))
+        self.assertEqual(models.FloatingIP.objects.filter(settings=self.settings, runtime_state='ACTIVE').count(), 5)
+        self.assertEqual(models.FloatingIP.objects.filter(settings=self.settings, runtime_state='DOWN').count(), 5)
+
+    def test_instance_floating_ip_is_detached_if_it_is_not_returned_by_neutron(self):
+        internal_ip = factories.InternalIPFactory(instance=self.fixture.instance, subnet=self.fixture.subnet)
+        floating_ip = factories.FloatingIPFactory(settings=self.settings, internal_ip=internal_ip)
+        backend_floating_ips = self._get_valid_new_backend_ip(internal_ip)
+        self.neutron_client_mock.list_floatingips.return_value = backend_floating_ips
+
+        self.tenant_backend.pull_instance_floating_ips(self.fixture.instance)
+
+        floating_ip.refresh_from_db()
+        self.assertIsNone(floating_ip.internal_ip)
+        created_ip = models.FloatingIP.objects.get(backend_id='new_backend_id')
+        self.assertEqual(created_ip.internal_ip, internal_ip)
+
+
+class FloatingIPPoolTest(BaseBackendTest):
+
+    def setUp(self):
+        super(FloatingIPPoolTest, self).setUp()
+        self.settings.options = {'external_network_id': 'external_network_id', 'floating_ip_pool_size': 2}
+        self.settings.save()
+        self.neutron_client_mock.create_floatingip.return_value = {'floatingip': {
+            'id': 'new_floating_ip_id',
+            'floating_ip_address': '10.0.0.1',
+            'status': 'DOWN',
+        }}
+
+    def test_missing_floating_ips_are_allocated(self):
+        factories.FloatingIPFactory(settings=self.settings, backend_network_id='external_network_id')
+
+        self.tenant_backend.replenish_floating_ip_pool()
+
+        self.assertEqual(self.neutron_client_mock.create_floatingip.call_count, 1)
+        self.assertTrue(models.FloatingIP.objects.filter(
+            settings=self.settings, backend_id='new_floating_ip_id', is_booked=False).exists())
+
+    def test_booked_floating_ips_are_not_counted_as_free(self):
+        factories.FloatingIPFactory(
+            settings=self.settings, backend_network_id='external_network_id', is_booked=True)
+
+        self.tenant_backend.replenish_floating_ip_pool()
+
+        self.assertEqual(self.neutron_client_mock.create_floatingip.call_count, 2)
+
+
+class InstanceFloatingIPsTest(BaseBackendTest):
+
+    def setUp(self):
+        super(InstanceFloatingIPsTest, self).setUp()
+        self.instance = self.fixture.instance
+        self.floating_ip = self.fixture.floating_ip
+        self.floating_ip.internal_ip = self.fixture.internal_ip
+        self.floating_ip.save()
+
+    def test_stale_floating_ip_is_disconnected_and_new_one_is_connected(self):
+        self.neutron_client_mock.list_floatingips.return_value = {'floatingips': [
+            {'id': 'stale_floating_ip_id', 'port_id': self.fixture.internal_ip.backend_id},
+        ]}
+
+        self.tenant_backend.push_instance_floating_ips(self.instance)
+
+        self.neutron_client_mock.update_floatingip.assert_any_call(
+            'stale_floating_ip_id', body={'floatingip': {'port_id': None}})
+        self.neutron_client_mock.update_floatingip.assert_any_call(
+            self.floating_ip.backend_id, body={'floatingip': {'port_id': self.fixture.internal_ip.backend_id}})
+
+    def test_runtime_state_of_all_floating_ips_is_checked_with_single_request(self):
+        self.neutron_client_mock.list_floatingips.return_value = {'floatingips': [
+            {'id': self.floating_ip.backend_id, 'status': 'ACTIVE'},
+        ]}
+
+        self.assertTrue(self.tenant_backend.are_all_instance_floating_ips_active(self.instance))
+
+        self.assertEqual(self.neutron_client_mock.list_floatingips.call_count, 1)
+        self.floating_ip.refresh_from_db()
+        self.assertEqual(self.floating_ip.runtime_state, 'ACTIVE')
+
+    def test_check_fails_if_floating_ip_is_erred(self):
+        self.neutron_client_mock.list_floatingips.return_value = {'floatingips': [
+            {'id': self.floating_ip.backend_id, 'status': 'ERROR'},
+        ]}
+
+        self.assertRaises(OpenStackBackendError,
+                          self.tenant_backend.are_all_instance_floating_ips_active, self.instance)
+
 
 class PullSecurityGroupsTest(BaseBackendTest):
 
@@ -321,6 +447,109 @@ class PullNetworksTest(BaseBackendTest):
         network.refresh_from_db()
         self.assertEqual(network.name, 'Private')
 
+    def test_fields_not_reported_by_backend_are_not_reset(self):
+        network = factories.NetworkFactory(settings=self.settings, backend_id='backend_id', type='vlan')
+        self.tenant_backend.pull_networks()
+        network.refresh_from_db()
+        self.assertEqual(network.type, 'vlan')
+
+    def test_network_created_concurrently_is_updated_instead_of_skipping_others(self):
+        self.backend_networks['networks'].append({'id': 'other_id', 'name': 'Public', 'description': ''})
+        bulk_create = models.Network.objects.bulk_create
+
+        def create_concurrently(objects):
+            if not models.Network.objects.filter(backend_id='backend_id').exists():
+                factories.NetworkFactory(settings=self.settings, backend_id='backend_id', name='Old name')
+                raise IntegrityError()
+            return bulk_create(objects)
+
+        @contextlib.contextmanager
+        def atomic():
+            # concurrently created network is not rolled back with the savepoint
+            yield
+
+        with mock.patch('waldur_openstack.openstack_base.backend.transaction.atomic', atomic), \
+                mock.patch.object(models.Network.objects, 'bulk_create', side_effect=create_concurrently):
+            self.tenant_backend.pull_networks()
+
+        self.assertEqual(models.Network.objects.get(backend_id='backend_id').name, 'Private')
+        self.assertEqual(models.Network.objects.get(backend_id='other_id').name, 'Public')
+
+    def test_number_of_queries_does_not_depend_on_number_of_networks(self):
+        def pull(count):
+            networks = [{'id': 'network-%s-%s' % (count, index), 'name': 'Private', 'description': ''}
+                        for index in range(count)]
+            models.Network.objects.filter(settings=self.settings).delete()
+            for network in networks[::2]:
+                factories.NetworkFactory(settings=self.settings, backend_id=network['id'], name='Old name')
+            self.neutron_client_mock.list_networks.return_value = {'networks': networks}
+
+            with CaptureQueriesContext(connection) as context:
+                self.tenant_backend.pull_networks()
+            return len(context.captured_queries)
+
+        self.assertEqual(pull(2), pull(6))
+        self.assertEqual(models.Network.objects.filter(settings=self.settings, name='Private').count(), 6)
+
+
+class SyncStageLockTest(BaseBackendTest):
+
+    def setUp(self):
+        super(SyncStageLockTest, self).setUp()
+        cache.clear()
+        self.neutron_client_mock.list_networks.return_value = {'networks': []}
+        self.lock_key = 'openstack_sync_%s_networks' % self.settings.uuid.hex
+
+    def test_request_is_attached_to_running_stage_without_waiting(self):
+        cache.add(self.lock_key, True)
+
+        self.assertIsNone(self.tenant_backend.pull_networks())
+        self.assertFalse(self.neutron_client_mock.list_networks.called)
+        self.assertTrue(cache.get(self.lock_key + '_pending'))
+
+    def test_request_runs_stage_itself_if_lock_is_released_while_it_is_attached(self):
+        original_set = cache.set
+
+        def set_pending(key, *args, **kwargs):
+            # running stage is completed right before pending flag is set
+            cache.delete(self.lock_key)
+            original_set(key, *args, **kwargs)
+
+        cache.add(self.lock_key, True)
+        with mock.patch.object(cache, 'set', side_effect=set_pending):
+            self.tenant_backend.pull_networks()
+
+        self.assertEqual(self.neutron_client_mock.list_networks.call_count, 1)
+        self.assertIsNone(cache.get(self.lock_key))
+
+    def test_stage_is_repeated_for_request_attached_while_it_is_running(self):
+        def list_networks(**kwargs):
+            if self.neutron_client_mock.list_networks.call_count == 1:
+                cache.set(self.lock_key + '_pending', True)
+            return {'networks': []}
+
+        self.neutron_client_mock.list_networks.side_effect = list_networks
+        self.tenant_backend.pull_networks()
+        self.assertEqual(self.neutron_client_mock.list_networks.call_count, 2)
+        self.assertIsNone(cache.get(self.lock_key))
+
+    def test_number_of_repeated_runs_is_limited(self):
+        def list_networks(**kwargs):
+            cache.set(self.lock_key + '_pending', True)
+            return {'networks': []}
+
+        self.neutron_client_mock.list_networks.side_effect = list_networks
+        self.tenant_backend.pull_networks()
+        self.assertEqual(self.neutron_client_mock.list_networks.call_count, 3)
+
+    def test_lock_is_released_if_stage_fails(self):
+        self.neutron_client_mock.list_networks.side_effect = OpenStackBackendError()
+        self.assertRaises(OpenStackBackendError, self.tenant_backend.pull_networks)
+
+        self.neutron_client_mock.list_networks.side_effect = None
+        self.tenant_backend.pull_networks()
+        self.assertEqual(self.neutron_client_mock.list_networks.call_count, 2)
+
 
 class PullSubnetsTest(BaseBackendTest):
 
@@ -418,6 +647,50 @@ class GetVolumesTest(BaseBackendTest):
         expected_backend_ids = [item.id for item in volumes]
         self.assertItemsEqual(returned_backend_ids, expected_backend_ids)
 
+    def test_image_and_instance_are_looked_up_without_query_per_volume(self):
+        image = factories.ImageFactory(settings=self.settings)
+        instance = self.fixture.instance
+        volumes = self._generate_volumes(backend=True, count=3)
+        for volume in volumes:
+            volume.volume_image_metadata = {'image_id': image.backend_id}
+            volume.attachments = [{'server_id': instance.backend_id, 'device': '/dev/vda'}]
+        self.cinder_client_mock.volumes.list.return_value = volumes
+
+        with self.assertNumQueries(2):
+            result = self.tenant_backend.get_volumes()
+
+        for volume in result:
+            self.assertEqual(volume.image, image)
+            self.assertEqual(volume.instance, instance)
+
+
+class GetVolumeRecordsTest(BaseBackendTest):
+
+    def test_records_contain_pulled_fields_of_volumes(self):
+        backend_volume = self._get_valid_volume(backend_id='volume_id')
+        backend_volume.attachments = [{'server_id': 'instance_id', 'device': '/dev/vdb'}]
+        self.cinder_client_mock.volumes.list.return_value = [backend_volume]
+
+        with self.assertNumQueries(0):
+            records = self.tenant_backend.get_volume_records()
+
+        self.assertEqual(len(records), 1)
+        self.assertIsInstance(records[0], VolumeRecord)
+        self.assertEqual(records[0].backend_id, 'volume_id')
+        self.assertEqual(records[0].size, 1024)
+        self.assertEqual(records[0].device, '/dev/vdb')
+        self.assertTrue(records[0].bootable)
+
+    def test_record_has_the_same_values_as_volume_model(self):
+        backend_volume = self._get_valid_volume(backend_id='volume_id')
+        self.cinder_client_mock.volumes.list.return_value = [backend_volume]
+
+        record = self.tenant_backend.get_volume_records()[0]
+        volume = self.tenant_backend.get_volumes()[0]
+
+        for field in models.Volume.get_backend_fields():
+            self.assertEqual(getattr(record, field), getattr(volume, field))
+
 
 class ImportVolumeTest(BaseBackendTest):
 
@@ -449,6 +722,163 @@ class ImportVolumeTest(BaseBackendTest):
         self.assertEqual(volume.name, self.backend_volume.name)
 
 
+class VolumePoolTest(BaseBackendTest):
+
+    def setUp(self):
+        super(VolumePoolTest, self).setUp()
+        self.image = factories.ImageFactory(settings=self.settings, min_disk=1024)
+        self.volume = factories.VolumeFactory(
+            service_project_link=self.fixture.spl, image=self.image, size=2048, backend_id='')
+        self.pooled_backend_volume = self._get_valid_volume('pooled_volume_id')
+        self.pooled_backend_volume.status = 'available'
+        self.pooled_backend_volume.volume_image_metadata = {'image_id': self.image.backend_id}
+        self.cinder_client_mock.volumes.get.return_value = self.pooled_backend_volume
+
+    def create_pooled_volume(self):
+        pooled_volume = models.PooledVolume.objects.create(
+            image=self.image, backend_id='pooled_volume_id', size=1024, runtime_state='available')
+        pooled_volume.increase_backend_quotas_usage()
+        return pooled_volume
+
+    def test_volume_is_claimed_from_pool(self):
+        self.create_pooled_volume()
+
+        self.tenant_backend.create_volume(self.volume)
+
+        self.volume.refresh_from_db()
+        self.assertEqual(self.volume.backend_id, 'pooled_volume_id')
+        self.assertFalse(models.PooledVolume.objects.exists())
+        self.cinder_client_mock.volumes.create.assert_not_called()
+        self.cinder_client_mock.volumes.extend.assert_called_once_with('pooled_volume_id', 2)
+
+    def test_quota_of_claimed_pooled_volume_is_released(self):
+        self.create_pooled_volume()
+
+        self.tenant_backend.create_volume(self.volume)
+
+        self.assertEqual(self.settings.quotas.get(name=self.settings.Quotas.volumes).usage, 0)
+
+    def test_pooled_volume_is_not_claimed_if_it_was_created_from_other_image(self):
+        self.create_pooled_volume()
+        self.pooled_backend_volume.volume_image_metadata = {'image_id': 'other_image_id'}
+        self.cinder_client_mock.volumes.create.return_value = self._get_valid_volume('new_volume_id')
+
+        self.tenant_backend.create_volume(self.volume)
+
+        self.assertEqual(self.volume.backend_id, 'new_volume_id')
+        self.assertFalse(models.PooledVolume.objects.exists())
+
+    def test_claimed_pooled_volume_is_unlinked_if_backend_check_fails(self):
+        self.create_pooled_volume()
+        self.cinder_client_mock.volumes.get.side_effect = cinder_exceptions.ClientException(code=500)
+
+        with self.assertRaises(OpenStackBackendError):
+            self.tenant_backend.create_volume(self.volume)
+
+        self.volume.refresh_from_db()
+        self.assertEqual(self.volume.backend_id, '')
+        self.assertFalse(models.PooledVolume.objects.exists())
+
+    def test_volume_is_created_if_pool_is_empty(self):
+        models.PooledVolume.objects.create(
+            image=self.image, backend_id='pooled_volume_id', size=1024, runtime_state='creating')
+        self.cinder_client_mock.volumes.create.return_value = self._get_valid_volume('new_volume_id')
+
+        self.tenant_backend.create_volume(self.volume)
+
+        self.assertEqual(self.volume.backend_id, 'new_volume_id')
+        self.assertTrue(models.PooledVolume.objects.exists())
+
+    def test_missing_pooled_volumes_are_created(self):
+        self.settings.options = {'volume_pool_size': 2, 'volume_pool_images': [self.image.name]}
+        self.settings.save()
+        self.cinder_client_mock.volumes.list.return_value = []
+        self.cinder_client_mock.volumes.create.side_effect = [
+            self._get_valid_volume('pooled_volume_1'),
+            self._get_valid_volume('pooled_volume_2'),
+        ]
+
+        self.tenant_backend.replenish_volume_pool()
+
+        self.assertEqual(models.PooledVolume.objects.filter(image=self.image).count(), 2)
+
+
+class PullVolumesTest(BaseBackendTest):
+
+    def setUp(self):
+        super(PullVolumesTest, self).setUp()
+        self.volume = factories.VolumeFactory(
+            service_project_link=self.fixture.spl, state=models.Volume.States.OK, runtime_state='available')
+        self.backend_volume = VolumeRecord(**{
+            field: getattr(self.volume, field) for field in models.Volume.get_backend_fields()})
+        self.tenant_backend.get_volume_records = mock.Mock(return_value=[self.backend_volume])
+
+    def test_unchanged_volume_is_not_saved(self):
+        modified = self.volume.modified
+        self.tenant_backend.pull_volumes()
+        self.volume.refresh_from_db()
+        self.assertEqual(self.volume.modified, modified)
+
+    def test_changed_fields_are_updated(self):
+        self.backend_volume.runtime_state = 'in-use'
+        self.tenant_backend.pull_volumes()
+        self.volume.refresh_from_db()
+        self.assertEqual(self.volume.runtime_state, 'in-use')
+
+    def test_erred_volume_is_recovered(self):
+        self.volume.state = models.Volume.States.ERRED
+        self.volume.error_message = 'Does not exist at backend.'
+        self.volume.save()
+
+        self.tenant_backend.pull_volumes()
+        self.volume.refresh_from_db()
+
+        self.assertEqual(self.volume.state, models.Volume.States.OK)
+        self.assertEqual(self.volume.error_message, '')
+
+    def test_signal_is_sent_once_for_changed_volumes(self):
+        other_volume = factories.VolumeFactory(
+            service_project_link=self.fixture.spl, state=models.Volume.States.ERRED, runtime_state='available')
+        other_backend_volume = VolumeRecord(**{
+            field: getattr(other_volume, field) for field in models.Volume.get_backend_fields()})
+        self.tenant_backend.get_volume_records.return_value = [self.backend_volume, other_backend_volume]
+        receiver = mock.Mock()
+        signals.resources_pulled.connect(receiver, sender=models.Volume)
+        self.addCleanup(signals.resources_pulled.disconnect, receiver, sender=models.Volume)
+
+        self.tenant_backend.pull_volumes()
+
+        self.assertEqual(receiver.call_count, 1)
+        changed_fields = receiver.call_args[1]['changed_fields']
+        self.assertEqual(list(changed_fields), [other_volume.pk])
+        self.assertIn('state', changed_fields[other_volume.pk])
+
+    def test_missing_volume_is_marked_as_erred(self):
+        self.tenant_backend.get_volume_records.return_value = []
+        self.tenant_backend.pull_volumes()
+        self.volume.refresh_from_db()
+        self.assertEqual(self.volume.state, models.Volume.States.ERRED)
+
+    def test_volume_with_unchanged_fingerprint_is_not_loaded(self):
+        self.tenant_backend.pull_volumes()
+        self.volume.refresh_from_db()
+        self.assertNotEqual(self.volume.backend_fingerprint, '')
+
+        with self.assertNumQueries(1):
+            self.tenant_backend.pull_volumes()
+
+    def test_volume_changed_locally_is_compared_with_backend_again(self):
+        self.tenant_backend.pull_volumes()
+        self.volume.refresh_from_db()
+        self.volume.runtime_state = 'detaching'
+        self.volume.save(update_fields=['runtime_state'])
+
+        self.tenant_backend.pull_volumes()
+
+        self.volume.refresh_from_db()
+        self.assertEqual(self.volume.runtime_state, 'available')
+
+
 class PullInstanceTest(BaseBackendTest):
 
     def setUp(self):
@@ -499,6 +929,57 @@ class PullInstanceTest(BaseBackendTest):
         self.assertEqual(instance.error_message, 'Waldur error.')
 
 
+class PullInstancesSecurityGroupsTest(BaseBackendTest):
+
+    def setUp(self):
+        super(PullInstancesSecurityGroupsTest, self).setUp()
+        self.instance = self.fixture.instance
+        self.web_group = factories.SecurityGroupFactory(settings=self.settings, backend_id='web')
+        self.ssh_group = factories.SecurityGroupFactory(settings=self.settings, backend_id='ssh')
+
+    def setup_ports(self, *security_groups):
+        self.neutron_client_mock.list_ports.return_value = {'ports': [
+            {'device_id': self.instance.backend_id, 'security_groups': list(security_groups)},
+        ]}
+
+    def test_missing_groups_are_added(self):
+        self.setup_ports('web', 'ssh')
+        self.tenant_backend.pull_instances_security_groups([self.instance])
+        self.assertEqual(set(self.instance.security_groups.all()), {self.web_group, self.ssh_group})
+
+    def test_stale_groups_are_removed(self):
+        self.instance.security_groups.add(self.web_group, self.ssh_group)
+        self.setup_ports('web')
+        self.tenant_backend.pull_instances_security_groups([self.instance])
+        self.assertEqual(list(self.instance.security_groups.all()), [self.web_group])
+
+    def test_unknown_groups_are_skipped(self):
+        self.setup_ports('web', 'unknown')
+        self.tenant_backend.pull_instances_security_groups([self.instance])
+        self.assertEqual(list(self.instance.security_groups.all()), [self.web_group])
+
+    def test_unknown_groups_are_skipped_for_instances_with_deferred_fields(self):
+        self.setup_ports('web', 'unknown')
+        instances = models.Instance.objects.filter(id=self.instance.id).only('id', 'backend_id')
+        self.tenant_backend.pull_instances_security_groups(list(instances))
+        self.assertEqual(list(self.instance.security_groups.all()), [self.web_group])
+
+    def test_stale_groups_of_all_instances_are_removed(self):
+        other_instance = factories.InstanceFactory(service_project_link=self.fixture.spl)
+        self.instance.security_groups.add(self.ssh_group)
+        other_instance.security_groups.add(self.ssh_group)
+        self.setup_ports('web')
+        self.tenant_backend.pull_instances_security_groups([self.instance, other_instance])
+        self.assertFalse(self.ssh_group.instances.exists())
+
+    def test_ports_are_listed_once_for_all_instances(self):
+        other_instance = factories.InstanceFactory(service_project_link=self.fixture.spl)
+        self.setup_ports('web')
+        self.tenant_backend.pull_instances_security_groups([self.instance, other_instance])
+        self.assertEqual(self.neutron_client_mock.list_ports.call_count, 1)
+        self.assertEqual(other_instance.security_groups.count(), 0)
+
+
 class PullInstanceInternalIpsTest(BaseBackendTest):
     def setup_neutron(self, port_id, device_id, subnet_id):
         self.neutron_client_mock.list_ports.return_value = {
@@ -654,6 +1135,28 @@ class PullInternalIpsTest(BaseBackendTest):
         self.assertEqual(internal_ip.mac_address, 'DC-D6-5E-9B-49-70')
         self.assertEqual(internal_ip.ip4_address, '10.0.0.2')
 
+    def test_number_of_queries_does_not_depend_on_number_of_ports(self):
+        subnet = self.fixture.subnet
+        ports = []
+
+        def get_queries_count(instances_count):
+            for _ in range(instances_count):
+                instance = factories.InstanceFactory(service_project_link=self.fixture.spl)
+                ports.append({
+                    'id': 'port_%s' % instance.backend_id,
+                    'mac_address': 'DC-D6-5E-9B-49-70',
+                    'device_id': instance.backend_id,
+                    'device_owner': 'compute:nova',
+                    'fixed_ips': [{'ip_address': '10.0.0.2', 'subnet_id': subnet.backend_id}],
+                })
+            self.neutron_client_mock.list_ports.return_value = {'ports': ports}
+            with CaptureQueriesContext(connection) as context:
+                self.tenant_backend.pull_internal_ips()
+            return len(context.captured_queries)
+
+        self.assertEqual(get_queries_count(1), get_queries_count(5))
+        self.assertEqual(models.InternalIP.objects.filter(subnet=subnet).count(), 6)
+
     def test_even_if_internal_ip_is_not_connected_it_is_not_skipped(self):
         # Arrange
         self.setup_neutron('port_id', '', self.fixture.internal_ip.subnet.backend_id)
@@ -707,6 +1210,41 @@ class GetInstancesTest(BaseBackendTest):
         self.assertItemsEqual(returned_backend_ids, expected_backend_ids)
 
 
+class GetInstanceRecordsTest(BaseBackendTest):
+
+    def setUp(self):
+        super(GetInstanceRecordsTest, self).setUp()
+        self.backend_instance = self._get_valid_instance('instance_id')
+        self.backend_flavor = self._get_valid_flavor('flavor_id')
+        self.backend_instance.flavor = self.backend_flavor._info
+        self.nova_client_mock.servers.list.return_value = [self.backend_instance]
+        self.nova_client_mock.flavors.list.return_value = [self.backend_flavor]
+
+    def test_records_contain_flavor_fields(self):
+        record = self.tenant_backend.get_instance_records()[0]
+
+        self.assertIsInstance(record, InstanceRecord)
+        self.assertEqual(record.backend_id, 'instance_id')
+        self.assertEqual(record.runtime_state, 'ACTIVE')
+        self.assertEqual(record.flavor_name, 'm1.small')
+        self.assertEqual(record.cores, 2)
+        self.assertEqual(record.ram, 4096)
+
+    def test_flavor_fields_get_default_values_if_flavor_is_deleted(self):
+        self.nova_client_mock.flavors.list.return_value = []
+
+        record = self.tenant_backend.get_instance_records()[0]
+
+        self.assertEqual(record.flavor_name, models.Instance._meta.get_field('flavor_name').get_default())
+
+    def test_record_has_the_same_values_as_instance_model(self):
+        record = self.tenant_backend.get_instance_records()[0]
+        instance = self.tenant_backend.get_instances()[0]
+
+        for field in models.Instance.get_backend_fields():
+            self.assertEqual(getattr(record, field), getattr(instance, field))
+
+
 class ImportInstanceTest(BaseBackendTest):
 
     def setUp(self):
@@ -773,3 +1311,75 @@ class ImportInstanceTest(BaseBackendTest):
 
         self.assertEquals(instance.backend_id, self.backend_id)
         self.assertEquals(instance.error_message, expected_error_message)
+
+
+class InstancesPowerStateTest(BaseBackendTest):
+
+    def setUp(self):
+        super(InstancesPowerStateTest, self).setUp()
+        self.instances = [
+            factories.InstanceFactory(
+                service_project_link=self.fixture.spl,
+                state=models.Instance.States.UPDATING,
+                runtime_state=models.Instance.RuntimeStates.ACTIVE,
+            )
+            for _ in range(2)
+        ]
+        self.instance_uuids = [instance.uuid.hex for instance in self.instances]
+
+    def _get_backend_instance(self, instance, status):
+        backend_instance = self._get_valid_instance(instance.backend_id)
+        backend_instance.status = status
+        return backend_instance
+
+    def test_instances_are_stopped_concurrently(self):
+        for instance in self.instances:
+            instance.state = models.Instance.States.UPDATE_SCHEDULED
+            instance.save()
+
+        self.tenant_backend.change_instances_power_state(self.instance_uuids, 'stop')
+
+        self.assertEqual(self.nova_client_mock.servers.stop.call_count, 2)
+        for instance in self.instances:
+            instance.refresh_from_db()
+            self.assertEqual(instance.state, models.Instance.States.UPDATING)
+
+    def test_runtime_state_of_all_instances_is_pulled_with_single_request(self):
+        self.nova_client_mock.servers.list.return_value = [
+            self._get_backend_instance(self.instances[0], 'SHUTOFF'),
+            self._get_backend_instance(self.instances[1], 'ACTIVE'),
+        ]
+
+        pending_uuids = self.tenant_backend.pull_instances_runtime_state(self.instance_uuids, 'SHUTOFF')
+
+        self.assertEqual(self.nova_client_mock.servers.list.call_count, 1)
+        self.assertEqual(pending_uuids, [self.instances[1].uuid.hex])
+        self.instances[0].refresh_from_db()
+        self.assertEqual(self.instances[0].state, models.Instance.States.OK)
+        self.assertEqual(self.instances[0].runtime_state, 'SHUTOFF')
+
+    def test_only_changed_servers_are_listed(self):
+        self.nova_client_mock.servers.list.return_value = []
+
+        pending_uuids = self.tenant_backend.pull_instances_runtime_state(self.instance_uuids, 'SHUTOFF')
+
+        search_opts = self.nova_client_mock.servers.list.call_args[1]['search_opts']
+        self.assertIn('changes-since', search_opts)
+        self.assertItemsEqual(pending_uuids, self.instance_uuids)
+
+    def test_deleted_instance_is_marked_as_erred(self):
+        self.nova_client_mock.servers.list.return_value = [
+            self._get_backend_instance(self.instances[0], 'DELETED'),
+        ]
+
+        self.tenant_backend.pull_instances_runtime_state(self.instance_uuids, 'SHUTOFF')
+
+        self.instances[0].refresh_from_db()
+        self.assertEqual(self.instances[0].state, models.Instance.States.ERRED)
+
+    def test_start_time_of_stopped_instances_is_cleared(self):
+        self.tenant_backend.change_instances_power_state(self.instance_uuids, 'stop')
+
+        for instance in self.instances:
+            instance.refresh_from_db()
+            self.assertIsNone(instance.start_time)
@@ -1,6 +1,12 @@
-from django.test import TestCase
+from celery import group
+from django.test import TestCase, override_settings
+import mock
 
-from waldur_openstack.openstack_tenant.executors import InstanceFloatingIPsUpdateExecutor
+from waldur_core.core import utils as core_utils
+from waldur_openstack.openstack_base.backend import OpenStackBackendError
+from waldur_openstack.openstack_tenant import models
+from waldur_openstack.openstack_tenant.executors import (
+    InstanceBulkActionExecutor, InstanceCreateExecutor, InstanceFloatingIPsUpdateExecutor, InstancesPowerStateExecutor)
 
 from .. import factories
 
@@ -25,3 +31,61 @@ class InstanceFloatingIPsUpdateExecutorTest(TestCase):
         self.assertFalse(result['attached'])
         self.assertFalse(result['detached'])
         self.assertEqual(result['message'], 'Instance floating IPs have been updated.')
+
+
+class InstanceCreateExecutorTest(TestCase):
+
+    def setUp(self):
+        self.instance = factories.InstanceFactory()
+        self.volumes = factories.VolumeFactory.create_batch(
+            2, instance=self.instance, service_project_link=self.instance.service_project_link)
+        self.flavor = factories.FlavorFactory()
+
+    def get_signature(self):
+        serialized_instance = core_utils.serialize_instance(self.instance)
+        return InstanceCreateExecutor.get_task_signature(self.instance, serialized_instance, flavor=self.flavor)
+
+    def test_chain_does_not_contain_groups(self):
+        self.assertFalse(any(isinstance(task, group) for task in self.get_signature().tasks))
+
+    def test_volumes_are_checked_with_single_task(self):
+        checks = [task for task in self.get_signature().tasks
+                  if 'are_all_instance_volumes_available' in task.args]
+        self.assertEqual(len(checks), 1)
+
+    @override_settings(CELERY_ALWAYS_EAGER=True)
+    @mock.patch('waldur_openstack.openstack_tenant.backend.OpenStackTenantBackend.are_all_instance_volumes_available')
+    @mock.patch('waldur_openstack.openstack_tenant.backend.OpenStackTenantBackend.create_volume')
+    def test_instance_is_marked_as_erred_if_volume_creation_fails(self, create_volume, check_volumes):
+        check_volumes.side_effect = OpenStackBackendError('Volume is in erred state.')
+
+        self.assertRaises(OpenStackBackendError, InstanceCreateExecutor.execute,
+                          self.instance, async=False, flavor=self.flavor)
+
+        self.instance.refresh_from_db()
+        self.assertEqual(self.instance.state, models.Instance.States.ERRED)
+
+
+class InstanceBulkActionExecutorTest(TestCase):
+
+    def setUp(self):
+        self.instances = factories.InstanceFactory.create_batch(2, state=models.Instance.States.OK)
+
+    @mock.patch('waldur_openstack.openstack_tenant.executors.InstancesPowerStateExecutor.apply_signature')
+    def test_instances_of_each_settings_are_processed_by_routed_executor(self, apply_signature):
+        InstanceBulkActionExecutor.execute(self.instances, 'stop')
+
+        self.assertEqual(apply_signature.call_count, 2)
+        settings = [call[0][0] for call in apply_signature.call_args_list]
+        self.assertItemsEqual(settings, [instance.service_project_link.service.settings
+                                         for instance in self.instances])
+
+    def test_failure_signature_marks_instances_as_erred(self):
+        settings = self.instances[0].service_project_link.service.settings
+        serialized_settings = core_utils.serialize_instance(settings)
+        instance_uuids = [self.instances[0].uuid.hex]
+
+        signature = InstancesPowerStateExecutor.get_failure_signature(
+            settings, serialized_settings, instance_uuids=instance_uuids, action='stop')
+
+        self.assertEqual(signature.args, (serialized_settings, instance_uuids))
@@ -8,6 +8,8 @@ from waldur_core.cost_tracking import models as cost_tracking_models
 from waldur_core.structure import models as structure_models
 from waldur_core.structure.tests import factories as structure_factories
 from waldur_openstack.openstack.tests import factories as openstack_factories
+from waldur_openstack.openstack_base import signals as openstack_base_signals
+from waldur_openstack.openstack_base.handlers import deferred_handlers
 
 from .. import factories
 from ... import models, apps, PriceItemTypes
@@ -178,6 +180,18 @@ class FloatingIPHandlerTest(BaseServicePropertyTest):
         openstack_floating_ip.delete()
         self.assertEqual(models.FloatingIP.objects.count(), 0)
 
+    def test_floating_ips_are_deleted_at_the_end_of_deferred_block(self):
+        openstack_floating_ips = openstack_factories.FloatingIPFactory.create_batch(3, tenant=self.tenant)
+        for openstack_floating_ip in openstack_floating_ips:
+            factories.FloatingIPFactory(settings=self.service_settings, backend_id=openstack_floating_ip.backend_id)
+
+        with deferred_handlers():
+            for openstack_floating_ip in openstack_floating_ips:
+                openstack_floating_ip.delete()
+            self.assertEqual(models.FloatingIP.objects.count(), 3)
+
+        self.assertEqual(models.FloatingIP.objects.count(), 0)
+
 
 class TenantChangeCredentialsTest(TestCase):
 
@@ -410,3 +424,22 @@ class FlavorPriceListItemTest(TestCase):
             item_type=PriceItemTypes.FLAVOR,
             key=self.flavor.name,
         )
+
+
+class PulledInstancesStartTimeTest(TestCase):
+
+    def setUp(self):
+        self.instance = factories.InstanceFactory(runtime_state=models.Instance.RuntimeStates.ACTIVE)
+
+    def send_signal(self, changed_fields):
+        openstack_base_signals.resources_pulled.send(
+            sender=models.Instance, instances=[self.instance], changed_fields={self.instance.pk: changed_fields})
+        self.instance.refresh_from_db()
+
+    def test_start_time_is_set_if_instance_is_started(self):
+        self.send_signal({'runtime_state'})
+        self.assertIsNotNone(self.instance.start_time)
+
+    def test_start_time_is_not_changed_if_runtime_state_is_not_changed(self):
+        self.send_signal({'name'})
+        self.assertIsNone(self.instance.start_time)
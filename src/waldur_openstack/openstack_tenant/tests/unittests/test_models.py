@@ -19,6 +19,22 @@ class InstanceTest(TestCase):
         self.assertEqual(fixture.instance.size, expected_size)
 
 
+class FloatingIPClaimTest(TestCase):
+    def setUp(self):
+        self.settings = factories.OpenStackTenantServiceSettingsFactory()
+
+    def test_allocated_floating_ip_is_preferred(self):
+        factories.FloatingIPFactory(settings=self.settings, backend_network_id='net', backend_id='')
+        allocated_ip = factories.FloatingIPFactory(settings=self.settings, backend_network_id='net')
+
+        self.assertEqual(models.FloatingIP.claim_free(self.settings, 'net'), allocated_ip)
+
+    def test_booked_floating_ip_is_not_claimed(self):
+        factories.FloatingIPFactory(settings=self.settings, backend_network_id='net', is_booked=True)
+
+        self.assertIsNone(models.FloatingIP.claim_free(self.settings, 'net'))
+
+
 class BackupScheduleTest(TestCase):
     def setUp(self):
         self.openstack_tenant_fixture = fixtures.OpenStackTenantFixture()
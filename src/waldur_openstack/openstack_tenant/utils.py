@@ -1,4 +1,5 @@
 from django.contrib.contenttypes.models import ContentType
+from django.db.models import Case, F, Value, When
 
 from waldur_core.cost_tracking import ConsumableItem
 from waldur_core.cost_tracking.models import DefaultPriceListItem
@@ -17,3 +18,25 @@ def sync_price_list_item(flavor):
         resource_content_type=resource_content_type,
         consumable_item=consumable_item,
     )
+
+
+def bulk_update(model, changes, chunk_size=500):
+    """ Update rows with different values using single query per chunk of rows.
+
+    Changes is a dictionary that maps primary key to dictionary of changed fields.
+    Django 1.11 does not have bulk_update, so CASE expression is used for each field.
+    """
+    pks = list(changes.keys())
+    for index in range(0, len(pks), chunk_size):
+        chunk = pks[index:index + chunk_size]
+        fields = set(field for pk in chunk for field in changes[pk])
+        updates = {}
+        for field_name in fields:
+            field = model._meta.get_field(field_name)
+            updates[field_name] = Case(
+                *[When(pk=pk, then=Value(changes[pk][field_name], output_field=field))
+                  for pk in chunk if field_name in changes[pk]],
+                default=F(field_name),
+                output_field=field
+            )
+        model.objects.filter(pk__in=chunk).update(**updates)
@@ -3,7 +3,8 @@ from django.utils.translation import ugettext_lazy as _
 from rest_framework import decorators, response, status, exceptions, serializers as rf_serializers
 
 from waldur_core.core import exceptions as core_exceptions, validators as core_validators
-from waldur_core.structure import views as structure_views, filters as structure_filters
+from waldur_core.structure import (views as structure_views, filters as structure_filters,
+                                   permissions as structure_permissions)
 
 from . import models, serializers, filters, executors
 
@@ -396,6 +397,29 @@ class InstanceViewSet(structure_views.ImportableResourceViewSet):
             is_heavy_task=True,
         )
 
+    @decorators.list_route(methods=['post'])
+    def bulk_create(self, request):
+        """
+        Create several identical instances with single request.
+        Request accepts the same fields as instance creation and additionally **count** field.
+        Names of the created instances are suffixed with their numbers.
+        Only validation and creation of database rows are shared by the batch,
+        each instance is provisioned by its own chain of tasks as a single instance.
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        instances = serializer.save()
+        executors.InstanceCreateExecutor.execute_bulk(
+            instances,
+            ssh_key=serializer.validated_data.get('ssh_public_key'),
+            flavor=serializer.validated_data['flavor'],
+            is_heavy_task=True,
+        )
+        data = serializers.InstanceSerializer(instances, many=True, context=self.get_serializer_context()).data
+        return response.Response(data, status=status.HTTP_201_CREATED)
+
+    bulk_create_serializer_class = serializers.InstanceBulkCreateSerializer
+
     def _has_backups(instance):
         if instance.backups.exists():
             raise core_exceptions.IncorrectStateException(_('Cannot delete instance that has backups.'))
@@ -529,6 +553,73 @@ class InstanceViewSet(structure_views.ImportableResourceViewSet):
                           core_validators.RuntimeStateValidator(models.Instance.RuntimeStates.ACTIVE)]
     restart_serializer_class = rf_serializers.Serializer
 
+    def _execute_bulk_action(self, request, action, runtime_state):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        instance_uuids = serializer.validated_data.get('instances')
+        filter_params = set(request.query_params) & set(self.filter_class.base_filters)
+        if instance_uuids is None and not filter_params:
+            raise exceptions.ValidationError(
+                _('Instances should be specified by instances field or by filter query parameters.'))
+
+        instances = self.filter_queryset(self.get_queryset())
+        if instance_uuids is not None:
+            instances = instances.filter(uuid__in=[instance_uuid.hex for instance_uuid in instance_uuids])
+        max_count = serializer.MAX_COUNT
+        instances = list(instances.select_related(
+            'service_project_link__project', 'service_project_link__service__settings')[:max_count + 1])
+        if not instances:
+            raise exceptions.ValidationError(_('There are no instances matching the request.'))
+        if len(instances) > max_count:
+            raise exceptions.ValidationError(
+                _('Action cannot be applied to more than %s instances at once.') % max_count)
+
+        instance_per_project = {instance.service_project_link.project: instance for instance in instances}
+        for instance in instance_per_project.values():
+            structure_permissions.is_administrator(request, self, instance)
+
+        invalid_instances = [instance.name for instance in instances
+                             if instance.state != models.Instance.States.OK or instance.runtime_state != runtime_state]
+        if invalid_instances:
+            raise core_exceptions.IncorrectStateException(
+                _('Instances should be in OK state and %(runtime_state)s runtime state: %(instances)s.') % {
+                    'runtime_state': runtime_state, 'instances': ', '.join(invalid_instances)})
+
+        executors.InstanceBulkActionExecutor.execute(instances, action)
+        return response.Response({'status': _('%(action)s of %(count)s instances was scheduled') % {
+            'action': action, 'count': len(instances)}}, status=status.HTTP_202_ACCEPTED)
+
+    @decorators.list_route(methods=['post'])
+    def bulk_start(self, request):
+        """
+        Start several instances. Instances are specified by list of UUIDs in **instances** field
+        or by the same filter query parameters as instances list. At most 100 instances are accepted.
+        """
+        return self._execute_bulk_action(request, 'start', models.Instance.RuntimeStates.SHUTOFF)
+
+    bulk_start_serializer_class = serializers.InstanceBulkActionSerializer
+
+    @decorators.list_route(methods=['post'])
+    def bulk_stop(self, request):
+        """
+        Stop several instances. Instances are specified by list of UUIDs in **instances** field
+        or by the same filter query parameters as instances list. At most 100 instances are accepted.
+        """
+        return self._execute_bulk_action(request, 'stop', models.Instance.RuntimeStates.ACTIVE)
+
+    bulk_stop_serializer_class = serializers.InstanceBulkActionSerializer
+
+    @decorators.list_route(methods=['post'])
+    def bulk_restart(self, request):
+        """
+        Restart several instances. Instances are specified by list of UUIDs in **instances** field
+        or by the same filter query parameters as instances list. At most 100 instances are accepted.
+        """
+        return self._execute_bulk_action(request, 'restart', models.Instance.RuntimeStates.ACTIVE)
+
+    bulk_restart_serializer_class = serializers.InstanceBulkActionSerializer
+
     @decorators.detail_route(methods=['post'])
     def update_security_groups(self, request, uuid=None):
         instance = self.get_object()